@@ -1,5 +1,5 @@
 import streamlit as st
-from tasks import agenda, meeting, upload_doc,live_meeting, QnA
+from tasks import agenda, meeting, upload_doc,live_meeting, QnA, artifacts, models, llm, llm_cache, retrieval
 
          
 # -------   ------------- Main Function -------------------- #
@@ -8,14 +8,18 @@ def main():
     st.title("Meeting Management Tool")
     
     # Create tabs for different stages of meeting management
-    tab1, tab2, tab3, tab4, tab5 = st.tabs(["Upload Documents", "Discussion Points & Agenda", "Start Meeting", "Upload Video","QnA"])
+    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(["Upload Documents", "Discussion Points & Agenda", "Start Meeting",
+                                                  "Upload Video", "Past Meetings", "QnA"])
     
     # Content for each tab
     with tab1:
         uploaded_files = upload_doc.upload_documents()
         if uploaded_files:
+            replace_same_name = st.checkbox("Replace earlier uploads with the same file name",
+                                            help="Otherwise a file with a name already uploaded is added as a "
+                                                 "separate document.")
             if st.button("Process Uploaded Documents"):
-                QnA.process_uploaded_documents(uploaded_files)
+                QnA.process_uploaded_documents(uploaded_files, replace_same_name=replace_same_name)
     
     with tab2:
         agenda.discussion_points_and_generate_agenda()
@@ -29,12 +33,54 @@ def main():
         meeting.track_meeting()
     
     with tab5:
+        st.title('Past Meetings')
+        meeting.past_meetings()
+
+    with tab6:
         st.title('Context-Aware Q&A System')
         query = st.text_input("Ask a question about the meeting or related topics:")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            search_mode = st.selectbox("Search mode", retrieval.RETRIEVAL_MODES)
+        with col2:
+            sources = {"All sources": None, "Meeting transcripts": "transcript", "Uploaded documents": "document"}
+            source = st.selectbox("Search in", list(sources))
+        with col3:
+            # Restrict the search to one processed meeting
+            scopes = {None: "All meetings"}
+            scopes.update({saved["meeting_id"]: meeting.meeting_label(saved) for saved in artifacts.list_meetings()})
+            meeting_id = st.selectbox("Meeting", list(scopes), format_func=scopes.get)
         if query:
-            with st.spinner("Generating answer..."):
-                answer = QnA.qna(query)
-            st.write("Answer:", answer)
+            # Clicking Stop reruns the script, which interrupts the stream below
+            if st.button("Stop generating"):
+                st.info("Answer generation cancelled.")
+            else:
+                metrics = llm.StreamMetrics(label="qna")
+                st.write("Answer:")
+                st.write_stream(QnA.qna_stream(query, metrics=metrics, mode=search_mode,
+                                                doc_type=sources[source], meeting_id=meeting_id))
+                if metrics.total_seconds is not None:
+                    st.caption(f"Answer {metrics.describe()}")
+
+    # Models are loaded lazily, so this only lists what this process has needed so far
+    with st.sidebar.expander("Loaded models"):
+        stats = models.model_stats()
+        if stats:
+            for name, info in stats.items():
+                size = info["parameter_bytes"] or info["rss_delta_bytes"] or 0
+                st.write(f"**{name}**: loaded in {info['load_seconds']:.1f}s, ~{size / 1e6:.0f} MB")
+        else:
+            st.write("No models loaded yet.")
+
+    with st.sidebar.expander("LLM cache"):
+        cache_stats = llm_cache.stats()
+        if cache_stats:
+            st.write(f"{cache_stats['hits']} hits, {cache_stats['misses']} misses")
+            st.write(f"{cache_stats['entries']} entries, {cache_stats['bytes'] / 1e6:.1f} MB")
+
+    with st.sidebar.expander("Recent generations"):
+        for metrics in reversed(list(llm.recent_metrics)[-10:]):
+            st.write(f"{metrics.label}: {metrics.describe()}")
             
 # Entry point of the script
 if __name__ == "__main__":
@@ -0,0 +1,73 @@
+"""
+Times discussion point coverage scoring on a synthetic meeting: a 2-hour
+transcript of 5-second segments and 50 discussion points by default.
+
+    python -m benchmarks.bench_coverage --minutes 120 --points 50
+
+The cold run includes embedding every window and point; the warm run
+re-scores the same transcript with the embeddings cached, which is what a
+live meeting pays on each update for the windows it has already seen.
+"""
+import argparse
+import json
+import random
+import time
+
+from tasks import coverage, models
+
+TOPICS = [
+    "budget", "hiring", "roadmap", "security audit", "customer churn", "release schedule", "pricing",
+    "infrastructure costs", "onboarding", "marketing campaign", "quarterly targets", "vendor contract",
+    "performance review", "office move", "data retention", "incident postmortem", "mobile app", "API limits",
+]
+FILLER = ["we", "should", "look", "at", "the", "next", "steps", "for", "and", "maybe", "discuss", "again",
+          "I", "think", "that", "is", "fine", "but", "need", "numbers", "before", "Friday"]
+
+
+def synthetic_segments(minutes, seed=0):
+    rng = random.Random(seed)
+    segments = []
+    for idx in range(int(minutes * 60 / 5)):
+        topic = TOPICS[(idx // 40) % len(TOPICS)]
+        words = rng.sample(FILLER, 8)
+        words.insert(rng.randrange(len(words)), topic)
+        segments.append({"start": idx * 5.0, "end": idx * 5.0 + 5.0, "text": " ".join(words)})
+    return segments
+
+
+def synthetic_points(count, seed=0):
+    rng = random.Random(seed)
+    return [f"Discuss the {rng.choice(TOPICS)} ({idx + 1})" for idx in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=120)
+    parser.add_argument("--points", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=coverage.TOP_K)
+    args = parser.parse_args()
+
+    segments = synthetic_segments(args.minutes)
+    points = synthetic_points(args.points)
+    models.get_embedder()
+
+    start = time.perf_counter()
+    results = coverage.score_coverage(points, segments, top_k=args.top_k)
+    cold = time.perf_counter() - start
+
+    start = time.perf_counter()
+    coverage.score_coverage(points, segments, top_k=args.top_k)
+    warm = time.perf_counter() - start
+
+    print(json.dumps({
+        "segments": len(segments),
+        "windows": len(coverage.transcript_windows(segments)),
+        "points": len(points),
+        "cold_seconds": cold,
+        "warm_seconds": warm,
+        "covered": sum(result["covered"] for result in results),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Compares sequential, concurrent and single-call insight generation against
+a fake Gemini client, so no API key or network access is needed.
+
+    python -m benchmarks.bench_insights --latency 1.0 --transcript-words 20000
+"""
+import argparse
+import json
+import time
+
+from benchmarks.fakes import FakeGeminiClient
+from tasks import meeting
+
+
+def run(mode, transcript, latency, max_workers):
+    client = FakeGeminiClient(base_latency=latency)
+    # Only the concurrent mode takes a pool size; the LLM cache would hide the round-trips
+    kwargs = {"max_workers": max_workers, "cache": False} if mode == "parallel" else {"cache": False}
+    start = time.perf_counter()
+    meeting.generate_meeting_insights(transcript, None, client=client, mode=mode, **kwargs)
+    return {"mode": mode, "max_workers": max_workers, "seconds": time.perf_counter() - start, "requests": client.calls}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.5, help="Simulated seconds per request")
+    parser.add_argument("--transcript-words", type=int, default=10000)
+    args = parser.parse_args()
+
+    transcript = " ".join(["word"] * args.transcript_words)
+    results = [
+        run("parallel", transcript, args.latency, max_workers=1),
+        run("parallel", transcript, args.latency, max_workers=len(meeting.INSIGHT_PROMPTS)),
+        run("single", transcript, args.latency, max_workers=1),
+    ]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+End-to-end benchmark of the meeting pipeline, run headless with a fake
+Gemini client: audio decoding and transcription of a synthetic video,
+transcript indexing, discussion point coverage, insight generation, and
+document indexing plus Q&A over corpora of several sizes.
+
+    python -m benchmarks.bench_pipeline --minutes 10 60 --docs 100 1000 --output results.json
+    python -m benchmarks.bench_pipeline --skip-transcribe --latency 0
+
+Each stage reports wall time, the peak RSS of the process while it ran and
+its throughput (audio seconds, chunks, segments or queries per second).
+Everything runs in a temporary working directory, so the ChromaDB store
+and the caches start empty and nothing touches the app's own data. The
+LLM and semantic caches are disabled so every stage does its full work.
+Results are printed as JSON and optionally written to --output, for
+comparing runs over time.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+# Set before the tasks modules read them at import time
+os.environ.setdefault("LLM_CACHE_ENABLED", "0")
+os.environ.setdefault("SEMANTIC_CACHE_ENABLED", "0")
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+import numpy as np
+
+from benchmarks.fakes import FakeGeminiClient
+
+# The tasks modules (and the benchmark helpers that import them) are only
+# imported inside the functions below, after main() has switched to the
+# temporary working directory, because they resolve their storage paths
+# against the working directory at import time.
+
+RSS_SAMPLE_SECONDS = 0.01
+
+
+def write_synthetic_video(path, seconds, seed=0):
+    """Writes an MP4 with a blank 64x64 video track and a speech-like AAC audio track."""
+    import av
+    from benchmarks.bench_transcription import write_synthetic_clip
+    wav_path = path + ".wav"
+    duration = write_synthetic_clip(wav_path, seconds, seed=seed)
+    with av.open(wav_path) as source, av.open(path, "w") as out:
+        video = out.add_stream("mpeg4", rate=1)
+        video.width, video.height, video.pix_fmt = 64, 64, "yuv420p"
+        audio = out.add_stream("aac", rate=16000)
+        audio.layout = "mono"
+        blank = np.zeros((64, 64, 3), dtype=np.uint8)
+        for second in range(int(duration) + 1):
+            frame = av.VideoFrame.from_ndarray(blank, format="rgb24")
+            frame.pts = second
+            for packet in video.encode(frame):
+                out.mux(packet)
+        for frame in source.decode(audio=0):
+            frame.pts = None
+            for packet in audio.encode(frame):
+                out.mux(packet)
+        for stream in (video, audio):
+            for packet in stream.encode(None):
+                out.mux(packet)
+    os.remove(wav_path)
+    return duration
+
+
+def synthetic_documents(count, words=300, seed=0):
+    from benchmarks.bench_coverage import TOPICS
+    rng = random.Random(seed)
+    vocabulary = TOPICS + ["plan", "owner", "deadline", "risk", "cost", "review", "team", "status", "next"]
+    return [" ".join(rng.choice(vocabulary) for _ in range(words)) + f" Reference DOC-{idx}."
+            for idx in range(count)]
+
+
+class RssSampler:
+    """Tracks the peak RSS of this process while a stage runs."""
+    def __init__(self):
+        from tasks import models
+        self._read = models._rss_bytes
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _sample(self):
+        rss = self._read()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+
+    def _run(self):
+        while not self._stop.wait(RSS_SAMPLE_SECONDS):
+            self._sample()
+
+    def __enter__(self):
+        self._sample()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+        return False
+
+
+def measure(stage, size, units, unit_name, run):
+    """Runs one stage and returns its result record; `units` is the work done, e.g. audio seconds."""
+    with RssSampler() as sampler:
+        start = time.perf_counter()
+        run()
+        seconds = time.perf_counter() - start
+    record = {
+        "stage": stage,
+        "size": size,
+        "seconds": seconds,
+        "peak_rss_bytes": sampler.peak,
+        unit_name: units,
+        f"{unit_name}_per_second": units / seconds if seconds else None,
+    }
+    print(f"{stage} [{size}]: {seconds:.2f}s", file=sys.stderr)
+    return record
+
+
+def bench_audio(seconds, workdir):
+    from tasks import transcription
+    path = os.path.join(workdir, "synthetic.mp4")
+    duration = write_synthetic_video(path, seconds)
+    size = f"{duration:.0f}s audio"
+    results = [measure("decode", size, duration, "audio_seconds",
+                       lambda: sum(1 for _ in transcription.iter_audio_windows(path)))]
+    return path, duration, size, results
+
+
+def bench_transcribe(path, duration, size):
+    from tasks import models, transcription
+    # Timed warm, like a long-running app process
+    models.get_whisper()
+    return [measure("transcribe", size, duration, "audio_seconds",
+                    lambda: sum(1 for _ in transcription.transcribe(path)))]
+
+
+def bench_meeting(minutes, points, client):
+    from benchmarks.bench_coverage import synthetic_segments
+    from tasks import QnA, documents, meeting, transcription
+    segments = synthetic_segments(minutes, seed=int(minutes))
+    text = transcription.segments_to_text(segments)
+    size = f"{minutes:g} min transcript"
+    meeting_id = documents.content_hash(text)
+    chunks = sum(1 for _ in documents.chunk_text_blocks([text]))
+
+    def insights():
+        # generate_meeting_insights logs and returns None on failure; a failed stage must not be timed as a pass
+        if meeting.generate_meeting_insights(text, points, client=client, segments=segments, cache=False) is None:
+            raise RuntimeError("Insight generation failed")
+
+    return [
+        measure("index_transcript", size, chunks, "chunks",
+                lambda: QnA.add_meeting_transcript(meeting_id, text)),
+        measure("coverage", size, len(segments), "segments",
+                lambda: meeting.compare_discussion_points(points, None, segments=segments)),
+        measure("insights", size, len(segments), "segments", insights),
+    ]
+
+
+def bench_corpus(count, queries, mode):
+    from tasks import QnA, documents
+    texts = synthetic_documents(count, seed=count)
+    size = f"{count} documents"
+    chunks = [chunk for text in texts for chunk in documents.chunk_text_blocks([text])]
+    results = [measure("index_documents", size, len(chunks), "chunks",
+                       lambda: QnA.index_chunks(chunks, f"bench{count}", {"type": "document", "source": size}))]
+    results.append(measure("qna", size, len(queries), "queries",
+                           lambda: [QnA.qna(query, mode=mode) for query in queries]))
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--audio-seconds", type=float, default=120, help="Length of the synthetic video")
+    parser.add_argument("--skip-transcribe", action="store_true", help="Only time decoding, not Whisper")
+    parser.add_argument("--minutes", type=float, nargs="+", default=[10, 30, 60], help="Transcript lengths")
+    parser.add_argument("--points", type=int, default=20, help="Discussion points per meeting")
+    parser.add_argument("--docs", type=int, nargs="+", default=[100, 1000], help="Document corpus sizes")
+    parser.add_argument("--queries", type=int, default=10, help="Q&A questions per corpus size")
+    parser.add_argument("--mode", default="hybrid", help="Retrieval mode for Q&A")
+    parser.add_argument("--latency", type=float, default=0.2, help="Fake Gemini time to first token")
+    parser.add_argument("--output", help="Also write the JSON results to this file")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output) if args.output else None
+    client = FakeGeminiClient(base_latency=args.latency)
+
+    original_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            from benchmarks.bench_coverage import TOPICS, synthetic_points
+            from tasks import llm, models
+            points = synthetic_points(args.points)
+            queries = [f"What was decided about the {TOPICS[idx % len(TOPICS)]}?" for idx in range(args.queries)]
+            # Q&A asks the registry for the Gemini client, so register the fake under its key
+            models.get_model(f"gemini-{llm.MODEL_NAME}", lambda: client)
+            models.get_embedder()
+
+            path, duration, size, results = bench_audio(args.audio_seconds, workdir)
+            if not args.skip_transcribe:
+                results.extend(bench_transcribe(path, duration, size))
+            for minutes in args.minutes:
+                results.extend(bench_meeting(minutes, points, client))
+            for count in args.docs:
+                results.extend(bench_corpus(count, queries, args.mode))
+        finally:
+            os.chdir(original_cwd)
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "settings": vars(args),
+        "gemini_calls": client.calls,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Measures the realtime factor (processing seconds per second of audio) of
+meeting.transcribe_audio (one Whisper call over the whole file), the
+streaming engine and the parallel engine.
+
+    python -m benchmarks.bench_transcription --seconds 600 --workers 1 4 8
+    python -m benchmarks.bench_transcription --audio path/to/meeting.mp4
+
+Without --audio a synthetic clip is generated: bursts of amplitude-modulated
+tones separated by short silences, which gives the silence detector
+realistic cut points. Its transcript is meaningless; only timing matters.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import wave
+
+import numpy as np
+
+from tasks import meeting, models, transcription
+
+SAMPLE_RATE = transcription.SAMPLE_RATE
+
+
+def write_synthetic_clip(path, seconds, seed=0):
+    """Writes a mono 16 kHz 16-bit WAV of speech-like bursts and pauses."""
+    rng = np.random.default_rng(seed)
+    with wave.open(path, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(SAMPLE_RATE)
+        written = 0.0
+        while written < seconds:
+            burst = rng.uniform(2.0, 8.0)
+            pause = rng.uniform(0.2, 1.0)
+            t = np.arange(int(burst * SAMPLE_RATE)) / SAMPLE_RATE
+            pitch = rng.uniform(100, 250)
+            envelope = 0.5 * (1 + np.sin(2 * np.pi * rng.uniform(2, 5) * t))
+            signal = envelope * (np.sin(2 * np.pi * pitch * t) + 0.3 * np.sin(2 * np.pi * 2 * pitch * t))
+            signal = np.concatenate([signal, np.zeros(int(pause * SAMPLE_RATE))])
+            out.writeframes((0.3 * signal * 32767).astype(np.int16).tobytes())
+            written += burst + pause
+    return written
+
+
+def audio_seconds(path):
+    return sum(len(samples) for _, samples in transcription.iter_audio_windows(path)) / SAMPLE_RATE
+
+
+def timed(name, duration, run):
+    start = time.perf_counter()
+    segments = run()
+    elapsed = time.perf_counter() - start
+    return {"engine": name, "seconds": elapsed, "realtime_factor": elapsed / duration, "segments": segments}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--audio", help="Audio or video file to transcribe instead of a synthetic clip")
+    parser.add_argument("--seconds", type=float, default=300, help="Length of the synthetic clip")
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4])
+    parser.add_argument("--model-size", default=models.WHISPER_MODEL_SIZE)
+    parser.add_argument("--skip-baseline", action="store_true", help="Do not run meeting.transcribe_audio")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.audio
+        if path is None:
+            path = os.path.join(tmp, "synthetic.wav")
+            write_synthetic_clip(path, args.seconds)
+        duration = audio_seconds(path)
+
+        # Load the model up front so every engine is timed warm
+        models.get_whisper(args.model_size)
+
+        results = []
+        if not args.skip_baseline and args.model_size == models.WHISPER_MODEL_SIZE:
+            results.append(timed("transcribe_audio", duration,
+                                 lambda: len(meeting.transcribe_audio(path)["segments"])))
+        results.append(timed("stream", duration, lambda: sum(
+            1 for _ in transcription.transcribe_stream(path, model=models.get_whisper(args.model_size))
+        )))
+        for workers in args.workers:
+            # Includes the workers' model loading time, as a real run would
+            results.append(timed(f"parallel-{workers}", duration, lambda workers=workers: sum(
+                1 for _ in transcription.transcribe_parallel(path, workers=workers, model_size=args.model_size)
+            )))
+
+    print(json.dumps({"audio_seconds": duration, "model_size": args.model_size, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Compares recall and query latency of the vector store backends: the
+ChromaDB collection (HNSW over float32 vectors), the int8 flat index and
+the int8 IVF index, against exact float32 search.
+
+    python -m benchmarks.bench_vector_store --vectors 10000 100000 --queries 200
+    python -m benchmarks.bench_vector_store --backends int8 int8-ivf --ivf-lists 256 --ivf-probes 16
+
+Embeddings are synthetic: points scattered around random cluster centres,
+with queries drawn near stored points, so no embedding model is needed.
+Reports recall@k, p50/p95 query latency, the on-disk size of the index
+and the RSS growth of this process while building and querying it.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from tasks import models, vector_store
+
+BACKENDS = ("chroma", "int8", "int8-ivf")
+ADD_BATCH = 5000
+
+
+def synthetic_embeddings(count, dim, clusters, seed=0):
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dim))
+    vectors = centres[rng.integers(0, clusters, count)] + 0.5 * rng.normal(size=(count, dim))
+    return vector_store.normalize(vectors)
+
+
+def directory_bytes(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def open_backend(backend, path, ivf_lists, ivf_probes):
+    if backend == "chroma":
+        import chromadb
+        client = chromadb.PersistentClient(path=path)
+        return client.get_or_create_collection(name="bench", metadata={"hnsw:space": "cosine"})
+    lists = ivf_lists if backend == "int8-ivf" else 0
+    return vector_store.Int8VectorStore(path, ivf_lists=lists, ivf_probes=ivf_probes)
+
+
+def bench_backend(backend, vectors, queries, truth, k, ivf_lists, ivf_probes):
+    rss_before = models._rss_bytes()
+    with tempfile.TemporaryDirectory() as path:
+        store = open_backend(backend, path, ivf_lists, ivf_probes)
+        start = time.perf_counter()
+        for offset in range(0, len(vectors), ADD_BATCH):
+            batch = vectors[offset:offset + ADD_BATCH]
+            store.add(ids=[str(idx) for idx in range(offset, offset + len(batch))],
+                      embeddings=batch.tolist() if backend == "chroma" else batch,
+                      metadatas=[{"group": idx % 10} for idx in range(offset, offset + len(batch))])
+        build_seconds = time.perf_counter() - start
+
+        latencies, hits = [], 0
+        for query, expected in zip(queries, truth):
+            start = time.perf_counter()
+            result = store.query(query_embeddings=[query.tolist()], n_results=k)
+            latencies.append(time.perf_counter() - start)
+            hits += len({int(item_id) for item_id in result["ids"][0]} & set(expected.tolist()))
+        rss_after = models._rss_bytes()
+        return {
+            "backend": backend,
+            "vectors": len(vectors),
+            f"recall@{k}": hits / (k * len(queries)),
+            "p50_ms": float(np.percentile(latencies, 50) * 1000),
+            "p95_ms": float(np.percentile(latencies, 95) * 1000),
+            "build_seconds": build_seconds,
+            "disk_bytes": directory_bytes(path),
+            "rss_delta_bytes": rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--dim", type=int, default=384, help="all-MiniLM-L6-v2 embeddings have 384 dimensions")
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--ivf-lists", type=int, default=256)
+    parser.add_argument("--ivf-probes", type=int, default=vector_store.VECTOR_IVF_PROBES)
+    args = parser.parse_args()
+
+    results = []
+    for count in args.vectors:
+        vectors = synthetic_embeddings(count, args.dim, args.clusters)
+        rng = np.random.default_rng(1)
+        queries = vector_store.normalize(vectors[rng.integers(0, count, args.queries)]
+                                         + 0.1 * rng.normal(size=(args.queries, args.dim)))
+        # Exact float32 neighbours as ground truth
+        truth = np.argsort(-(queries @ vectors.T), axis=1)[:, :args.k]
+        for backend in args.backends:
+            results.append(bench_backend(backend, vectors, queries, truth, args.k, args.ivf_lists, args.ivf_probes))
+
+    print(json.dumps({"dim": args.dim, "k": args.k, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
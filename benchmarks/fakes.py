@@ -0,0 +1,48 @@
+import json
+import random
+import time
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGeminiClient:
+    """
+    Offline stand-in for genai.GenerativeModel. Each call waits
+    `base_latency` before the first token and then a time proportional to
+    the prompt size, like a real round-trip would, and answers with
+    placeholder text (or JSON when asked for it). stream=True yields the
+    answer word by word.
+    """
+    def __init__(self, base_latency=0.5, seconds_per_kchar=0.01, failure_rate=0.0, seed=0):
+        self.base_latency = base_latency
+        self.seconds_per_kchar = seconds_per_kchar
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self._random = random.Random(seed)
+
+    def _answer(self, prompt):
+        if "JSON" in prompt:
+            keys = [line.split('"')[1] for line in prompt.splitlines() if line.startswith('- "')]
+            return json.dumps({key: f"Fake {key.lower()}." for key in keys})
+        return f"Fake response to a {len(prompt)}-character prompt."
+
+    def generate_content(self, prompt, request_options=None, stream=False, **kwargs):
+        self.calls += 1
+        time.sleep(self.base_latency)
+        if self._random.random() < self.failure_rate:
+            raise ConnectionError("Simulated transient failure")
+        text = self._answer(prompt)
+        generation_seconds = self.seconds_per_kchar * len(prompt) / 1000
+        if stream:
+            return self._stream(text, generation_seconds)
+        time.sleep(generation_seconds)
+        return FakeResponse(text)
+
+    def _stream(self, text, generation_seconds):
+        words = text.split(" ")
+        for idx, word in enumerate(words):
+            time.sleep(generation_seconds / len(words))
+            yield FakeResponse(word if idx == 0 else " " + word)
@@ -1,20 +1,34 @@
 import streamlit as st
-import chromadb
-from chromadb.config import Settings
-from chromadb.utils import embedding_functions
-import google.generativeai as genai
+from chromadb import Documents, EmbeddingFunction, Embeddings
 import os
-import uuid
+import logging
+import time
 
-# Initialize ChromaDB with persistence
-PERSIST_DIRECTORY = os.path.join(os.getcwd(), "chroma_db")
-chroma_client = chromadb.PersistentClient(path=PERSIST_DIRECTORY)
+from tasks import artifacts, context, documents, llm, models, retrieval, semantic_cache, vector_store
 
-# Use get_or_create_collection to avoid errors if the collection already exists
-collection = chroma_client.get_or_create_collection(
-    name="meeting_docs",
-    embedding_function=embedding_functions.SentenceTransformerEmbeddingFunction(model_name="all-MiniLM-L6-v2")
-)
+logger = logging.getLogger(__name__)
+
+# Number of chunks embedded and written to the vector store per collection.add call
+INGEST_BATCH_SIZE = 64
+
+NO_ANSWER = "I don't have enough information to answer that question."
+ANSWER_ERROR = "I'm sorry, but I encountered an error while trying to generate an answer."
+
+class SharedEmbeddingFunction(EmbeddingFunction):
+    """
+    Embeds with the process-wide sentence transformer from the model registry,
+    so the model is only loaded when something is actually embedded and is
+    shared with the rest of the app.
+    """
+    def __call__(self, input: Documents) -> Embeddings:
+        return models.get_embedder().encode(list(input), convert_to_numpy=True).tolist()
+
+# The knowledge base collection, on the backend chosen by VECTOR_BACKEND (see tasks/vector_store.py)
+collection = vector_store.open_collection("meeting_docs", SharedEmbeddingFunction())
+
+# Keyword index and hybrid search over the collection, kept in sync by the ingestion functions below.
+# Every write bumps the semantic cache's corpus version, which tells other processes to rebuild the index.
+retriever = retrieval.HybridRetriever(collection, version=semantic_cache.corpus_version)
 
 @st.cache_resource
 def get_api_key():
@@ -26,84 +40,284 @@ def get_api_key():
         st.stop()
     return api_key
 
-def add_meeting_transcript(meeting_id, transcript):
+def _existing_ids(ids):
+    """Returns the subset of `ids` that is already stored in the collection."""
+    if not ids:
+        return set()
+    return set(collection.get(ids=ids, include=[])["ids"])
+
+def _stored_embeddings(chunk_hashes):
+    """Embeddings already stored for chunks with these content hashes, by hash."""
+    if not chunk_hashes:
+        return {}
+    found = collection.get(where={"chunk_hash": {"$in": list(chunk_hashes)}}, include=["metadatas", "embeddings"])
+    return {metadata["chunk_hash"]: [float(value) for value in embedding]
+            for metadata, embedding in zip(found["metadatas"], found["embeddings"])}
+
+def index_chunks(chunks, id_prefix, base_metadata, batch_size=INGEST_BATCH_SIZE, on_batch=None):
+    """
+    Stores a stream of text chunks under ids made of `id_prefix`, which
+    names their owner (a document or meeting), and the chunk's content hash.
+    Chunks the owner already has are skipped, and text that another owner
+    already stored reuses its embedding, so re-indexing unchanged content
+    costs only a lookup. Owners never share a row, so one owner's metadata
+    or stale-chunk removal does not affect another's.
+
+    Returns (chunk_ids, new_chunks), where chunk_ids is the set of ids
+    that make up the content and new_chunks the number of chunks embedded,
+    or (None, 0) if the database rejected a batch. The chunks written before
+    a failed batch are deleted again, so content is never left partly indexed.
+    """
+    chunk_ids = set()
+    written = []
+    added = 0
+    new_chunks = 0
+    created_at = int(time.time())
+    batch_ids, batch_chunks, batch_metadatas = [], [], []
+
+    def flush():
+        nonlocal added, new_chunks
+        existing = _existing_ids(batch_ids)
+        fresh = [idx for idx, chunk_id in enumerate(batch_ids) if chunk_id not in existing]
+        reused = _stored_embeddings({batch_metadatas[idx]["chunk_hash"] for idx in fresh})
+        copied = [idx for idx in fresh if batch_metadatas[idx]["chunk_hash"] in reused]
+        embedded = [idx for idx in fresh if batch_metadatas[idx]["chunk_hash"] not in reused]
+        if copied:
+            collection.add(
+                ids=[batch_ids[idx] for idx in copied],
+                documents=[batch_chunks[idx] for idx in copied],
+                metadatas=[batch_metadatas[idx] for idx in copied],
+                embeddings=[reused[batch_metadatas[idx]["chunk_hash"]] for idx in copied],
+            )
+            written.extend(batch_ids[idx] for idx in copied)
+        if embedded:
+            collection.add(
+                ids=[batch_ids[idx] for idx in embedded],
+                documents=[batch_chunks[idx] for idx in embedded],
+                metadatas=[batch_metadatas[idx] for idx in embedded],
+            )
+            written.extend(batch_ids[idx] for idx in embedded)
+        added += len(fresh)
+        new_chunks += len(embedded)
+
     try:
-        collection.add(
-            documents=[transcript],
-            metadatas=[{"type": "transcript", "meeting_id": meeting_id}],
-            ids=[f"transcript_{meeting_id}"]
-        )
-        return True
+        for chunk_idx, chunk in enumerate(chunks):
+            chunk_hash = documents.content_hash(chunk)
+            chunk_id = f"{id_prefix}_{chunk_hash}"
+            if chunk_id in chunk_ids:
+                continue
+            chunk_ids.add(chunk_id)
+            batch_ids.append(chunk_id)
+            batch_chunks.append(chunk)
+            batch_metadatas.append({**base_metadata, "chunk_hash": chunk_hash, "chunk": chunk_idx,
+                                    "created_at": created_at})
+            if len(batch_ids) >= batch_size:
+                flush()
+                batch_ids, batch_chunks, batch_metadatas = [], [], []
+                if on_batch:
+                    on_batch(len(chunk_ids), new_chunks)
+        if batch_ids:
+            flush()
+            if on_batch:
+                on_batch(len(chunk_ids), new_chunks)
     except Exception as e:
-        st.error(f"Error adding transcript to database: {str(e)}")
-        return False
+        st.error(f"Error adding chunks to database: {str(e)}")
+        if written:
+            try:
+                collection.delete(ids=written)
+            except Exception as delete_error:
+                logger.error(f"Error removing partly indexed chunks of {id_prefix}: {str(delete_error)}")
+        return None, 0
+    finally:
+        retriever.invalidate()
+        if added:
+            semantic_cache.invalidate()
+    return chunk_ids, new_chunks
 
-def add_document(doc_id, content):
+def remove_stale_chunks(where, keep_ids):
+    """Deletes chunks matching `where` that are no longer part of the current content."""
     try:
-        collection.add(
-            documents=[content],
-            metadatas=[{"type": "document", "doc_id": doc_id}],
-            ids=[f"doc_{doc_id}"]
-        )
-        return True
+        stored = collection.get(where=where, include=[])["ids"]
+        stale = [chunk_id for chunk_id in stored if chunk_id not in keep_ids]
+        if stale:
+            collection.delete(ids=stale)
+            retriever.invalidate()
+            semantic_cache.invalidate()
+        return len(stale)
     except Exception as e:
-        st.error(f"Error adding document to database: {str(e)}")
+        st.error(f"Error removing stale chunks: {str(e)}")
+        return 0
+
+def is_indexed(where):
+    """Returns True if at least one chunk matches the metadata filter."""
+    try:
+        return bool(collection.get(where=where, limit=1, include=[])["ids"])
+    except Exception as e:
+        logger.error(f"Error looking up indexed content: {str(e)}")
         return False
 
-def search_context(query, n_results=5):
+def add_meeting_transcript(meeting_id, transcript):
+    """
+    Chunks and indexes a transcript and returns the sorted ids of its chunks,
+    or None on failure. The meeting id is the hash of the recording, so
+    re-processing the same video embeds nothing new.
+    """
+    chunk_ids, _ = index_chunks(
+        documents.chunk_text_blocks([transcript]),
+        f"transcript_{meeting_id}",
+        {"type": "transcript", "meeting_id": meeting_id},
+    )
+    if chunk_ids is None:
+        return None
+    remove_stale_chunks({"meeting_id": meeting_id}, chunk_ids)
+    return sorted(chunk_ids)
+
+def retrieve(query, n_results=5, mode=retrieval.RETRIEVAL_MODE, meeting_id=None, doc_type=None,
+             since=None, until=None):
+    """
+    Returns the most relevant chunks as ranked hits ({"id", "text",
+    "metadata", "score"}). `mode` is "hybrid" (BM25 + dense, fused and
+    reranked), "dense" or "keyword" (no query embedding); the other
+    arguments filter by meeting, "transcript"/"document" type, or
+    created_at range in epoch seconds.
+    """
     try:
-        results = collection.query(
-            query_texts=[query],
-            n_results=n_results
-        )
-        return results['documents'][0]
+        return retriever.search(query, n_results=n_results, mode=mode, meeting_id=meeting_id,
+                                doc_type=doc_type, since=since, until=until)
     except Exception as e:
         st.error(f"Error searching context: {str(e)}")
         return []
 
-@st.cache_data
-def generate_answer(query, context):
-    api_key = get_api_key()
-    genai.configure(api_key=api_key)
-    model = genai.GenerativeModel('gemini-pro')
-    
-    prompt = f"""
+def answer_context(query, token_budget=context.CONTEXT_TOKEN_BUDGET, **search_options):
+    """
+    Retrieves candidate chunks and assembles them into a deduplicated, cited
+    context within `token_budget` tokens (see tasks/context.py).
+    """
+    hits = retrieve(query, n_results=context.CONTEXT_CANDIDATES, **search_options)
+    meeting_ids = [hit["metadata"]["meeting_id"] for hit in hits if (hit.get("metadata") or {}).get("meeting_id")]
+    try:
+        names = artifacts.meeting_names(meeting_ids)
+    except Exception as e:
+        logger.error(f"Error looking up meeting names: {str(e)}")
+        names = {}
+    return context.build_context(hits, token_budget=token_budget, meeting_names=names)
+
+def build_answer_prompt(query, context_text):
+    return f"""
     You are an AI assistant tasked with answering questions about meetings and related documents. 
     Use the following context to answer the question. If the answer is not in the context, say "I don't have enough information to answer that question.
     Make sure you analyze the transcript and the context to answer the question"
+    Each context snippet starts with a numbered source; cite the sources you use by number, e.g. [2].
 
     Context:
-    {context}
+    {context_text}
 
     Question: {query}
 
     Answer:
     """
-    
+
+def qna(query, **search_options):
+    """Answers a question in one piece; see qna_stream for the streaming variant."""
+    return "".join(qna_stream(query, **search_options))
+
+def qna_stream(query, metrics=None, token_budget=context.CONTEXT_TOKEN_BUDGET, **search_options):
+    """
+    Yields the answer to a question as it is generated, from at most
+    `token_budget` tokens of cited context; the prompt size is recorded in
+    `metrics.prompt_tokens`. Near-identical questions in the same scope
+    reuse an earlier answer until the knowledge base changes. The answer is
+    only added to the semantic cache once it has been generated completely.
+    """
+    use_cache = semantic_cache.SEMANTIC_CACHE_ENABLED
+    if use_cache:
+        # Read before retrieval, so an answer built while documents are being ingested is stored as already stale
+        version = semantic_cache.corpus_version()
+        scope = semantic_cache.scope_key(search_options)
+        query_embedding = semantic_cache.embed_query(query)
+        cached = semantic_cache.lookup(query_embedding, scope)
+        if cached is not None:
+            yield cached
+            return
+
+    retrieved = answer_context(query, token_budget=token_budget, **search_options)
+    if not retrieved["snippets"]:
+        yield NO_ANSWER
+        return
+
+    metrics = metrics if metrics is not None else llm.StreamMetrics(label="qna")
+    prompt = build_answer_prompt(query, retrieved["text"])
+    metrics.prompt_tokens = context.count_tokens(prompt)
+    logger.info(f"Answering with {len(retrieved['snippets'])} snippets, "
+                f"{retrieved['tokens']} context tokens, {metrics.prompt_tokens} prompt tokens")
+    parts = []
     try:
-        response = model.generate_content(prompt)
-        return response.text
+        model = llm.get_client(get_api_key())
+        for chunk in llm.stream(model, prompt, metrics=metrics):
+            parts.append(chunk)
+            yield chunk
     except Exception as e:
         st.error(f"Error generating answer: {str(e)}")
-        return "I'm sorry, but I encountered an error while trying to generate an answer."
+        yield ANSWER_ERROR
+        return
+    if use_cache and parts and not metrics.cancelled:
+        semantic_cache.store(query, query_embedding, scope, "".join(parts), version)
 
-def qna(query):
-    relevant_context = search_context(query)
-    if relevant_context:
-        answer = generate_answer(query, "\n".join(relevant_context))
-    else:
-        answer = "I don't have enough information to answer that question."
-    return answer
+def replace_earlier_versions(file_name, chunk_ids):
+    """Deletes the chunks of other uploaded documents with the same file name."""
+    return remove_stale_chunks({"$and": [{"type": "document"}, {"source": file_name}]}, chunk_ids)
 
-def process_uploaded_documents(uploaded_files):
+def process_uploaded_documents(uploaded_files, batch_size=INGEST_BATCH_SIZE, replace_same_name=False):
+    """
+    Extracts, chunks and indexes the uploaded files. Chunks are streamed into
+    fixed-size batches so memory stays bounded regardless of corpus size.
+    Files and chunks are identified by content hash, so unchanged files are
+    skipped outright and edited files only embed the chunks that changed.
+    A different file with the same name is kept as a separate document
+    unless `replace_same_name` is set, which the user chooses per upload.
+    """
     successful_uploads = 0
-    for file in uploaded_files:
-        content = file.getvalue().decode('utf-8')
-        doc_id = str(uuid.uuid4())
-        if add_document(doc_id, content):
-            successful_uploads += 1
-    
+    total_chunks = 0
+    new_chunks = 0
+    unchanged_files = 0
+    progress = st.progress(0.0, text="Preparing documents...")
+
+    for file_idx, file in enumerate(uploaded_files):
+        try:
+            file_hash = documents.file_hash(file)
+            if is_indexed({"file_hash": file_hash}):
+                unchanged_files += 1
+                successful_uploads += 1
+                if replace_same_name:
+                    replace_earlier_versions(file.name, set(collection.get(where={"file_hash": file_hash},
+                                                                           include=[])["ids"]))
+            else:
+                def on_batch(seen, added, name=file.name):
+                    progress.progress(file_idx / len(uploaded_files),
+                                      text=f"{name}: {seen} chunks checked, {added} new")
+
+                chunk_ids, file_new = index_chunks(
+                    documents.iter_document_chunks(file),
+                    f"doc_{file_hash}",
+                    {"type": "document", "doc_id": file_hash, "file_hash": file_hash, "source": file.name},
+                    batch_size=batch_size,
+                    on_batch=on_batch,
+                )
+                if chunk_ids:
+                    if replace_same_name:
+                        replace_earlier_versions(file.name, chunk_ids)
+                    successful_uploads += 1
+                    total_chunks += len(chunk_ids)
+                    new_chunks += file_new
+        except Exception as e:
+            st.error(f"Error reading {file.name}: {str(e)}")
+
+        progress.progress((file_idx + 1) / len(uploaded_files),
+                          text=f"Processed {file_idx + 1} of {len(uploaded_files)} documents")
+
     if successful_uploads > 0:
-        st.success(f"Successfully processed and added {successful_uploads} out of {len(uploaded_files)} documents to the knowledge base.")
+        st.success(f"Successfully processed {successful_uploads} out of {len(uploaded_files)} documents: "
+                   f"{new_chunks} new chunks embedded, {total_chunks - new_chunks} unchanged chunks reused, "
+                   f"{unchanged_files} unchanged files skipped.")
     else:
-        st.warning("No documents were successfully added to the knowledge base.")
\ No newline at end of file
+        st.warning("No documents were successfully added to the knowledge base.")
@@ -1,7 +1,248 @@
 import streamlit as st
 
-import google.generativeai as genai
+import json
+import logging
 import os
+import re
+
+from tasks import QnA, llm
+
+logger = logging.getLogger(__name__)
+
+# -------------------- Structured Agenda -------------------- #
+# An agenda is a dict that is kept in the session and rendered as markdown:
+#
+#     {"points": [...], "summary": "...",
+#      "sections": [{"title", "priority", "points", "objective", "notes", "sources"}]}
+#
+# The first agenda for a set of points is planned in one JSON request that
+# groups and prioritizes them; each section's objective and notes are then
+# written concurrently, drawing on related uploaded documents found in the
+# meeting_docs collection (only the query is embedded). Points are listed
+# in a canonical order, so the same set of points gives the same prompts
+# and is answered from the LLM cache. When points are added or removed
+# later, only the new points are assigned to sections and only the sections
+# whose points changed are written again.
+
+PRIORITIES = ("high", "medium", "low")
+# Tokens of related document text given to each section prompt
+AGENDA_CONTEXT_TOKENS = int(os.getenv("AGENDA_CONTEXT_TOKENS", "400"))
+# Above this fraction of changed points the agenda is planned from scratch
+AGENDA_REPLAN_FRACTION = 0.5
+OTHER_SECTION = "Other Topics"
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+def _point_key(point):
+    return _SPACE_RE.sub(" ", point).strip().lower()
+
+
+def normalize_points(points):
+    """Drops empty and repeated points and puts the rest in a canonical order."""
+    unique = {}
+    for point in points:
+        point = _SPACE_RE.sub(" ", point).strip()
+        if point:
+            unique.setdefault(_point_key(point), point)
+    return [unique[key] for key in sorted(unique)]
+
+
+def _numbered(points):
+    return "\n".join(f"{idx}. {point}" for idx, point in enumerate(points, start=1))
+
+
+def _priority(value):
+    value = str(value or "").strip().lower()
+    return value if value in PRIORITIES else "medium"
+
+
+def _sections_from_response(data, points):
+    """
+    Reads the sections of a model response that refers to `points` by
+    number. A point is kept in the first section that lists it, and points
+    no section lists are collected in OTHER_SECTION.
+    """
+    assigned = set()
+    sections = []
+    for item in data.get("sections", []):
+        section_points = []
+        for number in item.get("points", []):
+            number = int(number) if str(number).strip().isdigit() else None
+            if number is not None and 1 <= number <= len(points) and number not in assigned:
+                assigned.add(number)
+                section_points.append(points[number - 1])
+        if section_points:
+            sections.append({"title": str(item.get("title") or f"Section {len(sections) + 1}").strip(),
+                             "priority": _priority(item.get("priority")), "points": section_points})
+    leftover = [point for number, point in enumerate(points, start=1) if number not in assigned]
+    if leftover:
+        sections.append({"title": OTHER_SECTION, "priority": "low", "points": leftover})
+    return sections
+
+
+# -------------------- Prompts -------------------- #
+def _plan_prompt(points):
+    return f"""Organize the following meeting discussion points into an agenda and respond with a single JSON object:
+{{"summary": "<brief summary of the overall meeting objectives, at most 100 words>",
+ "sections": [{{"title": "<clear, concise header>", "priority": "high" | "medium" | "low", "points": [<point numbers>]}}]}}
+
+Group related points into the same section, order the sections by priority, and list every point number exactly once.
+Do not include generic placeholders for date, time, location, or attendees. Respond with the JSON object only.
+
+Discussion points:
+{_numbered(points)}"""
+
+
+def _assign_prompt(sections, points):
+    titles = "\n".join(f"- {section['title']}" for section in sections)
+    return f"""A meeting agenda has these sections:
+{titles}
+
+Assign each of the following new discussion points to the section it fits best, or to a new section if none fits,
+and respond with a single JSON object:
+{{"sections": [{{"title": "<existing or new section title>", "priority": "high" | "medium" | "low", "points": [<point numbers>]}}]}}
+
+Respond with the JSON object only.
+
+New discussion points:
+{_numbered(points)}"""
+
+
+def _section_prompt(section, related_text):
+    related = f"\n\nRelated material from the uploaded documents:\n{related_text}" if related_text else ""
+    return f"""Write the agenda entry for the meeting section "{section['title']}", which covers these discussion points:
+{_numbered(section['points'])}{related}
+
+Respond with a single JSON object:
+{{"objective": "<one or two sentences on what this section should achieve>",
+ "notes": ["<up to three short preparation notes or questions, citing related material by its number, e.g. [1]>"]}}
+
+Respond with the JSON object only."""
+
+
+def _summary_prompt(sections):
+    outline = "\n".join(f"- {section['title']}: {'; '.join(section['points'])}" for section in sections)
+    return f"""Write a brief summary, at most 100 words, of the overall objectives of a meeting with this agenda.
+Do not include generic placeholders for date, time, location, or attendees.
+
+{outline}"""
+
+
+# -------------------- Generation -------------------- #
+def related_context(section):
+    """Cited excerpts of uploaded documents related to a section, found without re-embedding them."""
+    query = f"{section['title']}: {'; '.join(section['points'])}"
+    built = QnA.answer_context(query, token_budget=AGENDA_CONTEXT_TOKENS, doc_type="document")
+    return built["text"], [snippet["label"] for snippet in built["snippets"]]
+
+
+def plan_agenda(client, points):
+    """Groups and prioritizes the points in one request; returns (summary, sections)."""
+    data = llm.parse_json_response(llm.generate(client, _plan_prompt(points)))
+    return str(data.get("summary") or "").strip(), _sections_from_response(data, points)
+
+
+def assign_points(client, sections, added):
+    """Adds new points to the existing sections (copies of them), creating sections as needed."""
+    data = llm.parse_json_response(llm.generate(client, _assign_prompt(sections, added)))
+    by_title = {section["title"].lower(): section for section in sections}
+    for assignment in _sections_from_response(data, added):
+        existing = by_title.get(assignment["title"].lower())
+        if existing is None:
+            sections.append(assignment)
+            by_title[assignment["title"].lower()] = assignment
+        else:
+            existing["points"] = sorted(existing["points"] + assignment["points"], key=_point_key)
+    return sections
+
+
+def describe_sections(client, sections, on_section=None):
+    """
+    Writes the objective, notes and sources of each given section
+    concurrently, in place, calling `on_section(section)` as each one is done.
+    """
+    prompts = {}
+    for idx, section in enumerate(sections):
+        related_text, section["sources"] = related_context(section)
+        prompts[idx] = _section_prompt(section, related_text)
+    for idx, text, error in llm.generate_many(client, prompts):
+        section = sections[idx]
+        try:
+            if error is not None:
+                raise error
+            data = llm.parse_json_response(text)
+            section["objective"] = str(data.get("objective") or "").strip()
+            section["notes"] = [str(note).strip() for note in data.get("notes") or [] if str(note).strip()]
+        except Exception as e:
+            logger.error(f"Error writing agenda section {section['title']}: {str(e)}")
+            section["objective"], section["notes"] = "", []
+        if on_section:
+            on_section(section)
+
+
+def _same_points(section, previous):
+    return sorted(map(_point_key, section["points"])) == sorted(map(_point_key, previous["points"]))
+
+
+def generate_agenda(client, points, previous=None, on_update=None):
+    """
+    Returns (agenda, changed_titles). With a `previous` agenda, points that
+    were removed are dropped from their sections, new points are assigned
+    to sections, and only sections whose points changed are written again;
+    if most points changed the agenda is planned from scratch.
+    `on_update(agenda)` is called with the agenda once its sections are
+    planned and again as each changed section is written.
+    """
+    points = normalize_points(points)
+    keys = {_point_key(point) for point in points}
+    previous_keys = {_point_key(point) for point in previous["points"]} if previous else set()
+    changed_count = len(keys ^ previous_keys)
+
+    if previous and changed_count <= AGENDA_REPLAN_FRACTION * max(len(keys), 1):
+        if not changed_count:
+            return previous, []
+        sections = []
+        for section in previous["sections"]:
+            kept = [point for point in section["points"] if _point_key(point) in keys]
+            if kept:
+                sections.append(dict(section, points=kept))
+        added = [point for point in points if _point_key(point) not in previous_keys]
+        if added:
+            sections = assign_points(client, sections, added)
+        old_sections = {section["title"].lower(): section for section in previous["sections"]}
+        changed = [section for section in sections
+                   if section["title"].lower() not in old_sections
+                   or not _same_points(section, old_sections[section["title"].lower()])]
+        summary = llm.generate(client, _summary_prompt(sections)).strip()
+    else:
+        summary, sections = plan_agenda(client, points)
+        changed = sections
+
+    agenda = {"points": points, "summary": summary, "sections": sections}
+    if on_update:
+        on_update(agenda)
+    describe_sections(client, changed, on_section=(lambda section: on_update(agenda)) if on_update else None)
+    return agenda, [section["title"] for section in changed]
+
+
+def agenda_to_markdown(agenda):
+    lines = ["#### Meeting Objectives", agenda["summary"], ""]
+    for idx, section in enumerate(agenda["sections"], start=1):
+        lines.append(f"#### {idx}. {section['title']} ({section['priority']} priority)")
+        if section.get("objective"):
+            lines.append(section["objective"])
+        lines.extend(f"- {point}" for point in section["points"])
+        if section.get("notes"):
+            lines.append("")
+            lines.extend(f"> {note}  " for note in section["notes"])
+        if section.get("sources"):
+            lines.append("")
+            lines.append("Related: " + "; ".join(section["sources"]))
+        lines.append("")
+    return "\n".join(lines)
+
+
 # -------------------- Add Discussion Points -------------------- #
 
 
@@ -17,7 +258,7 @@ def discussion_points_and_generate_agenda():
         with col1:
             add_points = st.form_submit_button("Add Points")
         with col2:
-            generate_agenda = st.form_submit_button("Generate Agenda")
+            generate_agenda_clicked = st.form_submit_button("Generate Agenda")
 
     discussion_points = [point.strip() for point in discussion_points_input.split("\n") if point.strip()]
 
@@ -34,40 +275,31 @@ def discussion_points_and_generate_agenda():
         for idx, point in enumerate(st.session_state["discussion_points"], start=1):
             st.write(f"{idx}. {point}")
 
-    if generate_agenda:
+    if generate_agenda_clicked:
         if not discussion_points:
             st.warning("No discussion points available. Please add some points first.")
         else:
-            # Get API key from environment variable
-            api_key = os.getenv('GEMINI_API_KEY')
-            
-            if not api_key:
-                st.error("Gemini API key not found. Please set the GEMINI_API_KEY environment variable.")
-                return
-
             try:
-                # Configure the Gemini model
-                genai.configure(api_key=api_key)
-                model = genai.GenerativeModel('gemini-pro')
-
-                # Prepare the prompt
-                prompt = """Generate a structured meeting agenda based on the following discussion points:
-
-                {}
-
-                Please organize these points into a coherent agenda with the following:
-                1. A brief 100-word summary of the overall meeting objectives related to the discussion points
-                3. Any necessary grouping or prioritization of topics
-                4. Clear, concise headers for each section
-
-                Do not include generic placeholders for date, time, location, or attendees."""
-                prompt = prompt.format("\n".join(f"{idx}. {point}" for idx, point in enumerate(discussion_points, start=1)))
-
-                # Generate the agenda
-                response = model.generate_content(prompt)
-                
-                # Display the generated agenda
-                st.subheader("Generated Agenda")
-                st.markdown(response.text)
+                # Shared Gemini model; the agenda of the previous point set is updated rather than replaced
+                model = llm.get_client(QnA.get_api_key())
+                previous = st.session_state.get("agenda")
+                # Sections are shown as soon as they are planned and filled in as each one is written
+                progress = st.empty()
+                progress.info("Generating agenda...")
+                agenda, changed = generate_agenda(
+                    model, discussion_points, previous,
+                    on_update=lambda partial: progress.markdown(agenda_to_markdown(partial)),
+                )
+                progress.empty()
+                st.session_state["agenda"] = agenda
+                if previous:
+                    st.caption(f"Updated {len(changed)} of {len(agenda['sections'])} agenda sections")
             except Exception as e:
+                logger.error(f"Error generating agenda: {str(e)}")
                 st.error(f"An error occurred while generating the agenda: {str(e)}")
+
+    if st.session_state.get("agenda"):
+        st.subheader("Generated Agenda")
+        st.markdown(agenda_to_markdown(st.session_state["agenda"]))
+        with st.expander("Agenda JSON"):
+            st.code(json.dumps(st.session_state["agenda"], indent=2), language="json")
@@ -0,0 +1,145 @@
+import json
+import logging
+import os
+import sqlite3
+import time
+
+from tasks import sqlite_store
+
+logger = logging.getLogger(__name__)
+
+# -------------------- Meeting Artifacts Store -------------------- #
+# Everything produced while processing a meeting is saved here, keyed by the
+# meeting id (the content hash of the recording): the timestamped transcript
+# segments, the insight sections, the discussion point coverage results and
+# the ids of the meeting's chunks in the vector store. Past meetings are
+# shown from this store without running Whisper or Gemini again.
+
+ARTIFACTS_PATH = os.getenv("ARTIFACTS_PATH", os.path.join(os.getcwd(), "meetings.sqlite3"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meetings (
+    meeting_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    duration REAL,
+    discussion_points TEXT NOT NULL DEFAULT '[]',
+    insights TEXT,
+    sections TEXT NOT NULL DEFAULT '{}',
+    coverage TEXT NOT NULL DEFAULT '[]',
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS segments (
+    meeting_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    start REAL NOT NULL,
+    end REAL NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (meeting_id, idx)
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    meeting_id TEXT NOT NULL,
+    chunk_id TEXT NOT NULL,
+    PRIMARY KEY (meeting_id, chunk_id)
+);
+"""
+
+def _connection():
+    return sqlite_store.connect(ARTIFACTS_PATH, SCHEMA, row_factory=sqlite3.Row)
+
+
+def save_meeting(meeting_id, name=None, segments=None, discussion_points=None, insights=None, sections=None,
+                 coverage_results=None, chunk_ids=None):
+    """
+    Creates or updates a meeting's artifacts. Arguments left as None keep
+    their stored value, so stages can save their results as they finish.
+    """
+    connection = _connection()
+    now = time.time()
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        connection.execute(
+            "INSERT INTO meetings (meeting_id, name, created, updated) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(meeting_id) DO NOTHING",
+            (meeting_id, name or meeting_id[:12], now, now),
+        )
+        fields = {"updated": now}
+        if name is not None:
+            fields["name"] = name
+        if discussion_points is not None:
+            fields["discussion_points"] = json.dumps(list(discussion_points))
+        if insights is not None:
+            fields["insights"] = insights
+        if sections is not None:
+            fields["sections"] = json.dumps(sections)
+        if coverage_results is not None:
+            fields["coverage"] = json.dumps(coverage_results)
+        if segments is not None:
+            fields["duration"] = segments[-1]["end"] if segments else None
+            connection.execute("DELETE FROM segments WHERE meeting_id = ?", (meeting_id,))
+            connection.executemany(
+                "INSERT INTO segments (meeting_id, idx, start, end, text) VALUES (?, ?, ?, ?, ?)",
+                [(meeting_id, idx, s["start"], s["end"], s["text"]) for idx, s in enumerate(segments)],
+            )
+        if chunk_ids is not None:
+            connection.execute("DELETE FROM chunks WHERE meeting_id = ?", (meeting_id,))
+            connection.executemany(
+                "INSERT INTO chunks (meeting_id, chunk_id) VALUES (?, ?)",
+                [(meeting_id, chunk_id) for chunk_id in sorted(chunk_ids)],
+            )
+        assignments = ", ".join(f"{field} = ?" for field in fields)
+        connection.execute(f"UPDATE meetings SET {assignments} WHERE meeting_id = ?", (*fields.values(), meeting_id))
+        connection.execute("COMMIT")
+    except sqlite3.Error:
+        connection.execute("ROLLBACK")
+        raise
+
+
+def get_meeting(meeting_id, include_segments=True):
+    """
+    Returns a meeting's artifacts as a dict (name, duration,
+    discussion_points, insights, sections, coverage, segments, chunk_ids),
+    or None if the meeting was never saved.
+    """
+    connection = _connection()
+    row = connection.execute("SELECT * FROM meetings WHERE meeting_id = ?", (meeting_id,)).fetchone()
+    if row is None:
+        return None
+    meeting = dict(row)
+    meeting["discussion_points"] = json.loads(meeting["discussion_points"])
+    meeting["sections"] = json.loads(meeting["sections"])
+    meeting["coverage"] = json.loads(meeting["coverage"])
+    if include_segments:
+        meeting["segments"] = get_segments(meeting_id)
+    meeting["chunk_ids"] = [r[0] for r in connection.execute(
+        "SELECT chunk_id FROM chunks WHERE meeting_id = ? ORDER BY chunk_id", (meeting_id,))]
+    return meeting
+
+
+def get_segments(meeting_id):
+    rows = _connection().execute(
+        "SELECT start, end, text FROM segments WHERE meeting_id = ? ORDER BY idx", (meeting_id,)
+    ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def list_meetings(limit=100):
+    """Newest meetings first, without their segments."""
+    rows = _connection().execute(
+        "SELECT meeting_id, name, duration, created, updated, insights IS NOT NULL AS has_insights "
+        "FROM meetings ORDER BY created DESC LIMIT ?",
+        (limit,),
+    ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def meeting_names(meeting_ids):
+    """Maps the given meeting ids to their saved names."""
+    meeting_ids = list(set(meeting_ids))
+    if not meeting_ids:
+        return {}
+    rows = _connection().execute(
+        f"SELECT meeting_id, name FROM meetings WHERE meeting_id IN ({','.join('?' * len(meeting_ids))})",
+        meeting_ids,
+    ).fetchall()
+    return {row["meeting_id"]: row["name"] for row in rows}
@@ -0,0 +1,176 @@
+import argparse
+import glob
+import json
+import logging
+import os
+import sys
+import time
+
+from tasks import artifacts, documents, jobs, summarize
+
+logger = logging.getLogger(__name__)
+
+# -------------------- Batch Processing -------------------- #
+# Processes a directory or glob of recordings without the UI:
+#
+#     python -m tasks.batch archive/ --points points.txt --workers 4
+#     python -m tasks.batch "archive/2024-*/*.mp4" --points points.json
+#
+# Each recording goes through the background job pipeline (see jobs.py), so
+# it is transcribed, indexed into the knowledge base and summarized exactly
+# as if it had been uploaded, and an interrupted run resumes where it
+# stopped. Results are written next to each video:
+#
+#     <name>.transcript.json   timestamped segments
+#     <name>.insights.md       insight sections
+#     <name>.meeting.json      meeting id, coverage results and source info
+#
+# A video whose .meeting.json matches its current size and modification
+# time is skipped.
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".webm")
+POLL_SECONDS = 5
+
+
+def find_videos(pattern):
+    """Videos under a directory (recursively) or matching a glob, sorted."""
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, "**", "*")
+    return sorted(path for path in glob.glob(pattern, recursive=True)
+                  if os.path.isfile(path) and path.lower().endswith(VIDEO_EXTENSIONS))
+
+
+def load_discussion_points(path):
+    """Reads a JSON list of points, or a text file with one point per line ('#' starts a comment)."""
+    if not path:
+        return []
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".json"):
+            return [str(point) for point in json.load(f)]
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+def output_path(video_path, suffix):
+    return os.path.splitext(video_path)[0] + suffix
+
+
+def source_info(video_path):
+    stat = os.stat(video_path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def is_processed(video_path):
+    try:
+        with open(output_path(video_path, ".meeting.json"), encoding="utf-8") as f:
+            return json.load(f).get("source") == source_info(video_path)
+    except (OSError, ValueError):
+        return False
+
+
+def write_outputs(video_path, job):
+    """Writes a finished job's transcript, insights and coverage next to the video."""
+    meeting_id = jobs.load_checkpoint(job["id"], "probe")["meeting_id"]
+    saved = artifacts.get_meeting(meeting_id)
+    with open(output_path(video_path, ".transcript.json"), "w", encoding="utf-8") as f:
+        json.dump({"meeting_id": meeting_id, "segments": saved["segments"]}, f, indent=2)
+    with open(output_path(video_path, ".insights.md"), "w", encoding="utf-8") as f:
+        f.write(saved["insights"] or "")
+    # Written last: its presence marks the video as processed
+    with open(output_path(video_path, ".meeting.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "meeting_id": meeting_id,
+            "source": source_info(video_path),
+            "processed_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "duration": saved["duration"],
+            "discussion_points": saved["discussion_points"],
+            "coverage": saved["coverage"],
+            "chunk_ids": saved["chunk_ids"],
+        }, f, indent=2)
+
+
+def job_matches_file(job, video_path):
+    """Whether a job processed the file's current content, rather than a file since replaced at the same path."""
+    probe = jobs.load_checkpoint(job["id"], "probe") or {}
+    return probe.get("meeting_id") == documents.file_hash(video_path)
+
+
+def queue_videos(videos, discussion_points, force=False):
+    """Queues the videos that still need processing and returns {video_path: job_id}."""
+    queued = {}
+    for video_path in videos:
+        if not force and is_processed(video_path):
+            logger.info(f"Skipping {video_path}: already processed")
+            continue
+        job = jobs.find_job(video_path)
+        if job and job["status"] in ("queued", "running"):
+            # Left over from an interrupted run; a worker picks it up again
+            queued[video_path] = job["id"]
+        elif (job and job["status"] == "done" and not force and job["discussion_points"] == discussion_points
+              and job_matches_file(job, video_path)):
+            # Finished before its results were written out
+            queued[video_path] = job["id"]
+        elif job and job["status"] == "failed" and job["discussion_points"] == discussion_points:
+            jobs.retry(job["id"])
+            queued[video_path] = job["id"]
+        else:
+            queued[video_path] = jobs.enqueue(video_path, discussion_points, name=os.path.basename(video_path))
+    return queued
+
+
+def run_jobs(queued, worker_count):
+    """
+    Runs worker processes until every queued job has finished, logging
+    progress. Workers exit once nothing is claimable, which can happen while
+    a job from an interrupted run still looks alive, so they are restarted
+    until that job's heartbeat goes stale and it is reclaimed.
+    """
+    workers = []
+    while True:
+        states = [jobs.get_job(job_id) for job_id in queued.values()]
+        pending = [job for job in states if job["status"] not in ("done", "failed")]
+        if not pending:
+            return
+        logger.info(f"{len(states) - len(pending)}/{len(states)} recordings finished "
+                    f"({sum(jobs.overall_progress(job) for job in states) / len(states):.0%})")
+        workers = [process for process in workers if process.is_alive()]
+        if not workers:
+            workers = jobs.start_workers(min(worker_count, len(pending)), once=True)
+        time.sleep(POLL_SECONDS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Process a directory or glob of meeting recordings.")
+    parser.add_argument("videos", help="Directory (searched recursively) or glob pattern of videos")
+    parser.add_argument("--points", help="Discussion points: a JSON list or a text file with one point per line")
+    parser.add_argument("--workers", type=int, default=max(1, jobs.JOB_WORKERS), help="Recordings processed at once")
+    parser.add_argument("--force", action="store_true", help="Process videos that already have results")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    if not os.getenv("GEMINI_API_KEY"):
+        parser.error("GEMINI_API_KEY must be set to generate meeting insights")
+    videos = find_videos(args.videos)
+    if not videos:
+        parser.error(f"No videos found for {args.videos}")
+    discussion_points = load_discussion_points(args.points)
+
+    queued = queue_videos(videos, discussion_points, force=args.force)
+    logger.info(f"{len(videos)} videos found, {len(queued)} to process with {args.workers} workers")
+    if queued:
+        started = time.monotonic()
+        run_jobs(queued, args.workers)
+        logger.info(f"Finished in {summarize.format_timestamp(time.monotonic() - started)}")
+
+    failed = 0
+    for video_path, job_id in queued.items():
+        job = jobs.get_job(job_id)
+        if job["status"] == "done":
+            write_outputs(video_path, job)
+        else:
+            failed += 1
+            logger.error(f"{video_path}: {job['status']} during {job['stage']}: {job['error']}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+import os
+import re
+
+from tasks import documents
+
+# -------------------- Answer Context Assembly -------------------- #
+# Turns ranked retrieval hits into the context block of an answer prompt:
+# overlapping or duplicate text is removed, snippets are added in rank
+# order until the token budget is spent (the last one is truncated to fit),
+# and each snippet is labelled with a numbered citation of its source so
+# answers can refer to it. Tokens are counted with the embedding model's
+# tokenizer, which tracks Gemini's count closely enough for budgeting.
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+# Hits retrieved before deduplication and budgeting
+CONTEXT_CANDIDATES = int(os.getenv("CONTEXT_CANDIDATES", "12"))
+# A snippet is only truncated into the remaining budget if at least this many tokens fit
+MIN_SNIPPET_TOKENS = 40
+# Longest overlap, in words, looked for between chunks of the same source
+MAX_OVERLAP_WORDS = 80
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+def count_tokens(text):
+    return len(documents.get_tokenizer()(text, add_special_tokens=False)["input_ids"])
+
+
+def truncate_tokens(text, max_tokens):
+    """Cuts text after its first `max_tokens` tokens."""
+    offsets = documents.get_tokenizer()(text, add_special_tokens=False, return_offsets_mapping=True)["offset_mapping"]
+    if len(offsets) <= max_tokens:
+        return text
+    return text[:offsets[max_tokens - 1][1]].rstrip() + " ..."
+
+
+def _normalized(text):
+    return _SPACE_RE.sub(" ", text).strip().lower()
+
+
+def _overlap_words(left, right, max_words=MAX_OVERLAP_WORDS):
+    """Number of words at the end of `left` that repeat at the start of `right`."""
+    left_words = [word.lower() for word in left.split()]
+    right_words = [word.lower() for word in right.split()]
+    for size in range(min(max_words, len(left_words), len(right_words)), 0, -1):
+        if left_words[-size:] == right_words[:size]:
+            return size
+    return 0
+
+
+def strip_overlap(previous, text):
+    """Removes the start of `text` that repeats the end of `previous`."""
+    size = _overlap_words(previous, text)
+    return " ".join(text.split()[size:]) if size else text
+
+
+def strip_tail(text, following):
+    """Removes the end of `text` that repeats the start of `following`."""
+    size = _overlap_words(text, following)
+    return " ".join(text.split()[:-size]) if size else text
+
+
+def source_key(metadata):
+    """Identifies the document or meeting a chunk belongs to."""
+    metadata = metadata or {}
+    return metadata.get("meeting_id") or metadata.get("doc_id") or metadata.get("source")
+
+
+def describe_source(metadata, meeting_names=None):
+    """Citation text for a chunk, e.g. "Meeting: Weekly sync (part 3)"."""
+    metadata = metadata or {}
+    part = f" (part {metadata['chunk'] + 1})" if isinstance(metadata.get("chunk"), int) else ""
+    if metadata.get("type") == "transcript" or metadata.get("meeting_id"):
+        meeting_id = metadata.get("meeting_id", "")
+        name = (meeting_names or {}).get(meeting_id) or f"meeting {meeting_id[:8]}"
+        return f"Meeting: {name}{part}"
+    return f"Document: {metadata.get('source') or metadata.get('doc_id') or 'unknown'}{part}"
+
+
+def deduplicate(hits):
+    """
+    Drops hits whose text is already contained in a better-ranked one, and
+    trims the repeated text where a chunk overlaps a selected chunk of the
+    same source (adjacent chunks share CHUNK_OVERLAP tokens).
+    """
+    selected = []
+    for hit in hits:
+        text = hit["text"] or ""
+        normalized = _normalized(text)
+        if not normalized or any(normalized in _normalized(kept["text"]) for kept in selected):
+            continue
+        key = source_key(hit.get("metadata"))
+        chunk = (hit.get("metadata") or {}).get("chunk")
+        for kept in selected:
+            kept_chunk = (kept.get("metadata") or {}).get("chunk")
+            if key is None or source_key(kept.get("metadata")) != key or chunk is None or kept_chunk is None:
+                continue
+            if kept_chunk == chunk - 1:
+                text = strip_overlap(kept["text"], text)
+            elif kept_chunk == chunk + 1:
+                text = strip_tail(text, kept["text"])
+        if text.strip():
+            selected.append(dict(hit, text=text))
+    return selected
+
+
+def build_context(hits, token_budget=CONTEXT_TOKEN_BUDGET, meeting_names=None):
+    """
+    Assembles ranked hits into a cited context block. Returns
+    {"text", "tokens", "snippets"}, where each snippet has its citation
+    number, source description, text, token count and retrieval score.
+    """
+    snippets = []
+    used = 0
+    for hit in deduplicate(hits):
+        source = describe_source(hit.get("metadata"), meeting_names)
+        label = f"[{len(snippets) + 1}] {source}"
+        header_tokens = count_tokens(label) + 1
+        text = hit["text"].strip()
+        tokens = count_tokens(text)
+        remaining = token_budget - used - header_tokens
+        if tokens > remaining:
+            if remaining < MIN_SNIPPET_TOKENS:
+                break
+            # One token is left for the ellipsis marking the cut
+            text = truncate_tokens(text, remaining - 1)
+            tokens = count_tokens(text)
+        snippets.append({"label": label, "source": source, "text": text, "tokens": tokens,
+                         "score": hit.get("score")})
+        used += header_tokens + tokens
+        if used >= token_budget - MIN_SNIPPET_TOKENS:
+            break
+    return {
+        "text": "\n\n".join(f"{snippet['label']}\n{snippet['text']}" for snippet in snippets),
+        "tokens": used,
+        "snippets": snippets,
+    }
@@ -0,0 +1,142 @@
+import logging
+import threading
+from collections import OrderedDict
+
+from tasks import documents, models, summarize
+
+logger = logging.getLogger(__name__)
+
+# -------------------- Discussion Point Coverage -------------------- #
+# The transcript is grouped into short time windows, every window and point
+# is embedded once (in batches), and the whole windows x points cosine
+# similarity matrix is computed with a single matrix product. A point counts
+# as covered when its best match clears its threshold; its score is the mean
+# similarity of its top-k windows.
+
+COVERAGE_WINDOW_SECONDS = 30
+TOP_K = 3
+EMBED_BATCH_SIZE = 64
+# Without adaptive thresholds every point uses COVERAGE_THRESHOLD. With them,
+# a point's threshold is mean + ADAPTIVE_Z * std of its similarities to all
+# windows, clamped to [COVERAGE_FLOOR, COVERAGE_THRESHOLD]: a point that is
+# far more similar to a few windows than to the rest of the meeting counts
+# as covered even if its absolute similarity is modest.
+COVERAGE_THRESHOLD = 0.6
+COVERAGE_FLOOR = 0.4
+ADAPTIVE_Z = 2.5
+
+EMBEDDING_CACHE_SIZE = 20000
+
+_embedding_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def embed_texts(texts, batch_size=EMBED_BATCH_SIZE):
+    """
+    Returns L2-normalised embeddings for `texts` as a float32 matrix. Texts
+    seen recently are served from an in-process cache, so re-scoring a
+    growing live transcript only embeds the new windows.
+    """
+    import numpy as np
+
+    keys = [documents.content_hash(text) for text in texts]
+    vectors = [None] * len(texts)
+    missing = []
+    with _cache_lock:
+        for idx, key in enumerate(keys):
+            vector = _embedding_cache.get(key)
+            if vector is None:
+                missing.append(idx)
+            else:
+                _embedding_cache.move_to_end(key)
+                vectors[idx] = vector
+
+    if missing:
+        encoded = models.get_embedder().encode(
+            [texts[idx] for idx in missing], batch_size=batch_size,
+            normalize_embeddings=True, convert_to_numpy=True,
+        ).astype(np.float32)
+        with _cache_lock:
+            for idx, vector in zip(missing, encoded):
+                vectors[idx] = vector
+                _embedding_cache[keys[idx]] = vector
+            while len(_embedding_cache) > EMBEDDING_CACHE_SIZE:
+                _embedding_cache.popitem(last=False)
+
+    if not vectors:
+        return np.zeros((0, 0), dtype=np.float32)
+    return np.stack(vectors)
+
+
+def transcript_windows(segments, window_seconds=COVERAGE_WINDOW_SECONDS):
+    """Groups timestamped segments into windows; untimed segments are used as they are."""
+    if all(segment.get("start") is not None for segment in segments):
+        return summarize.group_segments(segments, window_seconds)
+    return [segment for segment in segments if segment["text"].strip()]
+
+
+def text_to_segments(text):
+    """Splits an untimed transcript into chunk-sized pseudo segments."""
+    return [{"start": None, "end": None, "text": chunk} for chunk in documents.chunk_text_blocks([text])]
+
+
+def score_coverage(discussion_points, segments, top_k=TOP_K, threshold=COVERAGE_THRESHOLD, adaptive=True,
+                   point_thresholds=None, window_seconds=COVERAGE_WINDOW_SECONDS):
+    """
+    Scores how well each discussion point was covered. Returns one dict per
+    point with "point", "covered", "score", "threshold" and "matches", the
+    top-k windows as {"start", "end", "similarity", "text"}.
+    `point_thresholds` maps points to fixed thresholds that override the
+    global and adaptive ones.
+    """
+    import numpy as np
+
+    windows = transcript_windows(segments, window_seconds)
+    if not discussion_points:
+        return []
+    if not windows:
+        return [{"point": point, "covered": False, "score": 0.0, "threshold": threshold, "matches": []}
+                for point in discussion_points]
+
+    window_embeddings = embed_texts([window["text"] for window in windows])
+    point_embeddings = embed_texts(list(discussion_points))
+    similarities = window_embeddings @ point_embeddings.T  # windows x points
+
+    k = min(top_k, len(windows))
+    top = np.argpartition(-similarities, k - 1, axis=0)[:k]
+    top_similarities = np.take_along_axis(similarities, top, axis=0)
+    order = np.argsort(-top_similarities, axis=0)
+    top = np.take_along_axis(top, order, axis=0)
+    top_similarities = np.take_along_axis(top_similarities, order, axis=0)
+    scores = top_similarities.mean(axis=0)
+
+    thresholds = np.full(len(discussion_points), threshold, dtype=np.float32)
+    if adaptive and len(windows) > 1:
+        spread = similarities.mean(axis=0) + ADAPTIVE_Z * similarities.std(axis=0)
+        thresholds = np.clip(spread, min(COVERAGE_FLOOR, threshold), threshold)
+    for idx, point in enumerate(discussion_points):
+        if point_thresholds and point in point_thresholds:
+            thresholds[idx] = point_thresholds[point]
+
+    results = []
+    for idx, point in enumerate(discussion_points):
+        matches = [
+            {"start": windows[w]["start"], "end": windows[w]["end"],
+             "similarity": float(top_similarities[rank, idx]), "text": windows[w]["text"]}
+            for rank, w in enumerate(top[:, idx])
+        ]
+        results.append({
+            "point": point,
+            "covered": bool(top_similarities[0, idx] >= thresholds[idx]),
+            "score": float(scores[idx]),
+            "threshold": float(thresholds[idx]),
+            "matches": matches,
+        })
+    return results
+
+
+def format_match_times(result):
+    """Timestamps of a point's covered matches, e.g. "12:30, 45:10"."""
+    times = [summarize.format_timestamp(match["start"]) for match in result["matches"]
+             if match["start"] is not None and match["similarity"] >= result["threshold"]]
+    return ", ".join(times)
@@ -0,0 +1,150 @@
+import hashlib
+import io
+import logging
+
+from tasks import models
+
+logger = logging.getLogger(__name__)
+
+# all-MiniLM-L6-v2 truncates its input at 256 word pieces, so chunks are kept
+# comfortably below that and overlap a little to keep sentences that straddle
+# a boundary retrievable from either side.
+CHUNK_TOKENS = 200
+CHUNK_OVERLAP = 40
+
+# Plain text is read in blocks of this many characters so a multi-MB upload
+# never has to be tokenized in one go.
+TEXT_BLOCK_CHARS = 20000
+DOCX_BLOCK_PARAGRAPHS = 50
+
+HASH_READ_SIZE = 1024 * 1024
+
+
+def get_tokenizer():
+    """The word-piece tokenizer of the shared embedding model."""
+    return models.get_embedder().tokenizer
+
+
+# -------------------- Content Hashing -------------------- #
+def content_hash(data):
+    """Returns the SHA-256 hex digest of a string or bytes object."""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_hash(file):
+    """
+    Returns the SHA-256 hex digest of a file, given either a path or a
+    binary file-like object, reading it in fixed-size blocks.
+    """
+    digest = hashlib.sha256()
+    if isinstance(file, (str, bytes)) or hasattr(file, "__fspath__"):
+        with open(file, "rb") as f:
+            for block in iter(lambda: f.read(HASH_READ_SIZE), b""):
+                digest.update(block)
+    else:
+        file.seek(0)
+        for block in iter(lambda: file.read(HASH_READ_SIZE), b""):
+            digest.update(block)
+        file.seek(0)
+    return digest.hexdigest()
+
+
+# -------------------- Text Extraction -------------------- #
+def _iter_pdf_blocks(file):
+    from pypdf import PdfReader
+    reader = PdfReader(file)
+    for page in reader.pages:
+        yield page.extract_text() or ""
+
+
+def _iter_docx_blocks(file):
+    import docx
+    document = docx.Document(file)
+    paragraphs = []
+    for paragraph in document.paragraphs:
+        if paragraph.text.strip():
+            paragraphs.append(paragraph.text)
+        if len(paragraphs) >= DOCX_BLOCK_PARAGRAPHS:
+            yield "\n".join(paragraphs)
+            paragraphs = []
+    for table in document.tables:
+        for row in table.rows:
+            paragraphs.append(" | ".join(cell.text for cell in row.cells))
+    if paragraphs:
+        yield "\n".join(paragraphs)
+
+
+def _iter_plain_text_blocks(file):
+    reader = io.TextIOWrapper(file, encoding="utf-8", errors="replace")
+    try:
+        pending = ""
+        while True:
+            data = reader.read(TEXT_BLOCK_CHARS)
+            if not data:
+                break
+            data = pending + data
+            # Cut at the last whitespace so words are not split across blocks
+            cut = max(data.rfind(" "), data.rfind("\n"))
+            if cut <= 0:
+                cut = len(data)
+            yield data[:cut]
+            pending = data[cut:]
+        if pending:
+            yield pending
+    finally:
+        # Do not let the wrapper close the uploaded file when it is collected
+        reader.detach()
+
+
+def iter_text_blocks(file):
+    """
+    Yields the text of an uploaded file block by block (pages for PDF,
+    groups of paragraphs for DOCX, fixed-size blocks for plain text).
+    """
+    file.seek(0)
+    name = file.name.lower()
+    if name.endswith(".pdf"):
+        yield from _iter_pdf_blocks(file)
+    elif name.endswith(".docx"):
+        yield from _iter_docx_blocks(file)
+    else:
+        yield from _iter_plain_text_blocks(file)
+
+
+# -------------------- Chunking -------------------- #
+def chunk_text_blocks(blocks, chunk_tokens=CHUNK_TOKENS, overlap_tokens=CHUNK_OVERLAP):
+    """
+    Splits a stream of text blocks into chunks of at most `chunk_tokens`
+    word pieces, each overlapping the previous one by `overlap_tokens`.
+    Only the unfinished tail of the previous block is kept in memory.
+    """
+    if overlap_tokens >= chunk_tokens:
+        raise ValueError("overlap_tokens must be smaller than chunk_tokens")
+
+    tokenizer = get_tokenizer()
+    stride = chunk_tokens - overlap_tokens
+    carry = ""
+    for block in blocks:
+        text = f"{carry} {block}".strip() if carry else block.strip()
+        if not text:
+            continue
+        offsets = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)["offset_mapping"]
+        if not offsets:
+            carry = ""
+            continue
+        start = 0
+        # Emit every full window; the last partial one is carried into the next block
+        while len(offsets) - start > chunk_tokens:
+            end = start + chunk_tokens
+            yield text[offsets[start][0]:offsets[end - 1][1]]
+            start += stride
+        carry = text[offsets[start][0]:]
+    if carry.strip():
+        yield carry.strip()
+
+
+def iter_document_chunks(file, chunk_tokens=CHUNK_TOKENS, overlap_tokens=CHUNK_OVERLAP):
+    """Extracts and chunks an uploaded file lazily."""
+    return chunk_text_blocks(iter_text_blocks(file), chunk_tokens, overlap_tokens)
@@ -0,0 +1,454 @@
+import argparse
+import atexit
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+
+from tasks import artifacts, documents, recording, sqlite_store, summarize, transcription, vector_store
+
+logger = logging.getLogger(__name__)
+
+# -------------------- Background Video Processing Jobs -------------------- #
+# Recordings are processed outside the Streamlit script run by worker
+# processes that share a SQLite job table. Each job runs the stages below in
+# order and writes a checkpoint after every stage (and periodically during
+# transcription) to its directory under JOBS_DIR, so a job whose worker died
+# is picked up again by another worker and resumes from its last checkpoint.
+#
+# Audio is decoded straight from the container, so the old convert step is a
+# "probe" stage that checks for an audio track and reads the duration.
+#
+# A job's input can also be a live recording session (see recording.py):
+# its completed segments are transcribed in order. While the call is still
+# being recorded, the transcribe stage transcribes the segments completed so
+# far and then defers the job, which returns it to the queue for
+# SESSION_POLL_SECONDS, so processing starts before the call ends without
+# holding a worker for the rest of it.
+
+JOBS_DIR = os.getenv("JOBS_DIR", os.path.join(os.getcwd(), "jobs"))
+JOBS_DB_PATH = os.path.join(JOBS_DIR, "jobs.sqlite3")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "1"))
+STAGES = ("probe", "transcribe", "index", "insights")
+# A running job whose heartbeat is older than this is considered abandoned
+STALE_SECONDS = 120
+HEARTBEAT_SECONDS = 10
+# Seconds between saves of the partial transcript and insight sections the job list shows
+PARTIAL_SAVE_SECONDS = 2
+POLL_SECONDS = 2
+# How long a job following a live recording waits before checking for new segments
+SESSION_POLL_SECONDS = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    video_path TEXT NOT NULL,
+    name TEXT NOT NULL,
+    discussion_points TEXT NOT NULL,
+    cleanup INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    stage TEXT,
+    completed_stages TEXT NOT NULL DEFAULT '[]',
+    progress REAL NOT NULL DEFAULT 0,
+    message TEXT,
+    error TEXT,
+    worker_pid INTEGER,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    heartbeat REAL,
+    available_at REAL NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created);
+"""
+
+def _migrate(connection):
+    columns = {row["name"] for row in connection.execute("PRAGMA table_info(jobs)")}
+    if "available_at" not in columns:
+        try:
+            connection.execute("ALTER TABLE jobs ADD COLUMN available_at REAL NOT NULL DEFAULT 0")
+        except sqlite3.OperationalError:
+            # Another process added it first
+            pass
+
+
+def _connection():
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    return sqlite_store.connect(JOBS_DB_PATH, SCHEMA, row_factory=sqlite3.Row, migrate=_migrate)
+
+
+class Deferred(Exception):
+    """Raised by a stage to return its job to the queue for `seconds`, keeping its checkpoints."""
+    def __init__(self, seconds, message):
+        super().__init__(message)
+        self.seconds = seconds
+
+
+def job_dir(job_id):
+    return os.path.join(JOBS_DIR, job_id)
+
+
+def _to_dict(row):
+    job = dict(row)
+    job["discussion_points"] = json.loads(job["discussion_points"])
+    job["completed_stages"] = json.loads(job["completed_stages"])
+    return job
+
+
+# -------------------- Queue API -------------------- #
+def enqueue(video_path, discussion_points=None, name=None, copy=False, cleanup=False, checkpoints=None):
+    """
+    Adds a recording to the queue and returns the job id. With `copy` the
+    file is first copied into the job directory, for sources that will not
+    outlive the request (e.g. uploads). With `cleanup` the job's input is
+    deleted once the job has finished. `checkpoints` ({name: data}) are
+    saved before the job starts, e.g. {"segments": [...]} for a transcript
+    that already exists, so the work they hold is not repeated.
+    """
+    job_id = uuid.uuid4().hex
+    name = name or os.path.basename(video_path)
+    os.makedirs(job_dir(job_id), exist_ok=True)
+    for checkpoint, data in (checkpoints or {}).items():
+        save_checkpoint(job_id, checkpoint, data)
+    if copy:
+        target = os.path.join(job_dir(job_id), "input" + os.path.splitext(video_path)[1])
+        shutil.copyfile(video_path, target)
+        video_path = target
+    now = time.time()
+    _connection().execute(
+        "INSERT INTO jobs (id, video_path, name, discussion_points, cleanup, status, created, updated) "
+        "VALUES (?, ?, ?, ?, ?, 'queued', ?, ?)",
+        (job_id, os.path.abspath(video_path), name,
+         json.dumps(list(discussion_points or [])), int(cleanup), now, now),
+    )
+    return job_id
+
+
+def get_job(job_id):
+    row = _connection().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return _to_dict(row) if row else None
+
+
+def list_jobs(limit=20):
+    rows = _connection().execute("SELECT * FROM jobs ORDER BY created DESC LIMIT ?", (limit,)).fetchall()
+    return [_to_dict(row) for row in rows]
+
+
+def overall_progress(job):
+    """Fraction of the whole job completed, counting each stage equally."""
+    if job["status"] == "done":
+        return 1.0
+    done = len(job["completed_stages"])
+    current = job["progress"] if job["stage"] and job["stage"] not in job["completed_stages"] else 0.0
+    return min((done + current) / len(STAGES), 1.0)
+
+
+def find_job(video_path):
+    """The newest job for a recording, or None."""
+    row = _connection().execute(
+        "SELECT * FROM jobs WHERE video_path = ? ORDER BY created DESC LIMIT 1", (os.path.abspath(video_path),)
+    ).fetchone()
+    return _to_dict(row) if row else None
+
+
+def active_inputs():
+    """Recordings used by queued or running jobs, which must not be pruned."""
+    rows = _connection().execute("SELECT video_path FROM jobs WHERE status IN ('queued', 'running')").fetchall()
+    return [row["video_path"] for row in rows]
+
+
+def retry(job_id):
+    """Puts a failed job back in the queue; completed stages are not repeated."""
+    _connection().execute(
+        "UPDATE jobs SET status = 'queued', error = NULL, updated = ? WHERE id = ? AND status = 'failed'",
+        (time.time(), job_id),
+    )
+
+
+def load_checkpoint(job_id, name, default=None):
+    path = os.path.join(job_dir(job_id), f"{name}.json")
+    if not os.path.exists(path):
+        return default
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_checkpoint(job_id, name, data):
+    # Write then rename so a crash never leaves a half-written checkpoint
+    path = os.path.join(job_dir(job_id), f"{name}.json")
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(path + ".tmp", path)
+
+
+def _claim_next_job():
+    """Atomically takes the oldest queued job, or one whose worker stopped sending heartbeats."""
+    connection = _connection()
+    now = time.time()
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        row = connection.execute(
+            "SELECT * FROM jobs WHERE (status = 'queued' AND available_at <= ?) "
+            "OR (status = 'running' AND heartbeat < ?) ORDER BY created LIMIT 1",
+            (now, now - STALE_SECONDS),
+        ).fetchone()
+        if row is None:
+            connection.execute("COMMIT")
+            return None
+        connection.execute(
+            "UPDATE jobs SET status = 'running', worker_pid = ?, heartbeat = ?, attempts = attempts + 1, "
+            "updated = ? WHERE id = ?",
+            (os.getpid(), now, now, row["id"]),
+        )
+        connection.execute("COMMIT")
+    except sqlite3.Error:
+        connection.execute("ROLLBACK")
+        raise
+    return _to_dict(row)
+
+
+def _update(job_id, **fields):
+    fields["updated"] = time.time()
+    fields["heartbeat"] = fields["updated"]
+    assignments = ", ".join(f"{name} = ?" for name in fields)
+    _connection().execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+
+# -------------------- Stages -------------------- #
+def _stage_probe(job, report):
+    import av
+    if recording.is_session(job["video_path"]):
+        # The segments may still be recording, so their length is only known as they complete
+        save_checkpoint(job["id"], "probe", {"duration": None, "session": True,
+                                             "meeting_id": recording.session_meeting_id(job["video_path"])})
+        return
+    with av.open(job["video_path"]) as container:
+        if not container.streams.audio:
+            raise ValueError("The video does not contain an audio track.")
+        duration = container.duration / av.time_base if container.duration else None
+    save_checkpoint(job["id"], "probe", {"duration": duration, "meeting_id": documents.file_hash(job["video_path"])})
+
+
+def _stage_transcribe(job, report):
+    probe = load_checkpoint(job["id"], "probe", {})
+    # A recording processed before already has its segments in the artifacts store
+    stored = artifacts.get_segments(probe["meeting_id"])
+    if stored:
+        save_checkpoint(job["id"], "segments", stored)
+        return
+    # A transcript handed over at enqueue time, e.g. the one built during a live call
+    provided = load_checkpoint(job["id"], "segments")
+    if provided:
+        artifacts.save_meeting(probe["meeting_id"], name=job["name"], segments=provided,
+                               discussion_points=job["discussion_points"])
+        return
+    duration = probe.get("duration")
+    # Resume after the last segment saved before an interruption
+    partial = load_checkpoint(job["id"], "segments_partial", {"segments": [], "until": 0})
+    segments = partial["segments"]
+    last_save = time.monotonic()
+    if probe.get("session"):
+        # Only the segments completed now; a session still recording is picked up again later
+        manifest = recording.load_manifest(job["video_path"])
+        covered = duration = recording.recorded_seconds(manifest)
+        source = recording.transcribe_session(job["video_path"], start_seconds=partial["until"], until=covered)
+    else:
+        source = transcription.transcribe(job["video_path"], start_seconds=partial["until"])
+    for segment in source:
+        segments.append(segment)
+        if time.monotonic() - last_save > PARTIAL_SAVE_SECONDS:
+            save_checkpoint(job["id"], "segments_partial", {"segments": segments, "until": segment["end"]})
+            last_save = time.monotonic()
+            report(min(segment["end"] / duration, 1.0) if duration else 0.0,
+                   f"Transcribed {summarize.format_timestamp(segment['end'])}")
+    if probe.get("session") and recording.is_active(manifest):
+        save_checkpoint(job["id"], "segments_partial", {"segments": segments,
+                                                        "until": max(covered, partial["until"])})
+        raise Deferred(SESSION_POLL_SECONDS, f"Transcribed {summarize.format_timestamp(covered)}, "
+                                             f"waiting for the call to continue")
+    if not segments:
+        raise ValueError("No speech was transcribed from the recording.")
+    save_checkpoint(job["id"], "segments", segments)
+    artifacts.save_meeting(probe["meeting_id"], name=job["name"], segments=segments,
+                           discussion_points=job["discussion_points"])
+
+
+def _stage_index(job, report):
+    from tasks import QnA
+    meeting_id = load_checkpoint(job["id"], "probe")["meeting_id"]
+    # Always indexed: chunks stored by an earlier, interrupted run are skipped, not embedded again
+    text = transcription.segments_to_text(load_checkpoint(job["id"], "segments"))
+    chunk_ids = QnA.add_meeting_transcript(meeting_id, text)
+    if chunk_ids is None:
+        raise RuntimeError("Could not add the transcript to the knowledge base.")
+    artifacts.save_meeting(meeting_id, chunk_ids=chunk_ids)
+
+
+def _stage_insights(job, report):
+    from tasks import llm, meeting
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        raise RuntimeError("GEMINI_API_KEY is not set for the job worker.")
+    segments = load_checkpoint(job["id"], "segments")
+    sections = {}
+    coverage_results = []
+    errors = {}
+    last_save = time.monotonic()
+
+    def on_section(analysis_type, markdown):
+        # Sections grow token by token; the job list shows them from this checkpoint
+        nonlocal last_save
+        sections[analysis_type] = markdown
+        if time.monotonic() - last_save > PARTIAL_SAVE_SECONDS:
+            save_checkpoint(job["id"], "sections_partial", sections)
+            last_save = time.monotonic()
+
+    insights = meeting.generate_meeting_insights(
+        transcription.segments_to_text(segments), job["discussion_points"],
+        client=llm.get_client(api_key), segments=segments,
+        on_section=on_section, on_coverage=coverage_results.extend, on_error=errors.__setitem__,
+    )
+    if insights is None:
+        raise RuntimeError("Failed to generate meeting insights.")
+    if errors:
+        # Fail the job so it can be retried, rather than saving the error messages as its insights
+        raise RuntimeError("Failed to generate insight sections: " + "; ".join(
+            f"{analysis_type.rstrip(':')} ({str(error)})" for analysis_type, error in errors.items()))
+    save_checkpoint(job["id"], "insights", {"markdown": insights})
+    artifacts.save_meeting(load_checkpoint(job["id"], "probe")["meeting_id"], name=job["name"],
+                           discussion_points=job["discussion_points"], insights=insights, sections=sections,
+                           coverage_results=coverage_results)
+
+
+STAGE_FUNCTIONS = {
+    "probe": _stage_probe,
+    "transcribe": _stage_transcribe,
+    "index": _stage_index,
+    "insights": _stage_insights,
+}
+
+
+def run_job(job):
+    """
+    Runs the stages of a claimed job that have not completed yet. A stage
+    that raises Deferred puts the job back in the queue to resume later.
+    """
+    completed = list(job["completed_stages"])
+    for stage in STAGES:
+        if stage in completed:
+            continue
+        _update(job["id"], stage=stage, progress=0.0, message=f"Running {stage}")
+
+        def report(progress, message=None, stage=stage):
+            _update(job["id"], stage=stage, progress=progress, message=message)
+
+        try:
+            STAGE_FUNCTIONS[stage](job, report)
+        except Deferred as e:
+            _update(job["id"], status="queued", worker_pid=None, available_at=time.time() + e.seconds,
+                    message=str(e))
+            return
+        completed.append(stage)
+        _update(job["id"], completed_stages=json.dumps(completed), progress=1.0, message=f"Finished {stage}")
+
+    _update(job["id"], status="done", stage=None, message="Done")
+    if job["cleanup"]:
+        try:
+            if os.path.isdir(job["video_path"]):
+                shutil.rmtree(job["video_path"])
+            else:
+                os.remove(job["video_path"])
+        except OSError as e:
+            logger.error(f"Error deleting processed recording {job['video_path']}: {str(e)}")
+
+
+def _heartbeat(job_id, stop):
+    while not stop.wait(HEARTBEAT_SECONDS):
+        try:
+            _update(job_id)
+        except sqlite3.Error as e:
+            logger.error(f"Error updating heartbeat of job {job_id}: {str(e)}")
+
+
+def worker_loop(poll_seconds=POLL_SECONDS, once=False, parent_pid=None):
+    """
+    Processes queued jobs until interrupted (or until the queue is empty with
+    `once`). A worker started by another process exits once that process is
+    gone, so workers are not left behind when the app is killed.
+    """
+    logging.basicConfig(level=logging.INFO)
+    if vector_store.VECTOR_BACKEND == "chroma":
+        logger.warning("VECTOR_BACKEND=chroma: this worker opens its own ChromaDB client, which is not safe while "
+                       "the app or other workers use the same directory; use VECTOR_BACKEND=int8")
+    while True:
+        if parent_pid is not None and os.getppid() != parent_pid:
+            logger.info(f"Worker {os.getpid()} exiting: its parent process has stopped")
+            return
+        job = _claim_next_job()
+        if job is None:
+            if once:
+                return
+            time.sleep(poll_seconds)
+            continue
+
+        logger.info(f"Worker {os.getpid()} processing job {job['id']} ({job['name']})")
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=_heartbeat, args=(job["id"], stop), daemon=True)
+        heartbeat.start()
+        try:
+            run_job(job)
+        except Exception as e:
+            logger.error(f"Job {job['id']} failed: {str(e)}")
+            _update(job["id"], status="failed", error=str(e))
+        finally:
+            stop.set()
+            heartbeat.join()
+
+
+def start_workers(count=JOB_WORKERS, once=False):
+    """
+    Starts `count` worker processes and returns them; with `once` they exit
+    when the queue is empty. Workers are not daemonic, because the parallel
+    transcription mode starts a process pool inside them, so they are
+    terminated explicitly when this process exits.
+    """
+    import multiprocessing
+    context = multiprocessing.get_context("spawn")
+    workers = []
+    for _ in range(count):
+        process = context.Process(target=worker_loop, kwargs={"once": once, "parent_pid": os.getpid()},
+                                  name="meeting-job-worker")
+        process.start()
+        workers.append(process)
+    # Registered after multiprocessing's own exit handler, so it runs first and that handler has nothing to wait for
+    atexit.register(stop_workers, workers)
+    return workers
+
+
+def stop_workers(workers, timeout=5):
+    """Terminates worker processes; a job they were running is reclaimed once its heartbeat goes stale."""
+    for process in workers:
+        if process.is_alive():
+            process.terminate()
+    for process in workers:
+        process.join(timeout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run meeting processing job workers.")
+    parser.add_argument("--workers", type=int, default=JOB_WORKERS)
+    parser.add_argument("--once", action="store_true", help="Exit when the queue is empty")
+    args = parser.parse_args()
+    if args.workers == 1 or args.once:
+        worker_loop(once=args.once)
+    else:
+        for process in start_workers(args.workers):
+            process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,47 @@
-import uuid
-from pathlib import Path
+import time
 import streamlit as st
-from aiortc.contrib.media import MediaRecorder
 from streamlit_webrtc import WebRtcMode, webrtc_streamer, VideoProcessorBase
 
-from tasks import meeting
+from tasks import jobs, meeting, recording, summarize, transcription
+from tasks.live_transcription import LiveTranscriber
 # Set up logging
 import logging
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-# Create a directory for storing recordings
-RECORD_DIR = Path("./records")
-RECORD_DIR.mkdir(exist_ok=True)
+# Seconds between refreshes of the live transcript while the call is running
+LIVE_REFRESH_SECONDS = 2
+
+
+def render_live_status(segments, covered, not_covered, discussion_points):
+    st.write("Live transcript:")
+    st.write(transcription.segments_to_text(segments) or "Waiting for speech...")
+    if discussion_points:
+        col1, col2 = st.columns(2)
+        with col1:
+            st.write("Covered so far:")
+            for point in covered:
+                st.write(f"✅ {point}")
+        with col2:
+            st.write("Not covered yet:")
+            for point in not_covered:
+                st.write(f"❌ {point}")
+
+@st.fragment(run_every=LIVE_REFRESH_SECONDS)
+def live_status(webrtc_ctx, transcriber, discussion_points):
+    """
+    Refreshes the transcript and coverage while the call is running. Only
+    this fragment reruns, so the other tabs and the sidebar stay usable.
+    """
+    if not webrtc_ctx.state.playing:
+        # The call has ended: rerun the whole script to finish the transcript
+        st.rerun()
+    if transcriber.error:
+        st.warning(f"Live transcription stopped ({transcriber.error}); the recording can still be processed "
+                   f"after the call.")
+    render_live_status(*transcriber.snapshot(), discussion_points)
+
 
 def live_meeting_tracker():
     st.subheader("Discussion Points:")
@@ -28,13 +56,22 @@ def live_meeting_tracker():
         
     st.subheader("Start Meeting")
     
-    if "prefix" not in st.session_state:
-        st.session_state["prefix"] = str(uuid.uuid4())
-    prefix = st.session_state["prefix"]
-    
-    record_file = RECORD_DIR / f"{prefix}_meeting.mp4"
-    def recorder_factory() -> MediaRecorder:
-        return MediaRecorder(str(record_file), format="mp4")
+    if "recording_session" not in st.session_state:
+        # Old recordings are pruned whenever a new session is set up; queued ones are kept for their jobs
+        recording.prune(keep=jobs.active_inputs())
+        st.session_state["recording_session"] = recording.new_session()
+    session_path = st.session_state["recording_session"]
+
+    def recorder_factory() -> recording.SegmentedRecorder:
+        # Fixed-length segments, so completed parts can be processed during the call
+        return recording.SegmentedRecorder(session_path)
+
+    # The transcriber outlives reruns; it is created with the session and fed by the WebRTC audio callback
+    transcriber = st.session_state.get("live_transcriber")
+    if transcriber is None:
+        transcriber = LiveTranscriber(discussion_points)
+        st.session_state["live_transcriber"] = transcriber
+    transcriber.set_discussion_points(discussion_points)
     
     webrtc_ctx = webrtc_streamer(
         key="live-meeting",
@@ -46,6 +83,7 @@ def live_meeting_tracker():
         },
        
         in_recorder_factory=recorder_factory,
+        audio_frame_callback=transcriber.on_audio_frame,
         async_processing=True,
     )
 
@@ -64,17 +102,40 @@ def live_meeting_tracker():
             if webrtc_ctx.audio_receiver:
                 webrtc_ctx.audio_receiver.stop() if webrtc_ctx.audio_receiver.state.playing else webrtc_ctx.audio_receiver.start()
 
-    # Display recording status and provide download button
-    if record_file.exists():
-        
+    # Once the call has ended, finish transcribing the buffered audio and keep the results
+    if not webrtc_ctx.state.playing and transcriber.running:
+        with st.spinner("Finishing live transcription..."):
+            transcriber.stop()
+        st.session_state["live_transcript"] = transcriber.snapshot()
+        # A transcript with gaps is only shown; the job transcribes the recording itself
+        st.session_state["live_transcript_complete"] = transcriber.complete
+        if not transcriber.complete:
+            logger.warning(f"Live transcript is missing {transcriber.dropped_samples} samples")
+        st.session_state["live_transcriber"] = None
+
+    if recording.is_session(session_path):
+        manifest = recording.load_manifest(session_path)
+        st.caption(f"{len(recording.completed_segments(manifest))} recording segments completed "
+                   f"({summarize.format_timestamp(recording.recorded_seconds(manifest))})")
+
         if st.button("Process Recording"):
-            try:
-                with st.spinner("Processing video..."):
-                    meeting.process_video(str(record_file), discussion_points)
-            except Exception as e:
-                st.error(f"Error processing video: {str(e)}")
-            finally:
-                # Optionally, clean up the recording file
-                meeting.safe_delete(str(record_file))
-                pass
+            segments, _, _ = st.session_state.get("live_transcript", ([], [], []))
+            if not st.session_state.get("live_transcript_complete"):
+                segments = []
+            # Processed by a background job, which deletes the session when done. A transcript built during
+            # the call without gaps is handed over so the job skips transcription; otherwise the job starts
+            # on the completed segments, even while the call continues.
+            meeting.enqueue_recording(session_path, discussion_points,
+                                      name=time.strftime("Live meeting %Y-%m-%d %H:%M"), cleanup=True,
+                                      checkpoints={"segments": segments} if segments else None)
+            st.session_state.pop("live_transcript", None)
+            st.session_state.pop("live_transcript_complete", None)
+            # Record the next call to a new session so the queued one is left alone
+            st.session_state.pop("recording_session", None)
+
+    meeting.render_jobs(key="live")
 
+    if webrtc_ctx.state.playing:
+        live_status(webrtc_ctx, transcriber, discussion_points)
+    elif st.session_state.get("live_transcript"):
+        render_live_status(*st.session_state["live_transcript"], discussion_points)
@@ -0,0 +1,188 @@
+import logging
+import threading
+
+from tasks import models, transcription
+
+logger = logging.getLogger(__name__)
+
+# -------------------- Live Transcription -------------------- #
+# Audio frames from the WebRTC stream are resampled to 16 kHz mono and kept
+# in a fixed-size ring buffer. A background thread transcribes the audio in
+# rolling windows, cut at a quiet point so words are not split, and keeps the
+# discussion point coverage up to date while the call is running.
+
+LIVE_WINDOW_SECONDS = 15
+LIVE_BUFFER_SECONDS = 120
+# The end of each window is moved back to the quietest point in this span
+LIVE_CUT_SEARCH_SECONDS = 2
+
+
+class RingBuffer:
+    """
+    Fixed-capacity float32 sample buffer addressed by absolute sample
+    position (the number of samples written since the start of the call).
+    """
+    def __init__(self, capacity):
+        import numpy as np
+        self._data = np.zeros(capacity, dtype=np.float32)
+        self.capacity = capacity
+        self.written = 0
+
+    @property
+    def oldest(self):
+        """Absolute position of the oldest sample still held."""
+        return max(0, self.written - self.capacity)
+
+    def write(self, samples):
+        # Samples that would be overwritten straight away still count as written
+        skipped = max(0, len(samples) - self.capacity)
+        self.written += skipped
+        samples = samples[skipped:]
+        start = self.written % self.capacity
+        first = min(len(samples), self.capacity - start)
+        self._data[start:start + first] = samples[:first]
+        self._data[:len(samples) - first] = samples[first:]
+        self.written += len(samples)
+
+    def read(self, start, end):
+        """Returns a copy of the samples in [start, end) by absolute position."""
+        import numpy as np
+        if start < self.oldest or end > self.written:
+            raise IndexError("Requested samples are no longer or not yet buffered")
+        positions = np.arange(start, end) % self.capacity
+        return self._data[positions]
+
+
+class LiveTranscriber:
+    def __init__(self, discussion_points=None, window_seconds=LIVE_WINDOW_SECONDS,
+                 buffer_seconds=LIVE_BUFFER_SECONDS):
+        self.discussion_points = list(discussion_points or [])
+        self.window_samples = int(window_seconds * transcription.SAMPLE_RATE)
+        self.segments = []
+        self.covered = []
+        self.not_covered = list(self.discussion_points)
+
+        self._buffer = RingBuffer(int(buffer_seconds * transcription.SAMPLE_RATE))
+        self._resampler = None
+        self._transcribed_until = 0
+        self._language = None
+        self._lock = threading.Lock()
+        self._data_ready = threading.Condition(self._lock)
+        self._stopping = False
+        # Audio that was never transcribed, because it was overwritten or its window failed
+        self.dropped_samples = 0
+        # Set if the worker thread died, e.g. because Whisper could not be loaded
+        self.error = None
+        # Started by the first audio frame, so an idle session never loads Whisper
+        self._thread = threading.Thread(target=self._run, name="live-transcriber", daemon=True)
+        self._started = False
+
+    # Called from the WebRTC worker thread for every incoming frame
+    def on_audio_frame(self, frame):
+        import av
+        try:
+            if self._resampler is None:
+                self._resampler = av.AudioResampler(format="flt", layout="mono", rate=transcription.SAMPLE_RATE)
+            chunks = [out.to_ndarray().reshape(-1) for out in self._resampler.resample(frame)]
+            with self._data_ready:
+                for samples in chunks:
+                    self._buffer.write(samples)
+                # A thread can only be started once; if it has died, the call goes on without live transcription
+                if not self._started and not self._stopping:
+                    self._started = True
+                    self._thread.start()
+                self._data_ready.notify()
+        except Exception as e:
+            logger.error(f"Error buffering live audio frame: {str(e)}")
+        return frame
+
+    def _next_window(self):
+        """Waits for a full window (or the end of the call) and returns (start, samples)."""
+        with self._data_ready:
+            while not self._stopping and self._buffer.written - self._transcribed_until < self.window_samples:
+                self._data_ready.wait(timeout=1.0)
+            if self._transcribed_until < self._buffer.oldest:
+                logger.warning("Live transcription fell behind; skipping audio that was overwritten")
+                self.dropped_samples += self._buffer.oldest - self._transcribed_until
+                self._transcribed_until = self._buffer.oldest
+            start = self._transcribed_until
+            end = min(self._buffer.written, start + self.window_samples)
+            if end <= start:
+                return None
+            samples = self._buffer.read(start, end)
+
+        if not self._stopping or end - start >= self.window_samples:
+            search = int(LIVE_CUT_SEARCH_SECONDS * transcription.SAMPLE_RATE)
+            cut = transcription.find_quiet_cut(samples, max(0, len(samples) - search), len(samples))
+            samples = samples[:cut]
+        with self._lock:
+            self._transcribed_until = start + len(samples)
+        return start, samples
+
+    def _run(self):
+        try:
+            self._transcribe_windows()
+        except Exception as e:
+            logger.error(f"Live transcription stopped: {str(e)}")
+            self.error = str(e)
+
+    def _transcribe_windows(self):
+        from tasks import meeting
+
+        model = models.get_whisper()
+        while True:
+            window = self._next_window()
+            if window is None:
+                if self._stopping:
+                    return
+                continue
+            start, samples = window
+            try:
+                previous = transcription.segments_to_text(self.segments[-5:])
+                result = transcription.transcribe_samples(
+                    samples, start / transcription.SAMPLE_RATE, model=model, language=self._language,
+                    initial_prompt=previous[-transcription.PROMPT_CHARS:],
+                )
+                self._language = self._language or result.get("language")
+                segments = [segment for segment in result["segments"] if segment["text"].strip()]
+                if not segments:
+                    continue
+                with self._lock:
+                    self.segments.extend(segments)
+                    all_segments = list(self.segments)
+                    points = list(self.discussion_points)
+                if points:
+                    # Window embeddings are cached, so only the newest windows are embedded again
+                    covered, not_covered = meeting.compare_discussion_points(points, None, segments=all_segments)
+                    with self._lock:
+                        self.covered, self.not_covered = covered, not_covered
+            except Exception as e:
+                logger.error(f"Error transcribing live audio: {str(e)}")
+                with self._lock:
+                    self.dropped_samples += len(samples)
+
+    def set_discussion_points(self, discussion_points):
+        with self._lock:
+            self.discussion_points = list(discussion_points or [])
+
+    def snapshot(self):
+        """Returns (segments, covered, not_covered) as they stand now."""
+        with self._lock:
+            return list(self.segments), list(self.covered), list(self.not_covered)
+
+    @property
+    def complete(self):
+        """Whether every sample of the call so far has been transcribed or is still queued for it."""
+        return self.error is None and self.dropped_samples == 0
+
+    @property
+    def running(self):
+        return self._thread.is_alive()
+
+    def stop(self, timeout=None):
+        """Transcribes whatever audio is still buffered, then stops the worker."""
+        with self._data_ready:
+            self._stopping = True
+            self._data_ready.notify()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
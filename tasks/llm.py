@@ -0,0 +1,231 @@
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from tasks import llm_cache, models
+
+logger = logging.getLogger(__name__)
+
+# -------------------- Gemini Request Helpers -------------------- #
+MODEL_NAME = "gemini-pro"
+REQUEST_TIMEOUT = float(os.getenv("GEMINI_REQUEST_TIMEOUT", "60"))
+MAX_RETRIES = 3
+BACKOFF_SECONDS = 1.0
+MAX_CONCURRENT_REQUESTS = int(os.getenv("GEMINI_MAX_CONCURRENT_REQUESTS", "4"))
+
+# StreamMetrics of the most recent streamed generations in this process, newest last
+recent_metrics = deque(maxlen=50)
+
+
+def get_client(api_key, model_name=MODEL_NAME):
+    """
+    Returns a configured Gemini model, shared by the whole process.
+    Any object with a compatible `generate_content` method can be passed
+    to the helpers below instead, e.g. a fake client for offline benchmarks.
+    """
+    def load():
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        return genai.GenerativeModel(model_name)
+    return models.get_model(f"gemini-{model_name}", load)
+
+
+def client_model_name(client):
+    """Model name used in cache keys; fake clients fall back to their class name."""
+    return getattr(client, "model_name", None) or type(client).__name__
+
+
+def generate(client, prompt, timeout=REQUEST_TIMEOUT, retries=MAX_RETRIES, backoff=BACKOFF_SECONDS,
+             cache=llm_cache.CACHE_ENABLED):
+    """
+    Sends one prompt and returns the response text. Responses are served
+    from and stored in the persistent LLM cache unless `cache` is False.
+    Failed requests are retried with exponential backoff; a ValueError
+    (e.g. a blocked response with no text) is not retried.
+    """
+    model_name = client_model_name(client)
+    key = llm_cache.make_key(model_name, prompt) if cache else None
+    if key:
+        cached = llm_cache.get(key)
+        if cached is not None:
+            return cached
+
+    for attempt in range(retries + 1):
+        try:
+            response = client.generate_content(prompt, request_options={"timeout": timeout})
+            text = response.text
+            if key:
+                llm_cache.put(key, model_name, text)
+            return text
+        except ValueError:
+            raise
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = backoff * 2 ** attempt
+            logger.warning(f"Gemini request failed ({str(e)}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def generate_many(client, prompts, max_workers=MAX_CONCURRENT_REQUESTS, **kwargs):
+    """
+    Sends a dict of prompts concurrently on a bounded thread pool and yields
+    (key, text, error) tuples in completion order, so callers can render
+    each result as soon as it arrives.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(prompts)))) as pool:
+        futures = {pool.submit(generate, client, prompt, **kwargs): key for key, prompt in prompts.items()}
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                yield key, future.result(), None
+            except Exception as e:
+                yield key, None, e
+
+
+# -------------------- Streaming Generation -------------------- #
+class StreamMetrics:
+    """Latency of one streamed generation, filled in while it runs."""
+    def __init__(self, label=""):
+        self.label = label
+        self.started = time.perf_counter()
+        self.first_token_seconds = None
+        self.total_seconds = None
+        self.chunks = 0
+        self.cached = False
+        self.cancelled = False
+        # Message of the exception that ended the generation, if any
+        self.error = None
+        # Set by callers that count their prompt's tokens
+        self.prompt_tokens = None
+
+    def describe(self):
+        first_token = f"{self.first_token_seconds:.2f}s" if self.first_token_seconds is not None else "n/a"
+        total = f"{self.total_seconds:.2f}s" if self.total_seconds is not None else "n/a"
+        prompt = f", {self.prompt_tokens} prompt tokens" if self.prompt_tokens is not None else ""
+        status = " (cached)" if self.cached else " (failed)" if self.error else " (cancelled)" if self.cancelled else ""
+        return f"first token after {first_token}, total {total}{prompt}{status}"
+
+    def as_dict(self):
+        return {
+            "label": self.label,
+            "first_token_seconds": self.first_token_seconds,
+            "total_seconds": self.total_seconds,
+            "chunks": self.chunks,
+            "cached": self.cached,
+            "cancelled": self.cancelled,
+            "error": self.error,
+            "prompt_tokens": self.prompt_tokens,
+        }
+
+
+def stream(client, prompt, timeout=REQUEST_TIMEOUT, retries=MAX_RETRIES, backoff=BACKOFF_SECONDS,
+           cache=llm_cache.CACHE_ENABLED, metrics=None, cancel_event=None):
+    """
+    Yields the response text in chunks as Gemini streams it. A cached
+    response is yielded as one chunk. Generation stops when `cancel_event` is
+    set or the consumer closes the generator (e.g. a Streamlit rerun); a
+    cancelled or failed response is not cached, and a failure is recorded
+    in `metrics.error` rather than as a cancellation. Requests are only retried before the
+    first chunk has been yielded.
+    """
+    metrics = metrics if metrics is not None else StreamMetrics()
+    model_name = client_model_name(client)
+    key = llm_cache.make_key(model_name, prompt) if cache else None
+    parts = []
+    completed = False
+    try:
+        cached = llm_cache.get(key) if key else None
+        if cached is not None:
+            metrics.cached = True
+            metrics.first_token_seconds = time.perf_counter() - metrics.started
+            metrics.chunks = 1
+            yield cached
+            completed = True
+            return
+
+        for attempt in range(retries + 1):
+            try:
+                for chunk in client.generate_content(prompt, stream=True, request_options={"timeout": timeout}):
+                    if cancel_event is not None and cancel_event.is_set():
+                        metrics.cancelled = True
+                        return
+                    text = chunk.text
+                    if not text:
+                        continue
+                    if metrics.first_token_seconds is None:
+                        metrics.first_token_seconds = time.perf_counter() - metrics.started
+                    metrics.chunks += 1
+                    parts.append(text)
+                    yield text
+                completed = True
+                break
+            except ValueError:
+                raise
+            except Exception as e:
+                if parts or attempt == retries:
+                    raise
+                delay = backoff * 2 ** attempt
+                logger.warning(f"Gemini stream failed ({str(e)}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+        if key:
+            llm_cache.put(key, model_name, "".join(parts))
+    except Exception as e:
+        metrics.error = str(e) or type(e).__name__
+        raise
+    finally:
+        metrics.total_seconds = time.perf_counter() - metrics.started
+        # Closed by the consumer before the end counts as a cancellation too
+        metrics.cancelled = metrics.cancelled or (not completed and metrics.error is None)
+        metrics.label = metrics.label or model_name
+        recent_metrics.append(metrics)
+        logger.info(f"Generation {metrics.label}: {metrics.describe()}")
+
+
+def stream_many(client, prompts, max_workers=MAX_CONCURRENT_REQUESTS, cancel_event=None, **kwargs):
+    """
+    Streams a dict of prompts concurrently and yields (key, chunk, done,
+    error) events in arrival order: one per text chunk, then a final one
+    with done=True. Stopping iteration cancels the outstanding requests.
+    """
+    events = queue.Queue()
+    cancel_event = cancel_event or threading.Event()
+
+    def worker(key, prompt):
+        try:
+            metrics = StreamMetrics(label=str(key))
+            for chunk in stream(client, prompt, metrics=metrics, cancel_event=cancel_event, **kwargs):
+                events.put((key, chunk, False, None))
+            events.put((key, None, True, None))
+        except Exception as e:
+            events.put((key, None, True, e))
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(prompts)))) as pool:
+        for key, prompt in prompts.items():
+            pool.submit(worker, key, prompt)
+        remaining = len(prompts)
+        try:
+            while remaining:
+                event = events.get()
+                if event[2]:
+                    remaining -= 1
+                yield event
+        finally:
+            # Also reached when the consumer stops early; lets the workers exit at their next chunk
+            cancel_event.set()
+
+
+def parse_json_response(text):
+    """Parses a JSON object from a model response, tolerating markdown code fences."""
+    text = text.strip()
+    fenced = re.search(r"```(?:json)?\s*(.*?)```", text, re.DOTALL)
+    if fenced:
+        text = fenced.group(1).strip()
+    return json.loads(text)
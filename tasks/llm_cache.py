@@ -0,0 +1,129 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import time
+
+from tasks import sqlite_store
+
+logger = logging.getLogger(__name__)
+
+# -------------------- Persistent LLM Response Cache -------------------- #
+# Responses are stored in a SQLite database keyed by model, normalised prompt
+# and generation parameters. WAL mode and a busy timeout let several
+# Streamlit worker processes read and write the same file concurrently.
+# Entries expire after CACHE_TTL_SECONDS, and the least recently used ones
+# are evicted once the stored responses exceed CACHE_MAX_BYTES.
+
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(os.getcwd(), "llm_cache.sqlite3"))
+CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") != "0"
+CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def _connection():
+    return sqlite_store.connect(CACHE_PATH, SCHEMA)
+
+
+def normalize_prompt(prompt):
+    """Collapses runs of whitespace so indentation differences do not change the key."""
+    return re.sub(r"\s+", " ", prompt).strip()
+
+
+def make_key(model, prompt, params=None):
+    payload = json.dumps([model, normalize_prompt(prompt), params or {}], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _count(connection, name):
+    connection.execute(
+        "INSERT INTO counters (name, value) VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET value = value + 1",
+        (name,),
+    )
+
+
+def get(key):
+    """Returns the cached response for `key`, or None on a miss or expired entry."""
+    try:
+        connection = _connection()
+        row = connection.execute("SELECT value, created FROM entries WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        if row is None or now - row[1] > CACHE_TTL_SECONDS:
+            if row is not None:
+                connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+            _count(connection, "misses")
+            return None
+        connection.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+        _count(connection, "hits")
+        return row[0]
+    except sqlite3.Error as e:
+        logger.error(f"Error reading LLM cache: {str(e)}")
+        return None
+
+
+def put(key, model, value):
+    try:
+        connection = _connection()
+        now = time.time()
+        connection.execute(
+            "INSERT OR REPLACE INTO entries (key, model, value, size, created, accessed) VALUES (?, ?, ?, ?, ?, ?)",
+            (key, model, value, len(value.encode("utf-8")), now, now),
+        )
+        _evict(connection, now)
+    except sqlite3.Error as e:
+        logger.error(f"Error writing LLM cache: {str(e)}")
+
+
+def _evict(connection, now):
+    connection.execute("DELETE FROM entries WHERE created < ?", (now - CACHE_TTL_SECONDS,))
+    total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+    if total <= CACHE_MAX_BYTES:
+        return
+    # Drop least recently used entries until the cache is back under its cap
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        for key, size in connection.execute("SELECT key, size FROM entries ORDER BY accessed").fetchall():
+            if total <= CACHE_MAX_BYTES:
+                break
+            connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+        connection.execute("COMMIT")
+    except sqlite3.Error:
+        connection.execute("ROLLBACK")
+        raise
+
+
+def stats():
+    """Hit and miss counters plus the current number and size of entries."""
+    try:
+        connection = _connection()
+        counters = dict(connection.execute("SELECT name, value FROM counters").fetchall())
+        entries, size = connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+    except sqlite3.Error as e:
+        logger.error(f"Error reading LLM cache stats: {str(e)}")
+        return {}
+    return {"hits": counters.get("hits", 0), "misses": counters.get("misses", 0), "entries": entries, "bytes": size}
+
+
+def clear():
+    connection = _connection()
+    connection.execute("DELETE FROM entries")
+    connection.execute("DELETE FROM counters")
@@ -1,25 +1,15 @@
 import streamlit as st
-from streamlit_webrtc import webrtc_streamer, WebRtcMode, VideoProcessorBase
-from transformers import AutoTokenizer,AutoModelForSeq2SeqLM
-from sentence_transformers import SentenceTransformer,util
 import os
-import tempfile
-import whisper
-from moviepy.editor import VideoFileClip
 import logging
-import google.generativeai as genai
-import contextlib
-from tasks import QnA
+import json
+import shutil
+import time
+from tasks import artifacts, coverage, jobs, llm, models, spool, summarize
 st.set_page_config(layout="wide")
-import uuid
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize Whisper and Transformers models once (to avoid repeated loading)
-whisper_model = whisper.load_model("base")
-tokenizer = AutoTokenizer.from_pretrained("facebook/bart-base")
-model=genai.GenerativeModel("gemini-pro")
 
 def get_api_key():
     """
@@ -38,22 +28,13 @@ def get_api_key():
     return api_key
 
 
-@contextlib.contextmanager
-def temporary_file(suffix=None):
-    """Context manager for creating and cleaning up a temporary file."""
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
-    try:
-        yield temp_file.name
-    finally:
-        try:
-            os.unlink(temp_file.name)
-        except OSError:
-            pass
-
 def safe_delete(filepath):
-    """Safely delete a file if it exists."""
+    """Safely delete a file, or a directory such as a recording session, if it exists."""
     try:
-        if os.path.exists(filepath):
+        if os.path.isdir(filepath):
+            shutil.rmtree(filepath)
+            logger.info(f"Successfully deleted: {filepath}")
+        elif os.path.exists(filepath):
             os.remove(filepath)
             logger.info(f"Successfully deleted: {filepath}")
     except Exception as e:
@@ -61,142 +42,166 @@ def safe_delete(filepath):
 
         
         
-def convert_video_to_audio(video_path, audio_path):
-    try:
-        video = VideoFileClip(video_path)
-        if video.audio is None:
-            logger.warning("The video does not contain an audio track.")
-            return None
-        video.audio.write_audiofile(audio_path, codec='mp3')
-        return audio_path
-    except Exception as e:
-        logger.error(f"Error converting video to audio: {str(e)}")
-        return None
-
 def transcribe_audio(audio_path):
+    """
+    Transcribes an audio file and returns {"text": ..., "segments": [...]},
+    where each segment has "start" and "end" (seconds) and "text".
+    """
     try:
-        result = whisper_model.transcribe(audio_path)
-        transcribed_text= result.get("text", "")
-        return transcribed_text
+        result = models.get_whisper().transcribe(audio_path)
+        segments = [{"start": segment["start"], "end": segment["end"], "text": segment["text"]}
+                    for segment in result.get("segments", [])]
+        return {"text": result.get("text", ""), "segments": segments}
     
     except Exception as e:
         logger.error(f"Error transcribing audio: {str(e)}")
         return None
 
 # Add this function to compare discussion points with transcription
-def compare_discussion_points(discussion_points, transcription):
-    # Initialize the sentence transformer model
-    model = SentenceTransformer('all-MiniLM-L6-v2')
-    
-    # Encode the transcription and discussion points
-    transcription_embedding = model.encode(transcription, convert_to_tensor=True)
-    points_embeddings = model.encode(discussion_points, convert_to_tensor=True)
-    
-    # Calculate cosine similarity
-    similarities = util.pytorch_cos_sim(transcription_embedding, points_embeddings)[0]
-    
-    # Classify points as covered or not covered
-    threshold = 0.6  # Adjust this threshold as needed
-    covered = []
-    not_covered = []
-    
-    for i, point in enumerate(discussion_points):
-        if similarities[i] > threshold:
-            covered.append(point)
-        else:
-            not_covered.append(point)
-    
+def compare_discussion_points(discussion_points, transcription, segments=None):
+    """
+    Splits the discussion points into covered and not covered ones. Scoring
+    is done per transcript window (see tasks/coverage.py); pass Whisper
+    `segments` to score time-aligned windows instead of text chunks.
+    """
+    results = coverage.score_coverage(discussion_points, segments or coverage.text_to_segments(transcription))
+    covered = [result["point"] for result in results if result["covered"]]
+    not_covered = [result["point"] for result in results if not result["covered"]]
     return covered, not_covered
 
 
-def process_video(video_path, discussion_points=None):
-    if not os.path.exists(video_path):
-        st.error(f"Video file not found: {video_path}")
-        return
+INSIGHT_PROMPTS = {
+    "Summary:": 
+        "Please provide a concise summary of the following transcript. The summary should capture the main points and key takeaways from the meeting in no more than 150 words. Focus on summarizing the overall discussion, decisions made, and any significant insights or conclusions.",
+    "Key Decisions:": 
+        "Extract and list all key decisions made during the meeting from the following transcript. A key decision is one that impacts the direction of the project or organization, involves agreement or disagreement among participants, or sets a course of action. List each decision clearly with a brief explanation if necessary.",
+    "Topics Discussed:": 
+        "Outline the main topics discussed during the meeting from the following transcript. Provide a structured overview of the conversation by identifying the major subjects covered. List these topics in a clear and organized manner, highlighting any important subtopics or points related to each main topic.",
+    "Action Items:": 
+        "Extract all action items, tasks, or next steps mentioned in the meeting transcript. An action item is a specific task assigned to an individual or group, with a clear goal and deadline. List each action item, including who is responsible for it and any deadlines mentioned."
+}
 
-    temp_files = []
-    try:
-        with st.spinner("Converting video to audio..."):
-            audio_file = tempfile.NamedTemporaryFile(delete=False, suffix=".mp3").name
-            temp_files.append(audio_file)
-            audio_file = convert_video_to_audio(video_path, audio_file)
-        
-        if audio_file is None:
-            st.error("Failed to extract audio. The video might not contain an audio track.")
-            return
+# "parallel" sends one request per section concurrently; "single" asks for
+# all sections in one structured JSON response.
+INSIGHT_MODES = ("parallel", "single")
+INSIGHT_MODE = os.getenv("INSIGHT_MODE", "parallel")
+
+COVERAGE_SECTION = "Discussion Points Coverage"
+
+
+def format_insight_section(analysis_type, text=None, error=None):
+    if error is not None:
+        return f"### **{analysis_type.replace('_', ' ')}**\n\nError: {str(error)}\n"
+    return f"### **{analysis_type.replace('_', ' ')}**\n\n{text}\n"
+
+
+def _single_call_prompt(transcription_text):
+    instructions = "\n".join(f'- "{key.rstrip(":")}": {prompt}' for key, prompt in INSIGHT_PROMPTS.items())
+    return f"""Analyze the following meeting transcript and respond with a single JSON object.
+The object must have exactly these keys, each holding a markdown string:
+{instructions}
+
+Respond with the JSON object only.
+
+Transcript:
+{transcription_text}"""
 
-        st.success("Video converted to audio.")
-        
-        with st.spinner("Transcribing audio..."):
-            transcription = transcribe_audio(audio_file)
-        
-        if transcription is None:
-            st.error("Failed to transcribe the audio.")
-            return
-        
-        st.write("Transcription:", transcription)
-        
-        # Add the transcript to ChromaDB
-        meeting_id = str(uuid.uuid4())  # Generate a unique ID for the meeting
-        QnA.add_meeting_transcript(meeting_id, transcription)
-        st.success("Meeting transcript added to the knowledge base.") 
-                
-        with st.spinner("Generating insights from the meeting..."):
-            insights = generate_meeting_insights(transcription,discussion_points)
 
-        if insights:
-            st.subheader("Meeting Insights")
-            st.markdown(insights)
+def _generate_sections_single_call(client, transcription_text, **kwargs):
+    """Yields (analysis_type, text, error) for every section from one structured request."""
+    try:
+        data = llm.parse_json_response(llm.generate(client, _single_call_prompt(transcription_text), **kwargs))
+    except Exception as e:
+        for analysis_type in INSIGHT_PROMPTS:
+            yield analysis_type, None, e
+        return
+    for analysis_type in INSIGHT_PROMPTS:
+        text = data.get(analysis_type.rstrip(":"))
+        if text is None:
+            yield analysis_type, None, ValueError("Section missing from the model response")
         else:
-            st.error("Failed to generate meeting insights.")
-    
-    finally:
-        for file in temp_files:
-            safe_delete(file)
-
-# Generate meeting insights using OpenAI GPT
-def generate_meeting_insights(transcription_text,discussion_points):
-    prompts = {
-        "Summary:": 
-            "Please provide a concise summary of the following transcript. The summary should capture the main points and key takeaways from the meeting in no more than 150 words. Focus on summarizing the overall discussion, decisions made, and any significant insights or conclusions.",
-        "Key Decisions:": 
-            "Extract and list all key decisions made during the meeting from the following transcript. A key decision is one that impacts the direction of the project or organization, involves agreement or disagreement among participants, or sets a course of action. List each decision clearly with a brief explanation if necessary.",
-        "Topics Discussed:": 
-            "Outline the main topics discussed during the meeting from the following transcript. Provide a structured overview of the conversation by identifying the major subjects covered. List these topics in a clear and organized manner, highlighting any important subtopics or points related to each main topic.",
-        "Action Items:": 
-            "Extract all action items, tasks, or next steps mentioned in the meeting transcript. An action item is a specific task assigned to an individual or group, with a clear goal and deadline. List each action item, including who is responsible for it and any deadlines mentioned."
-    }
-        
+            yield analysis_type, text if isinstance(text, str) else json.dumps(text, indent=2), None
+
+
+def generate_meeting_insights(transcription_text, discussion_points, client=None, mode=INSIGHT_MODE,
+                              on_section=None, segments=None, hierarchical=None, on_coverage=None,
+                              on_error=None, **request_kwargs):
+    """
+    Generates the insight sections for a transcript. In "parallel" mode the
+    section prompts are streamed concurrently and `on_section(analysis_type,
+    markdown)` is called with each section's text so far, so partial results
+    can be rendered early; the coverage analysis is reported as
+    COVERAGE_SECTION, and its raw scores are passed to `on_coverage(results)`.
+    A section that could not be generated is rendered as an error message
+    and reported to `on_error(analysis_type, error)`. `client` defaults to
+    the shared Gemini model.
+
+    With `hierarchical` (the default for long transcripts when Whisper
+    `segments` are given) the sections are generated from time-aligned
+    segment summaries rather than the full transcript.
+    """
+    if mode not in INSIGHT_MODES:
+        raise ValueError(f"Unknown insight mode: {mode}")
+
+    sections = {}
     insights = []
     
     try:
-        api_key = get_api_key()
-        genai.configure(api_key=api_key)
-        
-        # Use a more capable model like gemini-pro
-        model = genai.GenerativeModel('gemini-pro')
-        
-        for analysis_type, prompt in prompts.items():
-            try:
-                # Generate the content using your model
-                response = model.generate_content(f"{prompt}\n\nTranscript:\n{transcription_text}")
-                # Append formatted insights with bold and large text for headers
-                insights.append(f"### **{analysis_type.replace('_', ' ')}**\n\n{response.text}\n")
-            except Exception as e:
-                # Handle errors and append them
-                insights.append(f"### **{analysis_type.replace('_', ' ')}**\n\nError: {str(e)}\n")
-        
+        if client is None:
+            client = llm.get_client(get_api_key())
+
+        if hierarchical is None:
+            hierarchical = bool(segments) and len(transcription_text) > summarize.LONG_TRANSCRIPT_CHARS
+        insight_input = transcription_text
+        if hierarchical and segments:
+            # Map: summarize time windows concurrently; the sections below are the reduce step
+            insight_input = summarize.condense_transcript(client, segments, **request_kwargs)
+
+        if mode == "single":
+            for analysis_type, text, error in _generate_sections_single_call(client, insight_input, **request_kwargs):
+                sections[analysis_type] = format_insight_section(analysis_type, text, error)
+                if error is not None and on_error:
+                    on_error(analysis_type, error)
+                if on_section:
+                    on_section(analysis_type, sections[analysis_type])
+        else:
+            prompts = {analysis_type: f"{prompt}\n\nTranscript:\n{insight_input}"
+                       for analysis_type, prompt in INSIGHT_PROMPTS.items()}
+            # Sections stream concurrently; on_section sees each one grow token by token
+            parts = {analysis_type: [] for analysis_type in prompts}
+            for analysis_type, chunk, done, error in llm.stream_many(client, prompts, **request_kwargs):
+                if not done:
+                    parts[analysis_type].append(chunk)
+                    markdown = format_insight_section(analysis_type, "".join(parts[analysis_type]))
+                else:
+                    markdown = format_insight_section(analysis_type, "".join(parts[analysis_type]), error)
+                    sections[analysis_type] = markdown
+                    if error is not None and on_error:
+                        on_error(analysis_type, error)
+                if on_section:
+                    on_section(analysis_type, markdown)
+
+        # Keep the sections in their usual order regardless of completion order
+        insights.extend(sections[analysis_type] for analysis_type in INSIGHT_PROMPTS)
 
          # Add discussion points analysis
         if discussion_points:
-            covered, not_covered = compare_discussion_points(discussion_points, transcription_text)
-            insights.append("**## Discussion Points Coverage**\n")
-            insights.append("### Covered Topics:\n")
-            for point in covered:
-                insights.append(f"✅ {point}\n")
-            insights.append("\n### Not Covered Topics:\n")
-            for point in not_covered:
-                insights.append(f"❌ {point}\n")
+            results = coverage.score_coverage(discussion_points,
+                                              segments or coverage.text_to_segments(transcription_text))
+            lines = ["**## Discussion Points Coverage**\n", "### Covered Topics:\n"]
+            for result in results:
+                if result["covered"]:
+                    times = coverage.format_match_times(result)
+                    lines.append(f"✅ {result['point']} (score {result['score']:.2f}{', at ' + times if times else ''})\n")
+            lines.append("\n### Not Covered Topics:\n")
+            for result in results:
+                if not result["covered"]:
+                    lines.append(f"❌ {result['point']} (score {result['score']:.2f})\n")
+            insights.extend(lines)
+            if on_coverage:
+                on_coverage(results)
+            if on_section:
+                on_section(COVERAGE_SECTION, "\n".join(lines))
     
     except Exception as e:
         logger.error(f"An error occurred while generating meeting insights: {str(e)}")
@@ -205,6 +210,150 @@ def generate_meeting_insights(transcription_text,discussion_points):
     return "\n".join(insights)
     
 
+# -------------------- Background Jobs -------------------- #
+# Seconds between refreshes of the job list while a job is queued or running
+JOB_REFRESH_SECONDS = 2
+
+
+@st.cache_resource
+def start_job_workers():
+    """
+    Starts the job worker processes once per server. With JOB_WORKERS=0 no
+    workers are started here and `python -m tasks.jobs` is run separately.
+    """
+    if jobs.JOB_WORKERS <= 0:
+        return []
+    # Workers inherit the environment, including a key read from Streamlit secrets
+    os.environ.setdefault("GEMINI_API_KEY", get_api_key())
+    return jobs.start_workers(jobs.JOB_WORKERS)
+
+
+def enqueue_recording(video_path, discussion_points, name=None, copy=False, cleanup=None, checkpoints=None):
+    """
+    Queues a recording for background processing; `cleanup` defaults to
+    deleting copied inputs. See jobs.enqueue for `checkpoints`.
+    """
+    start_job_workers()
+    try:
+        jobs.enqueue(video_path, discussion_points, name=name, copy=copy,
+                     cleanup=copy if cleanup is None else cleanup, checkpoints=checkpoints)
+        st.success("The recording was queued for processing. You can follow its progress below.")
+    except Exception as e:
+        logger.error(f"Error queuing recording {video_path}: {str(e)}")
+        st.error(f"Error queuing recording: {str(e)}")
+
+
+def segments_markdown(segments):
+    return "\n\n".join(f"`{summarize.format_timestamp(segment['start'])}` {segment['text'].strip()}"
+                       for segment in segments)
+
+
+def render_partial_results(job):
+    """Shows the transcript or insight sections of an unfinished job as far as they have been checkpointed."""
+    if job["stage"] == "transcribe":
+        partial = jobs.load_checkpoint(job["id"], "segments_partial")
+        if partial and partial["segments"]:
+            with st.container(height=300):
+                st.markdown(segments_markdown(partial["segments"]))
+    elif job["stage"] == "insights":
+        sections = jobs.load_checkpoint(job["id"], "sections_partial", {})
+        for analysis_type in [*INSIGHT_PROMPTS, COVERAGE_SECTION]:
+            if analysis_type in sections:
+                st.markdown(sections[analysis_type])
+
+
+def _job_list(key, polling):
+    recent_jobs = jobs.list_jobs()
+    if polling and not any(job["status"] in ("queued", "running") for job in recent_jobs):
+        # The last job has finished: rerun the page once so the list stops polling
+        st.rerun()
+    for job in recent_jobs:
+        with st.expander(f"{job['name']} ({job['status']})", expanded=job["status"] != "done"):
+            if job["status"] in ("queued", "running"):
+                st.progress(jobs.overall_progress(job), text=job["message"] or "Waiting for a worker...")
+                render_partial_results(job)
+            elif job["status"] == "failed":
+                st.error(f"Failed during {job['stage']}: {job['error']}")
+                if st.button("Retry", key=f"{key}_retry_{job['id']}"):
+                    jobs.retry(job["id"])
+                    st.rerun()
+            else:
+                insights = jobs.load_checkpoint(job["id"], "insights", {})
+                st.markdown(insights.get("markdown", "No insights were saved for this job."))
+
+
+def render_jobs(key="jobs"):
+    """
+    Lists recent jobs and starts the workers if any job is still queued or
+    running. While it is, the list is a fragment that refreshes itself every
+    JOB_REFRESH_SECONDS; `key` keeps the widgets apart when the list is
+    shown in several tabs.
+    """
+    recent_jobs = jobs.list_jobs()
+    if not recent_jobs:
+        return
+    st.subheader("Processing Jobs")
+    polling = any(job["status"] in ("queued", "running") for job in recent_jobs)
+    if polling:
+        # After a restart, queued and interrupted jobs are resumed without waiting for a new recording
+        start_job_workers()
+    st.fragment(_job_list, run_every=JOB_REFRESH_SECONDS if polling else None)(key, polling)
+
+
+def get_spooled_upload(uploaded_file):
+    """
+    Returns the path of an upload in the spool, writing it only the first
+    time this session sees the upload; later reruns reuse the same file.
+    """
+    spooled = st.session_state.setdefault("spooled_uploads", {})
+    path = spooled.get(uploaded_file.file_id)
+    if path is None or not os.path.exists(path):
+        spool.prune()
+        path, _ = spool.spool_file(uploaded_file, suffix=os.path.splitext(uploaded_file.name)[1].lower())
+        spooled[uploaded_file.file_id] = path
+    return path
+
+
+# -------------------- Past Meetings -------------------- #
+def meeting_label(saved):
+    return f"{saved['name']} ({time.strftime('%Y-%m-%d %H:%M', time.localtime(saved['created']))})"
+
+
+def past_meetings():
+    """Shows a processed meeting from the artifacts store, without reprocessing it."""
+    saved_meetings = artifacts.list_meetings()
+    if not saved_meetings:
+        st.info("No meetings have been processed yet.")
+        return
+    labels = {saved["meeting_id"]: meeting_label(saved) for saved in saved_meetings}
+    meeting_id = st.selectbox("Meeting", list(labels), format_func=labels.get)
+    saved = artifacts.get_meeting(meeting_id)
+
+    if saved["duration"]:
+        st.caption(f"Duration {summarize.format_timestamp(saved['duration'])}, "
+                   f"{len(saved['segments'])} segments, {len(saved['chunk_ids'])} indexed chunks")
+
+    st.subheader("Meeting Insights")
+    if saved["sections"]:
+        for analysis_type in [*INSIGHT_PROMPTS, COVERAGE_SECTION]:
+            if analysis_type in saved["sections"]:
+                st.markdown(saved["sections"][analysis_type])
+    elif saved["insights"]:
+        st.markdown(saved["insights"])
+    else:
+        st.info("Insights have not been generated for this meeting yet.")
+
+    if saved["coverage"]:
+        st.dataframe([
+            {"Discussion point": result["point"], "Covered": result["covered"],
+             "Score": round(result["score"], 2), "At": coverage.format_match_times(result)}
+            for result in saved["coverage"]
+        ])
+
+    with st.expander("Transcript"):
+        st.markdown(segments_markdown(saved["segments"]))
+
+
 def track_meeting():
     st.header("Upload Video")
     uploaded_file = st.file_uploader("Choose a video file", type=['mp4', 'avi', 'mov', 'mkv'])
@@ -217,16 +366,18 @@ def track_meeting():
             st.write(f"• {point}")
             
     if uploaded_file is not None:
-        temp_video = tempfile.NamedTemporaryFile(delete=False, suffix='.mp4').name
         try:
-            with open(temp_video, 'wb') as f:
-                f.write(uploaded_file.read())
-            st.video(temp_video)
+            video_path = get_spooled_upload(uploaded_file)
+            st.video(video_path)
                 
             if st.button("Process Uploaded Video"):
-                process_video(temp_video,discussion_points)
-        finally:
-            safe_delete(temp_video)
+                # The spooled file is kept for reuse, so the job must not delete it
+                enqueue_recording(video_path, discussion_points, name=uploaded_file.name, cleanup=False)
+        except OSError as e:
+            logger.error(f"Error saving uploaded video {uploaded_file.name}: {str(e)}")
+            st.error(f"Error saving uploaded video: {str(e)}")
+
+    render_jobs(key="upload")
 
 
                 
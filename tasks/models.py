@@ -0,0 +1,103 @@
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# -------------------- Model Registry -------------------- #
+# Models are loaded on first use and kept for the life of the process, so
+# every Streamlit session and rerun served by this process shares a single
+# instance. Heavy libraries (torch, whisper, sentence-transformers) are only
+# imported by the loaders below.
+
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+CROSS_ENCODER_NAME = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+WHISPER_MODEL_SIZE = os.getenv("WHISPER_MODEL_SIZE", "base")
+
+_models = {}
+_stats = {}
+_locks = {}
+_registry_lock = threading.Lock()
+
+
+def _rss_bytes():
+    """Current resident set size of this process, or None if unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _parameter_bytes(model):
+    """Size of a torch model's parameters and buffers, or None for other objects."""
+    try:
+        tensors = list(model.parameters()) + list(model.buffers())
+    except AttributeError:
+        return None
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+def get_model(key, loader):
+    """
+    Returns the model registered under `key`, calling `loader()` to create it
+    the first time. Concurrent callers for the same key wait for one load.
+    """
+    model = _models.get(key)
+    if model is not None:
+        return model
+
+    with _registry_lock:
+        lock = _locks.setdefault(key, threading.Lock())
+    with lock:
+        model = _models.get(key)
+        if model is not None:
+            return model
+
+        logger.info(f"Loading model {key}...")
+        rss_before = _rss_bytes()
+        start = time.perf_counter()
+        model = loader()
+        load_seconds = time.perf_counter() - start
+        rss_after = _rss_bytes()
+
+        _stats[key] = {
+            "load_seconds": load_seconds,
+            "rss_delta_bytes": rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+            "parameter_bytes": _parameter_bytes(model),
+        }
+        _models[key] = model
+        logger.info(f"Loaded model {key} in {load_seconds:.2f}s")
+    return model
+
+
+def model_stats():
+    """Load time and memory footprint of every model loaded so far."""
+    return {key: dict(stats) for key, stats in _stats.items()}
+
+
+def is_loaded(key):
+    return key in _models
+
+
+# -------------------- Known Models -------------------- #
+def get_whisper(size=WHISPER_MODEL_SIZE):
+    def load():
+        import whisper
+        return whisper.load_model(size)
+    return get_model(f"whisper-{size}", load)
+
+
+def get_embedder(name=EMBEDDING_MODEL_NAME):
+    def load():
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(name)
+    return get_model(f"embedder-{name}", load)
+
+
+def get_cross_encoder(name=CROSS_ENCODER_NAME):
+    def load():
+        from sentence_transformers import CrossEncoder
+        return CrossEncoder(name)
+    return get_model(f"cross-encoder-{name}", load)
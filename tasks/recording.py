@@ -0,0 +1,257 @@
+import asyncio
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+
+from tasks import documents, transcription
+
+logger = logging.getLogger(__name__)
+
+# -------------------- Segmented Live Recording -------------------- #
+# A live call is recorded as a session directory of fixed-length segment
+# files plus a manifest:
+#
+#     records/<session_id>/manifest.json
+#     records/<session_id>/segment_00000.mp4
+#     records/<session_id>/segment_00001.mp4 ...
+#
+# Every RECORD_SEGMENT_SECONDS the current segment is closed (which
+# finalizes the MP4) and the next one started, and the manifest records its
+# offset in the call and marks it complete. Completed segments can be
+# processed while the call continues, a crash loses at most the segment in
+# progress, and no pass ever has to decode the whole call at once.
+#
+# Sessions that are no longer recording are pruned by age
+# (RECORD_MAX_AGE_HOURS) and, oldest first, by the total size of RECORD_DIR
+# (RECORD_MAX_MB).
+
+RECORD_DIR = os.getenv("RECORD_DIR", os.path.join(os.getcwd(), "records"))
+RECORD_SEGMENT_SECONDS = float(os.getenv("RECORD_SEGMENT_SECONDS", "300"))
+RECORD_MAX_AGE_HOURS = float(os.getenv("RECORD_MAX_AGE_HOURS", "72"))
+RECORD_MAX_MB = float(os.getenv("RECORD_MAX_MB", "5120"))
+MANIFEST_NAME = "manifest.json"
+# A recording session whose manifest has not changed for this many segment
+# lengths is treated as abandoned (e.g. the server stopped mid-call)
+STALE_SEGMENTS = 2
+
+
+def session_dir(session_id, record_dir=None):
+    return os.path.join(record_dir or RECORD_DIR, session_id)
+
+
+def is_session(path):
+    return os.path.isfile(os.path.join(path, MANIFEST_NAME))
+
+
+def session_meeting_id(path):
+    """Meeting id of a session; segments are still being written, so it is derived from the session id."""
+    return documents.content_hash(f"recording:{load_manifest(path)['session_id']}")
+
+
+# -------------------- Manifest -------------------- #
+def load_manifest(path):
+    with open(os.path.join(path, MANIFEST_NAME), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(path, manifest):
+    # Write then rename so readers never see a half-written manifest
+    manifest["updated"] = time.time()
+    target = os.path.join(path, MANIFEST_NAME)
+    with open(target + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(target + ".tmp", target)
+
+
+def is_active(manifest):
+    """Whether the session is still recording, as opposed to finished or abandoned."""
+    stale_after = STALE_SEGMENTS * manifest.get("segment_seconds", RECORD_SEGMENT_SECONDS)
+    return manifest["status"] == "recording" and time.time() - manifest["updated"] < stale_after
+
+
+def completed_segments(manifest):
+    return [segment for segment in manifest["segments"] if segment["status"] == "complete"]
+
+
+def recorded_seconds(manifest):
+    """Length of the call covered by completed segments."""
+    segments = completed_segments(manifest)
+    return segments[-1]["end"] if segments else 0.0
+
+
+def iter_completed_segments(path, until=None):
+    """
+    Yields (segment_path, start_seconds, end_seconds) for the session's
+    completed segments in order, only those ending by `until` if given.
+    """
+    for segment in completed_segments(load_manifest(path)):
+        if until is not None and segment["end"] > until:
+            return
+        yield os.path.join(path, segment["file"]), segment["start"], segment["end"]
+
+
+def transcribe_session(path, start_seconds=0, until=None, **kwargs):
+    """
+    Transcribes the completed segments of a recording session (those ending
+    by `until` if given), yielding segments with timestamps relative to the
+    start of the call. Segments ending before `start_seconds` are skipped,
+    so a later pass can resume where an earlier one stopped.
+    """
+    for segment_path, offset, end in iter_completed_segments(path, until=until):
+        if end <= start_seconds:
+            continue
+        for segment in transcription.transcribe(segment_path, start_seconds=max(start_seconds - offset, 0),
+                                                **kwargs):
+            yield dict(segment, start=segment["start"] + offset, end=segment["end"] + offset)
+
+
+# -------------------- Recorder -------------------- #
+class SegmentedRecorder:
+    """
+    Drop-in replacement for aiortc's MediaRecorder (as returned by a
+    streamlit-webrtc recorder factory) that writes a session of
+    fixed-length segments instead of one growing file.
+    """
+    def __init__(self, path, segment_seconds=RECORD_SEGMENT_SECONDS, format="mp4"):
+        self.path = path
+        self.segment_seconds = segment_seconds
+        self.format = format
+        self._tracks = []
+        self._recorder = None
+        self._rotation = None
+        self._started = None
+        os.makedirs(path, exist_ok=True)
+        self.manifest = {
+            "session_id": os.path.basename(os.path.normpath(path)),
+            "created": time.time(),
+            "status": "recording",
+            "segment_seconds": segment_seconds,
+            "format": format,
+            "segments": [],
+        }
+        save_manifest(path, self.manifest)
+
+    def addTrack(self, track):
+        self._tracks.append(track)
+
+    def _elapsed(self):
+        return time.monotonic() - self._started
+
+    async def _open_segment(self):
+        from aiortc.contrib.media import MediaRecorder
+        index = len(self.manifest["segments"])
+        name = f"segment_{index:05d}.{self.format}"
+        recorder = MediaRecorder(os.path.join(self.path, name), format=self.format)
+        for track in self._tracks:
+            recorder.addTrack(track)
+        await recorder.start()
+        self._recorder = recorder
+        self.manifest["segments"].append({"index": index, "file": name, "start": self._elapsed(), "end": None,
+                                          "status": "recording"})
+        save_manifest(self.path, self.manifest)
+
+    async def _close_segment(self):
+        recorder, self._recorder = self._recorder, None
+        if recorder is None:
+            return
+        await recorder.stop()
+        segment = self.manifest["segments"][-1]
+        segment["end"] = self._elapsed()
+        segment["status"] = "complete"
+        save_manifest(self.path, self.manifest)
+
+    async def _rotate(self):
+        while True:
+            await asyncio.sleep(self.segment_seconds)
+            try:
+                await self._close_segment()
+                await self._open_segment()
+            except Exception as e:
+                logger.error(f"Error starting a new recording segment in {self.path}: {str(e)}")
+
+    async def start(self):
+        self._started = time.monotonic()
+        await self._open_segment()
+        self._rotation = asyncio.ensure_future(self._rotate())
+
+    async def stop(self):
+        if self._rotation is not None:
+            self._rotation.cancel()
+            self._rotation = None
+        try:
+            await self._close_segment()
+        finally:
+            self.manifest["status"] = "finished"
+            save_manifest(self.path, self.manifest)
+
+
+def new_session(record_dir=None):
+    """Path for a new recording session; the directory is created when recording starts."""
+    return session_dir(uuid.uuid4().hex, record_dir)
+
+
+# -------------------- Retention -------------------- #
+def _size_bytes(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def _recordings(record_dir):
+    """(path, last_modified, active) for each session directory or single-file recording."""
+    recordings = []
+    for entry in os.scandir(record_dir):
+        try:
+            if is_session(entry.path):
+                manifest = load_manifest(entry.path)
+                recordings.append((entry.path, manifest["updated"], is_active(manifest)))
+            else:
+                recordings.append((entry.path, entry.stat().st_mtime, False))
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"Error reading recording {entry.path}: {str(e)}")
+    return recordings
+
+
+def _remove(path):
+    try:
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+        return True
+    except OSError as e:
+        logger.error(f"Error pruning recording {path}: {str(e)}")
+        return False
+
+
+def prune(max_age_hours=RECORD_MAX_AGE_HOURS, max_mb=RECORD_MAX_MB, keep=(), record_dir=None):
+    """
+    Deletes recordings that are not being recorded or listed in `keep`
+    (e.g. inputs of queued jobs): those older than `max_age_hours`, then the
+    oldest until RECORD_DIR is under `max_mb`. Returns the number removed.
+    """
+    record_dir = record_dir or RECORD_DIR
+    if not os.path.isdir(record_dir):
+        return 0
+    keep = {os.path.abspath(path) for path in keep}
+    cutoff = time.time() - max_age_hours * 3600
+    removed = 0
+    remaining = []
+    for path, modified, active in sorted(_recordings(record_dir), key=lambda recording: recording[1]):
+        size = _size_bytes(path)
+        if not active and os.path.abspath(path) not in keep and modified < cutoff and _remove(path):
+            removed += 1
+        else:
+            remaining.append((path, size, active))
+
+    total = sum(size for _, size, _ in remaining)
+    for path, size, active in remaining:
+        if total <= max_mb * 1024 * 1024:
+            break
+        if not active and os.path.abspath(path) not in keep and _remove(path):
+            removed += 1
+            total -= size
+    return removed
@@ -0,0 +1,206 @@
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+
+from tasks import models
+
+logger = logging.getLogger(__name__)
+
+# -------------------- Hybrid Retrieval -------------------- #
+# An in-process BM25 index over the collection's documents catches exact
+# terms (ticket numbers, names, acronyms) that dense search misses. Keyword
+# and dense rankings are fused with reciprocal rank fusion, and the fused
+# candidates can be reranked with a local cross-encoder.
+
+RETRIEVAL_MODES = ("hybrid", "dense", "keyword")
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "1") != "0"
+# Candidates taken from each ranking before fusion and reranking
+CANDIDATES = 20
+RRF_K = 60
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(text.lower())
+
+
+def build_where(meeting_id=None, doc_type=None, since=None, until=None):
+    """
+    Builds a ChromaDB metadata filter. `since` and `until` are epoch seconds
+    compared against the chunk's created_at.
+    """
+    conditions = []
+    if meeting_id:
+        conditions.append({"meeting_id": meeting_id})
+    if doc_type:
+        conditions.append({"type": doc_type})
+    if since is not None:
+        conditions.append({"created_at": {"$gte": int(since)}})
+    if until is not None:
+        conditions.append({"created_at": {"$lte": int(until)}})
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+
+def matches_filter(metadata, meeting_id=None, doc_type=None, since=None, until=None):
+    """The same filter as build_where, applied to one chunk's metadata in Python."""
+    metadata = metadata or {}
+    if meeting_id and metadata.get("meeting_id") != meeting_id:
+        return False
+    if doc_type and metadata.get("type") != doc_type:
+        return False
+    created_at = metadata.get("created_at")
+    if since is not None and (created_at is None or created_at < since):
+        return False
+    if until is not None and (created_at is None or created_at > until):
+        return False
+    return True
+
+
+class BM25Index:
+    def __init__(self, ids, texts, metadatas):
+        self.ids = ids
+        self.texts = texts
+        self.metadatas = metadatas
+        self.postings = defaultdict(list)
+        self.lengths = []
+        for idx, text in enumerate(texts):
+            counts = Counter(tokenize(text or ""))
+            self.lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings[term].append((idx, tf))
+        self.average_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+
+    def search(self, query, n_results, **filters):
+        """Returns [(doc_index, score)] for the best matching documents."""
+        scores = defaultdict(float)
+        n_docs = len(self.ids)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for idx, tf in postings:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[idx] / (self.average_length or 1))
+                scores[idx] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        if any(value is not None for value in filters.values()):
+            ranked = [(idx, score) for idx, score in ranked if matches_filter(self.metadatas[idx], **filters)]
+        return ranked[:n_results]
+
+
+class HybridRetriever:
+    """
+    Keyword, dense and hybrid search over a ChromaDB collection. The BM25
+    index is built lazily from the collection and rebuilt after invalidate()
+    or when `version()` changes, e.g. because another process indexed or
+    replaced chunks. `version` returns a stamp that every write to the
+    collection bumps; without it the collection size is used, which misses
+    writes that keep the size unchanged.
+    """
+    def __init__(self, collection, version=None):
+        self.collection = collection
+        self.version = version
+        self._index = None
+        self._indexed_version = None
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self._index = None
+
+    def _version(self):
+        if self.version is not None:
+            try:
+                return "version", self.version()
+            except Exception as e:
+                logger.error(f"Error reading the corpus version: {str(e)}")
+        return "count", self.collection.count()
+
+    def _bm25(self):
+        # Read before the documents, so a write in between triggers another rebuild
+        version = self._version()
+        with self._lock:
+            if self._index is None or self._indexed_version != version:
+                data = self.collection.get(include=["documents", "metadatas"])
+                self._index = BM25Index(data["ids"], data["documents"], data["metadatas"])
+                self._indexed_version = version
+            return self._index
+
+    def keyword_search(self, query, n_results, **filters):
+        index = self._bm25()
+        return [
+            {"id": index.ids[idx], "text": index.texts[idx], "metadata": index.metadatas[idx], "score": score}
+            for idx, score in index.search(query, n_results, **filters)
+        ]
+
+    def dense_search(self, query, n_results, **filters):
+        count = self.collection.count()
+        if count == 0:
+            return []
+        kwargs = {"query_texts": [query], "n_results": min(n_results, count)}
+        where = build_where(**filters)
+        if where:
+            kwargs["where"] = where
+        results = self.collection.query(**kwargs)
+        return [
+            {"id": chunk_id, "text": text, "metadata": metadata, "score": -distance}
+            for chunk_id, text, metadata, distance in zip(
+                results["ids"][0], results["documents"][0], results["metadatas"][0], results["distances"][0]
+            )
+        ]
+
+    def search(self, query, n_results=5, mode=RETRIEVAL_MODE, rerank=None, candidates=CANDIDATES, **filters):
+        """
+        Returns up to `n_results` hits as {"id", "text", "metadata", "score"}.
+        `filters` are meeting_id, doc_type, since and until (see build_where).
+        Reranking defaults to on for hybrid mode only.
+        """
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode: {mode}")
+        if rerank is None:
+            rerank = RERANK_ENABLED and mode == "hybrid"
+        pool = max(candidates, n_results)
+
+        if mode == "keyword":
+            hits = self.keyword_search(query, pool, **filters)
+        elif mode == "dense":
+            hits = self.dense_search(query, pool, **filters)
+        else:
+            hits = reciprocal_rank_fusion([
+                self.dense_search(query, pool, **filters),
+                self.keyword_search(query, pool, **filters),
+            ])
+
+        if rerank and len(hits) > 1:
+            hits = rerank_hits(query, hits)
+        return hits[:n_results]
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """Merges ranked hit lists; each hit scores sum(1 / (k + rank)) over the lists it appears in."""
+    fused = {}
+    for ranking in rankings:
+        for rank, hit in enumerate(ranking, start=1):
+            entry = fused.setdefault(hit["id"], dict(hit, score=0.0))
+            entry["score"] += 1.0 / (k + rank)
+    return sorted(fused.values(), key=lambda hit: hit["score"], reverse=True)
+
+
+def rerank_hits(query, hits):
+    """Reorders hits by cross-encoder relevance to the query."""
+    try:
+        scores = models.get_cross_encoder().predict([(query, hit["text"]) for hit in hits])
+    except Exception as e:
+        logger.error(f"Error reranking search results: {str(e)}")
+        return hits
+    reranked = [dict(hit, score=float(score)) for hit, score in zip(hits, scores)]
+    return sorted(reranked, key=lambda hit: hit["score"], reverse=True)
@@ -0,0 +1,119 @@
+import json
+import logging
+import os
+import sqlite3
+import time
+
+from tasks import models, sqlite_store
+
+logger = logging.getLogger(__name__)
+
+# -------------------- Semantic Answer Cache -------------------- #
+# Answers are stored with the embedding of the question that produced them.
+# A new question in the same search scope (meeting, source type, mode) whose
+# embedding is close enough to a stored one gets the stored answer without
+# retrieval or a Gemini call. Every entry records the knowledge base version
+# it was answered against; ingesting new transcripts or documents bumps the
+# version, which retires all earlier answers.
+
+SEMANTIC_CACHE_PATH = os.getenv("SEMANTIC_CACHE_PATH", os.path.join(os.getcwd(), "semantic_cache.sqlite3"))
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "1") != "0"
+SIMILARITY_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+MAX_ENTRIES_PER_SCOPE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    scope TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    query TEXT NOT NULL,
+    embedding BLOB NOT NULL,
+    answer TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS answers_scope ON answers (scope, version);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def _connection():
+    return sqlite_store.connect(SEMANTIC_CACHE_PATH, SCHEMA)
+
+
+def scope_key(search_options):
+    """Identifies the search scope of a question, e.g. one meeting's transcripts."""
+    return json.dumps({key: value for key, value in search_options.items() if value is not None}, sort_keys=True)
+
+
+def embed_query(query):
+    import numpy as np
+    return models.get_embedder().encode([query], normalize_embeddings=True, convert_to_numpy=True)[0].astype(np.float32)
+
+
+def corpus_version(connection=None):
+    connection = connection or _connection()
+    row = connection.execute("SELECT value FROM meta WHERE name = 'corpus_version'").fetchone()
+    return row[0] if row else 0
+
+
+def invalidate():
+    """Retires every cached answer; called whenever the knowledge base changes."""
+    try:
+        connection = _connection()
+        connection.execute(
+            "INSERT INTO meta (name, value) VALUES ('corpus_version', 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1"
+        )
+        connection.execute("DELETE FROM answers WHERE version < ?", (corpus_version(connection),))
+    except sqlite3.Error as e:
+        logger.error(f"Error invalidating semantic cache: {str(e)}")
+
+
+def lookup(query_embedding, scope, threshold=SIMILARITY_THRESHOLD):
+    """Returns the cached answer of the most similar question in scope, or None."""
+    import numpy as np
+    try:
+        connection = _connection()
+        rows = connection.execute(
+            "SELECT embedding, answer FROM answers WHERE scope = ? AND version = ?",
+            (scope, corpus_version(connection)),
+        ).fetchall()
+    except sqlite3.Error as e:
+        logger.error(f"Error reading semantic cache: {str(e)}")
+        return None
+    if not rows:
+        return None
+    embeddings = np.stack([np.frombuffer(row[0], dtype=np.float32) for row in rows])
+    similarities = embeddings @ query_embedding
+    best = int(np.argmax(similarities))
+    if similarities[best] < threshold:
+        return None
+    return rows[best][1]
+
+
+def store(query, query_embedding, scope, answer, version):
+    """
+    Caches an answer under the knowledge base `version` read before its
+    context was retrieved. An answer whose version has since been retired
+    by ingestion is not stored.
+    """
+    import numpy as np
+    try:
+        connection = _connection()
+        if version < corpus_version(connection):
+            return
+        connection.execute(
+            "INSERT INTO answers (scope, version, query, embedding, answer, created) VALUES (?, ?, ?, ?, ?, ?)",
+            (scope, version, query, np.asarray(query_embedding, dtype=np.float32).tobytes(), answer, time.time()),
+        )
+        # Keep only the newest entries of each scope
+        connection.execute(
+            "DELETE FROM answers WHERE scope = ? AND id NOT IN "
+            "(SELECT id FROM answers WHERE scope = ? ORDER BY id DESC LIMIT ?)",
+            (scope, scope, MAX_ENTRIES_PER_SCOPE),
+        )
+    except sqlite3.Error as e:
+        logger.error(f"Error writing semantic cache: {str(e)}")
@@ -0,0 +1,74 @@
+import hashlib
+import logging
+import os
+import tempfile
+import time
+
+logger = logging.getLogger(__name__)
+
+# -------------------- Upload Spool -------------------- #
+# Uploaded recordings are hashed, then streamed to disk in fixed-size chunks
+# and stored under the SHA-256 of their content. Uploading the same video
+# again (or rerunning the script) finds the existing file without writing
+# anything. Files not used for SPOOL_MAX_AGE_HOURS are pruned.
+
+SPOOL_DIR = os.getenv("SPOOL_DIR", os.path.join(os.getcwd(), "spool"))
+SPOOL_CHUNK_SIZE = 1024 * 1024
+SPOOL_MAX_AGE_HOURS = float(os.getenv("SPOOL_MAX_AGE_HOURS", "168"))
+
+
+def _hash_file(file):
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(SPOOL_CHUNK_SIZE), b""):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def spool_file(file, suffix="", spool_dir=None):
+    """
+    Copies a seekable binary file-like object into the spool and returns
+    (path, sha256). The content is hashed first and only written when it is
+    not already spooled, one chunk in memory at a time.
+    """
+    spool_dir = spool_dir or SPOOL_DIR
+    os.makedirs(spool_dir, exist_ok=True)
+    try:
+        sha = _hash_file(file)
+        path = os.path.join(spool_dir, sha + suffix)
+        if os.path.exists(path):
+            os.utime(path)
+            return path, sha
+
+        file.seek(0)
+        fd, temp_path = tempfile.mkstemp(dir=spool_dir, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                for chunk in iter(lambda: file.read(SPOOL_CHUNK_SIZE), b""):
+                    out.write(chunk)
+            # Another upload of the same content may have landed meanwhile; both copies are identical
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+    finally:
+        file.seek(0)
+    return path, sha
+
+
+def prune(max_age_hours=SPOOL_MAX_AGE_HOURS, spool_dir=None):
+    """Deletes spooled files that have not been used for `max_age_hours`."""
+    spool_dir = spool_dir or SPOOL_DIR
+    if not os.path.isdir(spool_dir):
+        return 0
+    cutoff = time.time() - max_age_hours * 3600
+    removed = 0
+    for entry in os.scandir(spool_dir):
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except OSError as e:
+            logger.error(f"Error pruning spooled file {entry.path}: {str(e)}")
+    return removed
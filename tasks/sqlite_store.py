@@ -0,0 +1,36 @@
+import sqlite3
+import threading
+
+# -------------------- Shared SQLite Connections -------------------- #
+# The LLM and answer caches, the job queue, the meeting artifacts and the
+# int8 vector store are SQLite databases shared by the app's threads and by
+# other processes. Each thread keeps one connection per database file, in
+# autocommit mode with WAL so readers do not block the writer, and waits for
+# a busy database instead of failing.
+
+BUSY_TIMEOUT_SECONDS = 30
+
+_local = threading.local()
+
+
+def connect(path, schema="", row_factory=None, migrate=None):
+    """
+    Returns this thread's connection to the database at `path`. On first use
+    in a thread the `schema` script is run, then `migrate(connection)` if
+    given, e.g. to add columns to tables created by an earlier version.
+    """
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    connection = connections.get(path)
+    if connection is None:
+        connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None)
+        if row_factory is not None:
+            connection.row_factory = row_factory
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_SECONDS * 1000}")
+        connection.executescript(schema)
+        if migrate is not None:
+            migrate(connection)
+        connections[path] = connection
+    return connection
@@ -0,0 +1,80 @@
+import logging
+
+from tasks import llm
+
+logger = logging.getLogger(__name__)
+
+# -------------------- Map-Reduce Summarization -------------------- #
+# Long transcripts are split into time-aligned windows of Whisper segments,
+# each window is summarized concurrently (map), and the insight prompts are
+# then run over the window summaries instead of the raw transcript (reduce).
+
+WINDOW_SECONDS = 300
+# Transcripts longer than this many characters use map-reduce by default
+LONG_TRANSCRIPT_CHARS = 20000
+
+MAP_PROMPT = """The following is one part ({start} - {end}) of a longer meeting transcript.
+Write a dense summary of this part. Keep every decision, topic, action item
+(with owner and deadline if mentioned), name, number and open question.
+Do not add anything that is not in the transcript.
+
+Transcript part:
+{text}"""
+
+
+def format_timestamp(seconds):
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours:d}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+
+def group_segments(segments, window_seconds=WINDOW_SECONDS):
+    """
+    Groups consecutive Whisper segments into windows of roughly
+    `window_seconds`, never splitting a segment.
+    """
+    windows = []
+    current = None
+    for segment in segments:
+        text = segment["text"].strip()
+        if not text:
+            continue
+        if current is None or segment["end"] - current["start"] > window_seconds:
+            current = {"start": segment["start"], "end": segment["end"], "texts": []}
+            windows.append(current)
+        current["end"] = segment["end"]
+        current["texts"].append(text)
+    return [{"start": w["start"], "end": w["end"], "text": " ".join(w["texts"])} for w in windows]
+
+
+def summarize_windows(client, windows, **request_kwargs):
+    """
+    Summarizes every window concurrently and returns the summaries in window
+    order. Each summary goes through the persistent LLM cache, so re-running
+    insights on the same transcript only pays for windows that changed.
+    """
+    summaries = [None] * len(windows)
+    prompts = {
+        idx: MAP_PROMPT.format(start=format_timestamp(window["start"]),
+                               end=format_timestamp(window["end"]), text=window["text"])
+        for idx, window in enumerate(windows)
+    }
+    for idx, text, error in llm.generate_many(client, prompts, **request_kwargs):
+        if error is not None:
+            # Fall back to the raw text so the reduce step still sees this part
+            logger.error(f"Error summarizing transcript window {idx}: {str(error)}")
+            summaries[idx] = windows[idx]["text"]
+        else:
+            summaries[idx] = text
+    return summaries
+
+
+def condense_transcript(client, segments, window_seconds=WINDOW_SECONDS, **request_kwargs):
+    """Returns the time-stamped window summaries of a transcript as one text."""
+    windows = group_segments(segments, window_seconds)
+    summaries = summarize_windows(client, windows, **request_kwargs)
+    return "\n\n".join(
+        f"[{format_timestamp(window['start'])} - {format_timestamp(window['end'])}]\n{summary}"
+        for window, summary in zip(windows, summaries)
+    )
@@ -0,0 +1,208 @@
+import logging
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from tasks import models
+
+logger = logging.getLogger(__name__)
+
+# -------------------- Streaming Transcription -------------------- #
+# Audio is decoded straight from the media container to mono 16 kHz float32
+# PCM (the format Whisper works on) and transcribed one fixed-size window at
+# a time, so memory stays flat and segments are available as soon as their
+# window is done.
+
+SAMPLE_RATE = 16000
+WINDOW_SECONDS = 30
+# Characters of the previous window's text passed to Whisper as context
+PROMPT_CHARS = 200
+
+# Parallel mode: the audio is cut into pieces of about PIECE_SECONDS at the
+# quietest point of the last SILENCE_SEARCH_SECONDS before each target cut,
+# and the pieces are transcribed in a process pool with one model per worker.
+TRANSCRIBE_WORKERS = int(os.getenv("TRANSCRIBE_WORKERS", "1"))
+PIECE_SECONDS = 60
+SILENCE_SEARCH_SECONDS = 10
+ENERGY_FRAME_SECONDS = 0.03
+DECODE_WINDOW_SECONDS = 5
+
+
+def iter_audio_windows(path, window_seconds=WINDOW_SECONDS, start_seconds=0):
+    """
+    Decodes the first audio stream of a media file and yields
+    (start_seconds, samples) windows of `window_seconds` of float32 PCM,
+    beginning `start_seconds` into the recording.
+    Yields nothing if the file has no audio stream.
+    """
+    import av
+    import numpy as np
+
+    window_samples = int(window_seconds * SAMPLE_RATE)
+    with av.open(str(path)) as container:
+        if not container.streams.audio:
+            logger.warning(f"No audio stream in {path}")
+            return
+        stream = container.streams.audio[0]
+        resampler = av.AudioResampler(format="flt", layout="mono", rate=SAMPLE_RATE)
+
+        buffer = []
+        buffered = 0
+        skip = int(start_seconds * SAMPLE_RATE)
+        offset = skip
+
+        def resampled(frame):
+            for out in resampler.resample(frame):
+                yield out.to_ndarray().reshape(-1)
+
+        def frames():
+            for frame in container.decode(stream):
+                yield from resampled(frame)
+            # Flush samples still held by the resampler
+            yield from resampled(None)
+
+        for samples in frames():
+            if skip:
+                # Decoding is cheap next to Whisper, so resuming simply discards the audio before start_seconds
+                dropped = min(skip, len(samples))
+                samples = samples[dropped:]
+                skip -= dropped
+                if not len(samples):
+                    continue
+            buffer.append(samples)
+            buffered += len(samples)
+            if buffered < window_samples:
+                continue
+            data = np.concatenate(buffer)
+            while len(data) >= window_samples:
+                yield offset / SAMPLE_RATE, data[:window_samples]
+                data = data[window_samples:]
+                offset += window_samples
+            buffer = [data]
+            buffered = len(data)
+
+        if buffered:
+            yield offset / SAMPLE_RATE, np.concatenate(buffer)
+
+
+def transcribe_samples(samples, offset=0.0, model=None, language=None, initial_prompt=None):
+    """
+    Transcribes a window of 16 kHz float32 samples. Returns Whisper's result
+    with segment timestamps shifted by `offset` seconds.
+    """
+    model = model or models.get_whisper()
+    result = model.transcribe(samples, language=language, initial_prompt=initial_prompt or None)
+    duration = len(samples) / SAMPLE_RATE
+    result["segments"] = [
+        {"start": offset + segment["start"], "end": offset + min(segment["end"], duration), "text": segment["text"]}
+        for segment in result.get("segments", [])
+    ]
+    return result
+
+
+def transcribe_stream(path, model=None, window_seconds=WINDOW_SECONDS, language=None, start_seconds=0):
+    """
+    Transcribes a media file window by window and yields timestamped
+    segments ({"start", "end", "text"}) as soon as each window is done.
+    The language detected on the first window is reused for the rest.
+    """
+    model = model or models.get_whisper()
+    previous_text = ""
+    for offset, samples in iter_audio_windows(path, window_seconds, start_seconds):
+        result = transcribe_samples(samples, offset, model=model, language=language,
+                                    initial_prompt=previous_text[-PROMPT_CHARS:])
+        language = language or result.get("language")
+        previous_text = result.get("text", "")
+        yield from result["segments"]
+
+
+def segments_to_text(segments):
+    return "".join(segment["text"] for segment in segments).strip()
+
+
+# -------------------- Parallel Transcription -------------------- #
+def find_quiet_cut(samples, search_start, search_end, frame_samples=None):
+    """
+    Returns the sample index of the centre of the lowest-energy frame in
+    samples[search_start:search_end].
+    """
+    import numpy as np
+
+    frame_samples = frame_samples or int(ENERGY_FRAME_SECONDS * SAMPLE_RATE)
+    region = samples[search_start:search_end]
+    n_frames = len(region) // frame_samples
+    if n_frames == 0:
+        return search_end
+    frames = region[:n_frames * frame_samples].reshape(n_frames, frame_samples)
+    energy = np.einsum("ij,ij->i", frames, frames)
+    return search_start + int(np.argmin(energy)) * frame_samples + frame_samples // 2
+
+
+def iter_speech_pieces(path, piece_seconds=PIECE_SECONDS, search_seconds=SILENCE_SEARCH_SECONDS, start_seconds=0):
+    """
+    Yields (start_seconds, samples) pieces of about `piece_seconds`, each cut
+    at a quiet point so that words are not split between pieces.
+    """
+    import numpy as np
+
+    piece_samples = int(piece_seconds * SAMPLE_RATE)
+    search_samples = min(int(search_seconds * SAMPLE_RATE), piece_samples // 2)
+    pending = np.zeros(0, dtype=np.float32)
+    offset = int(start_seconds * SAMPLE_RATE)
+    for _, samples in iter_audio_windows(path, DECODE_WINDOW_SECONDS, start_seconds):
+        pending = np.concatenate([pending, samples])
+        while len(pending) >= piece_samples:
+            cut = find_quiet_cut(pending, piece_samples - search_samples, piece_samples)
+            yield offset / SAMPLE_RATE, pending[:cut]
+            pending = pending[cut:]
+            offset += cut
+    if len(pending):
+        yield offset / SAMPLE_RATE, pending
+
+
+_worker_model_size = None
+
+
+def _init_worker(model_size, threads):
+    global _worker_model_size
+    import torch
+    torch.set_num_threads(threads)
+    _worker_model_size = model_size
+    # Load once per worker process, before the first piece arrives
+    models.get_whisper(model_size)
+
+
+def _transcribe_piece(offset, samples, language):
+    return transcribe_samples(samples, offset, model=models.get_whisper(_worker_model_size),
+                              language=language)["segments"]
+
+
+def transcribe_parallel(path, workers=TRANSCRIBE_WORKERS, model_size=models.WHISPER_MODEL_SIZE,
+                        piece_seconds=PIECE_SECONDS, language=None, start_seconds=0):
+    """
+    Transcribes a media file on a pool of `workers` processes, each with its
+    own Whisper model, and yields the segments in order with timestamps
+    relative to the whole recording. At most two pieces per worker are in
+    flight, so memory stays bounded for long recordings.
+    """
+    import multiprocessing
+
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    # spawn: forking a process that already holds torch/Streamlit state is unsafe
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_worker, initargs=(model_size, threads)) as pool:
+        in_flight = deque()
+        for offset, samples in iter_speech_pieces(path, piece_seconds, start_seconds=start_seconds):
+            in_flight.append(pool.submit(_transcribe_piece, offset, samples, language))
+            if len(in_flight) >= 2 * workers:
+                yield from in_flight.popleft().result()
+        while in_flight:
+            yield from in_flight.popleft().result()
+
+
+def transcribe(path, workers=TRANSCRIBE_WORKERS, **kwargs):
+    """Streams segments of a media file, in parallel when more than one worker is configured."""
+    if workers > 1:
+        return transcribe_parallel(path, workers=workers, **kwargs)
+    return transcribe_stream(path, **kwargs)
@@ -17,4 +17,4 @@ def upload_documents():
         st.write("Documents uploaded:")
         for idx, file in enumerate(uploaded_files, start=1):
             st.write(f"{idx}. {file.name}")
-            
\ No newline at end of file
+    return uploaded_files
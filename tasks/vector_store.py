@@ -0,0 +1,617 @@
+import contextlib
+import json
+import logging
+import os
+import re
+import threading
+
+import numpy as np
+
+from tasks import sqlite_store
+
+logger = logging.getLogger(__name__)
+
+# -------------------- Vector Store Backends -------------------- #
+# QnA and the retriever talk to a collection through the subset of the
+# ChromaDB collection API they use: add, get, update, delete, count and
+# query, with Chroma-style `where` filters and result shapes. Any object
+# providing those methods can back the knowledge base:
+#
+# - "int8" (the default): Int8VectorStore below, a flat (or IVF) index of
+#   int8-quantized embeddings in memory-mapped files next to a SQLite table
+#   of ids, documents and metadata. The vector files are mapped read-only,
+#   so several app processes serving one index share a single copy through
+#   the OS page cache, and writers serialize on a file lock.
+# - "chroma": a ChromaDB persistent collection. A persistent client must
+#   not share its directory with clients in other processes, so this
+#   backend is only safe when nothing else writes to it, i.e. not while
+#   job workers (tasks/jobs.py) index transcripts in their own processes.
+#
+# Either backend can be sharded by a metadata key (VECTOR_SHARD_KEY, e.g.
+# "meeting_id" or "team"): each value gets its own collection, queries
+# filtered on that key only touch their shard, and unfiltered queries
+# merge the results of every shard.
+
+VECTOR_BACKENDS = ("chroma", "int8")
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "int8")
+CHROMA_PATH = os.getenv("CHROMA_PATH", os.path.join(os.getcwd(), "chroma_db"))
+VECTOR_STORE_PATH = os.getenv("VECTOR_STORE_PATH", os.path.join(os.getcwd(), "vector_store"))
+VECTOR_SHARD_KEY = os.getenv("VECTOR_SHARD_KEY", "")
+# Number of IVF lists; 0 keeps the int8 index flat (exact search)
+VECTOR_IVF_LISTS = int(os.getenv("VECTOR_IVF_LISTS", "0"))
+VECTOR_IVF_PROBES = int(os.getenv("VECTOR_IVF_PROBES", "8"))
+# The IVF index is only built once a shard has this many vectors
+IVF_MIN_ROWS = 4096
+IVF_TRAIN_SAMPLE = 50000
+IVF_ITERATIONS = 10
+# Rows dequantized at a time during a scan, bounding the float32 working set
+SCAN_BLOCK_ROWS = 16384
+DEFAULT_SHARD = "default"
+SHARD_NAME_CHARS = 40
+
+_SHARD_NAME_RE = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+# -------------------- Metadata Filters -------------------- #
+_OPERATORS = {
+    "$eq": lambda value, target: value == target,
+    "$ne": lambda value, target: value != target,
+    "$gt": lambda value, target: value is not None and value > target,
+    "$gte": lambda value, target: value is not None and value >= target,
+    "$lt": lambda value, target: value is not None and value < target,
+    "$lte": lambda value, target: value is not None and value <= target,
+    "$in": lambda value, target: value in target,
+    "$nin": lambda value, target: value not in target,
+}
+
+
+def matches_where(metadata, where):
+    """Evaluates a Chroma-style `where` filter ($and, $or and field operators) against one metadata dict."""
+    if not where:
+        return True
+    metadata = metadata or {}
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            for operator, target in condition.items():
+                if operator not in _OPERATORS:
+                    raise ValueError(f"Unsupported filter operator: {operator}")
+                if not _OPERATORS[operator](value, target):
+                    return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+def where_value(where, key):
+    """The value a filter requires `key` to equal, or None if it allows several."""
+    if not where:
+        return None
+    condition = where.get(key)
+    if condition is not None and not isinstance(condition, dict):
+        return condition
+    if isinstance(condition, dict) and "$eq" in condition:
+        return condition["$eq"]
+    for clause in where.get("$and", []):
+        value = where_value(clause, key)
+        if value is not None:
+            return value
+    return None
+
+
+# -------------------- Quantization -------------------- #
+def normalize(embeddings):
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.maximum(norms, 1e-12)
+
+
+def quantize(embeddings):
+    """Symmetric per-vector int8 quantization; returns (codes, scales)."""
+    scales = np.abs(embeddings).max(axis=1) / 127.0
+    scales = np.maximum(scales, 1e-12).astype(np.float32)
+    codes = np.clip(np.rint(embeddings / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales
+
+
+def kmeans(vectors, n_clusters, iterations=IVF_ITERATIONS, seed=0):
+    """Spherical k-means on normalized vectors; returns normalized centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        for cluster in range(n_clusters):
+            members = vectors[assignments == cluster]
+            if len(members):
+                centroids[cluster] = members.sum(axis=0)
+        centroids = normalize(centroids)
+    return centroids
+
+
+# -------------------- Int8 Memory-Mapped Store -------------------- #
+STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    row INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    document TEXT,
+    metadata TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class Int8VectorStore:
+    """
+    A collection of int8-quantized, L2-normalized embeddings in `path`.
+
+    Vectors live in append-only memory-mapped files (vectors.i8 and
+    scales.f32) indexed by row; ids, documents and metadata live in SQLite.
+    Deleting an item drops its row from SQLite and leaves its vector
+    unreferenced. Distances are cosine distances (1 - similarity).
+    With `ivf_lists` > 0 an IVF index is trained once the store holds
+    IVF_MIN_ROWS vectors and retrained when it has doubled; unfiltered
+    queries then scan only the `ivf_probes` closest lists plus the rows
+    added since training. Filtered queries always scan the matching rows
+    exactly.
+    """
+    def __init__(self, path, embedding_function=None, ivf_lists=VECTOR_IVF_LISTS, ivf_probes=VECTOR_IVF_PROBES):
+        self.path = path
+        self.embedding_function = embedding_function
+        self.ivf_lists = ivf_lists
+        self.ivf_probes = ivf_probes
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._view = None
+
+    # ---- storage ---- #
+    def _db(self):
+        return sqlite_store.connect(os.path.join(self.path, "items.sqlite3"), STORE_SCHEMA)
+
+    def _meta(self, name, default=None):
+        row = self._db().execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def _set_meta(self, name, value):
+        self._db().execute("INSERT INTO meta (name, value) VALUES (?, ?) "
+                           "ON CONFLICT(name) DO UPDATE SET value = excluded.value", (name, json.dumps(value)))
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    @contextlib.contextmanager
+    def _write_lock(self):
+        """Serializes writers across threads and processes."""
+        import fcntl
+        with self._lock, open(self._file("write.lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _bump_version(self):
+        self._set_meta("version", self._meta("version", 0) + 1)
+
+    def _load_view(self):
+        """
+        Maps the vector files and loads the live rows' ids and metadata,
+        reusing the previous view until another writer bumps the version.
+        """
+        version = self._meta("version", 0)
+        view = self._view
+        if view is not None and view["version"] == version:
+            return view
+        connection = self._db()
+        # One read transaction, so the rows and the row count come from the same snapshot
+        connection.execute("BEGIN")
+        try:
+            version = self._meta("version", 0)
+            dim = self._meta("dim")
+            rows = connection.execute("SELECT row, id, metadata FROM items ORDER BY row").fetchall()
+            n_rows = self._meta("rows", 0)
+        finally:
+            connection.execute("COMMIT")
+        view = {
+            "version": version,
+            "dim": dim,
+            "rows": np.array([row[0] for row in rows], dtype=np.int64),
+            "ids": [row[1] for row in rows],
+            "positions": {row[1]: pos for pos, row in enumerate(rows)},
+            "metadatas": [json.loads(row[2]) for row in rows],
+            "vectors": None,
+            "scales": None,
+            "ivf": None,
+        }
+        if dim and n_rows:
+            view["vectors"] = np.memmap(self._file("vectors.i8"), dtype=np.int8, mode="r", shape=(n_rows, dim))
+            view["scales"] = np.memmap(self._file("scales.f32"), dtype=np.float32, mode="r", shape=(n_rows,))
+            view["ivf"] = self._load_ivf(n_rows)
+        self._view = view
+        return view
+
+    def _embed(self, documents):
+        if self.embedding_function is None:
+            raise ValueError("No embedding function configured; pass embeddings explicitly.")
+        return self.embedding_function(list(documents))
+
+    # ---- Chroma collection API ---- #
+    def count(self):
+        return len(self._load_view()["ids"])
+
+    def add(self, ids, documents=None, metadatas=None, embeddings=None):
+        if embeddings is None:
+            embeddings = self._embed(documents)
+        documents = documents if documents is not None else [None] * len(ids)
+        metadatas = metadatas if metadatas is not None else [{}] * len(ids)
+        codes, scales = quantize(normalize(embeddings))
+        with self._write_lock():
+            connection = self._db()
+            existing = {row[0] for row in connection.execute(
+                f"SELECT id FROM items WHERE id IN ({','.join('?' * len(ids))})", list(ids))}
+            keep = [idx for idx, item_id in enumerate(ids) if item_id not in existing]
+            if len(keep) < len(ids):
+                logger.warning(f"Skipping {len(ids) - len(keep)} ids that are already in the store")
+            if not keep:
+                return
+            dim = self._meta("dim")
+            if dim is None:
+                dim = codes.shape[1]
+                self._set_meta("dim", dim)
+            elif dim != codes.shape[1]:
+                raise ValueError(f"Embedding dimension {codes.shape[1]} does not match the store's {dim}")
+            start = self._meta("rows", 0)
+            # Vectors are appended before the rows are committed, so readers never see a row without its vector
+            with open(self._file("vectors.i8"), "ab") as f:
+                f.truncate(start * dim)
+                f.write(codes[keep].tobytes())
+            with open(self._file("scales.f32"), "ab") as f:
+                f.truncate(start * 4)
+                f.write(scales[keep].tobytes())
+            connection.execute("BEGIN IMMEDIATE")
+            connection.executemany(
+                "INSERT INTO items (row, id, document, metadata) VALUES (?, ?, ?, ?)",
+                [(start + offset, ids[idx], documents[idx], json.dumps(metadatas[idx] or {}))
+                 for offset, idx in enumerate(keep)],
+            )
+            self._set_meta("rows", start + len(keep))
+            self._bump_version()
+            connection.execute("COMMIT")
+            if self.ivf_lists:
+                self._maybe_train_ivf(start + len(keep), dim)
+
+    def update(self, ids, metadatas=None, documents=None, embeddings=None):
+        """Replaces metadata; documents or embeddings are re-added under the same ids."""
+        if documents is not None or embeddings is not None:
+            current = self.get(ids=ids, include=["metadatas", "documents"])
+            by_id = dict(zip(current["ids"], zip(current["documents"], current["metadatas"])))
+            new_metadatas = metadatas or [by_id[item_id][1] for item_id in ids]
+            new_documents = documents or [by_id[item_id][0] for item_id in ids]
+            self.delete(ids=ids)
+            self.add(ids=ids, documents=new_documents, metadatas=new_metadatas, embeddings=embeddings)
+            return
+        with self._write_lock():
+            connection = self._db()
+            connection.execute("BEGIN IMMEDIATE")
+            connection.executemany("UPDATE items SET metadata = ? WHERE id = ?",
+                                   [(json.dumps(metadata or {}), item_id) for item_id, metadata in zip(ids, metadatas)])
+            self._bump_version()
+            connection.execute("COMMIT")
+
+    def delete(self, ids=None, where=None):
+        if where is not None:
+            ids = list(ids or []) + self.get(where=where, include=[])["ids"]
+        if not ids:
+            return
+        with self._write_lock():
+            connection = self._db()
+            connection.execute("BEGIN IMMEDIATE")
+            connection.executemany("DELETE FROM items WHERE id = ?", [(item_id,) for item_id in ids])
+            self._bump_version()
+            connection.execute("COMMIT")
+
+    def get(self, ids=None, where=None, limit=None, include=("metadatas", "documents")):
+        view = self._load_view()
+        if ids is not None:
+            positions = [view["positions"][item_id] for item_id in dict.fromkeys(ids) if item_id in view["positions"]]
+        else:
+            positions = range(len(view["ids"]))
+        positions = [pos for pos in positions if matches_where(view["metadatas"][pos], where)]
+        if limit is not None:
+            positions = positions[:limit]
+        return self._result([view["ids"][pos] for pos in positions], view, positions, include)
+
+    def query(self, query_texts=None, n_results=10, where=None, query_embeddings=None,
+              include=("metadatas", "documents", "distances")):
+        if query_embeddings is None:
+            query_embeddings = self._embed(query_texts)
+        view = self._load_view()
+        queries = normalize(query_embeddings)
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for query in queries:
+            positions, similarities = self._search(view, query, n_results, where)
+            hits = self._result([view["ids"][pos] for pos in positions], view, positions, include)
+            for key in ("ids", "documents", "metadatas"):
+                result[key].append(hits.get(key))
+            result["distances"].append([float(1.0 - s) for s in similarities])
+        return result
+
+    def _result(self, ids, view, positions, include):
+        result = {"ids": ids}
+        if "metadatas" in include:
+            result["metadatas"] = [view["metadatas"][pos] for pos in positions]
+        if "documents" in include:
+            documents = {}
+            for start in range(0, len(ids), 500):
+                batch = ids[start:start + 500]
+                documents.update(self._db().execute(
+                    f"SELECT id, document FROM items WHERE id IN ({','.join('?' * len(batch))})", batch))
+            result["documents"] = [documents.get(item_id) for item_id in ids]
+        if "embeddings" in include:
+            rows = view["rows"][list(positions)]
+            result["embeddings"] = (view["vectors"][rows].astype(np.float32) * view["scales"][rows][:, None]).tolist() \
+                if len(rows) else []
+        return result
+
+    # ---- search ---- #
+    def _search(self, view, query, n_results, where):
+        """Returns (positions into the view, similarities), best first."""
+        if view["vectors"] is None or not view["ids"]:
+            return [], []
+        if where:
+            candidates = np.array([pos for pos, metadata in enumerate(view["metadatas"])
+                                   if matches_where(metadata, where)], dtype=np.int64)
+        elif view["ivf"] is not None:
+            candidates = self._ivf_candidates(view, query)
+        else:
+            candidates = np.arange(len(view["ids"]), dtype=np.int64)
+        if not len(candidates):
+            return [], []
+
+        similarities = np.empty(len(candidates), dtype=np.float32)
+        for start in range(0, len(candidates), SCAN_BLOCK_ROWS):
+            block = candidates[start:start + SCAN_BLOCK_ROWS]
+            rows = view["rows"][block]
+            if len(rows) and rows[-1] - rows[0] + 1 == len(rows):
+                # Contiguous rows are read as a slice of the map instead of a gather
+                vectors = view["vectors"][rows[0]:rows[-1] + 1]
+                scales = view["scales"][rows[0]:rows[-1] + 1]
+            else:
+                vectors, scales = view["vectors"][rows], view["scales"][rows]
+            similarities[start:start + len(block)] = (vectors.astype(np.float32) @ query) * scales
+
+        k = min(n_results, len(candidates))
+        top = np.argpartition(-similarities, k - 1)[:k]
+        top = top[np.argsort(-similarities[top])]
+        return candidates[top].tolist(), similarities[top].tolist()
+
+    # ---- IVF ---- #
+    def _load_ivf(self, n_rows):
+        state = self._meta("ivf")
+        if not state or not os.path.exists(self._file("ivf_centroids.npy")):
+            return None
+        trained_rows = min(state["rows"], n_rows)
+        return {
+            "centroids": np.load(self._file("ivf_centroids.npy")),
+            "assignments": np.memmap(self._file("ivf_assignments.i32"), dtype=np.int32, mode="r",
+                                     shape=(state["rows"],))[:trained_rows],
+            "rows": trained_rows,
+        }
+
+    def _maybe_train_ivf(self, n_rows, dim):
+        state = self._meta("ivf")
+        if n_rows < max(IVF_MIN_ROWS, self.ivf_lists) or (state and n_rows < 2 * state["rows"]):
+            return
+        logger.info(f"Training IVF index with {self.ivf_lists} lists over {n_rows} vectors in {self.path}")
+        vectors = np.memmap(self._file("vectors.i8"), dtype=np.int8, mode="r", shape=(n_rows, dim))
+        scales = np.memmap(self._file("scales.f32"), dtype=np.float32, mode="r", shape=(n_rows,))
+        sample = np.random.default_rng(0).choice(n_rows, size=min(n_rows, IVF_TRAIN_SAMPLE), replace=False)
+        sample.sort()
+        centroids = kmeans(normalize(vectors[sample].astype(np.float32) * scales[sample][:, None]), self.ivf_lists)
+        assignments = np.empty(n_rows, dtype=np.int32)
+        for start in range(0, n_rows, SCAN_BLOCK_ROWS):
+            block = vectors[start:start + SCAN_BLOCK_ROWS].astype(np.float32)
+            assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        np.save(self._file("ivf_centroids.npy.tmp.npy"), centroids)
+        os.replace(self._file("ivf_centroids.npy.tmp.npy"), self._file("ivf_centroids.npy"))
+        assignments.tofile(self._file("ivf_assignments.i32.tmp"))
+        os.replace(self._file("ivf_assignments.i32.tmp"), self._file("ivf_assignments.i32"))
+        self._set_meta("ivf", {"rows": n_rows, "lists": self.ivf_lists})
+        self._bump_version()
+
+    def _ivf_candidates(self, view, query):
+        """Positions in the probed lists, plus every row added after the IVF index was trained."""
+        ivf = view["ivf"]
+        probes = np.argsort(-(ivf["centroids"] @ query))[:self.ivf_probes]
+        rows = view["rows"]
+        trained = rows < ivf["rows"]
+        in_lists = np.zeros(len(rows), dtype=bool)
+        in_lists[trained] = np.isin(ivf["assignments"][rows[trained]], probes)
+        return np.nonzero(in_lists | ~trained)[0]
+
+
+# -------------------- Sharding -------------------- #
+class ShardedCollection:
+    """
+    Spreads a collection over shards by the value of one metadata key. Items
+    without the key go to DEFAULT_SHARD. `open_shard(name)` returns a
+    collection for a shard and `list_shards()` the names of existing ones.
+    """
+    def __init__(self, shard_key, open_shard, list_shards):
+        self.shard_key = shard_key
+        self._open_shard = open_shard
+        self._list_shards = list_shards
+        self._shards = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def shard_name(value):
+        # Truncated to fit ChromaDB's collection name limit; meeting ids are hashes, so prefixes stay unique
+        return _SHARD_NAME_RE.sub("_", str(value))[:SHARD_NAME_CHARS] if value is not None else DEFAULT_SHARD
+
+    def _shard(self, name):
+        with self._lock:
+            if name not in self._shards:
+                self._shards[name] = self._open_shard(name)
+            return self._shards[name]
+
+    def _all_shards(self):
+        for name in sorted(set(self._list_shards()) | set(self._shards)):
+            yield self._shard(name)
+
+    def _targets(self, where):
+        value = where_value(where, self.shard_key)
+        if value is not None:
+            name = self.shard_name(value)
+            return [self._shard(name)] if name in self._list_shards() or name in self._shards else []
+        return list(self._all_shards())
+
+    def count(self):
+        return sum(shard.count() for shard in self._all_shards())
+
+    def add(self, ids, documents=None, metadatas=None, embeddings=None):
+        groups = {}
+        for idx, metadata in enumerate(metadatas or [{}] * len(ids)):
+            groups.setdefault(self.shard_name((metadata or {}).get(self.shard_key)), []).append(idx)
+        for name, indexes in groups.items():
+            self._shard(name).add(
+                ids=[ids[idx] for idx in indexes],
+                documents=[documents[idx] for idx in indexes] if documents is not None else None,
+                metadatas=[metadatas[idx] for idx in indexes] if metadatas is not None else None,
+                embeddings=[embeddings[idx] for idx in indexes] if embeddings is not None else None,
+            )
+
+    def update(self, ids, metadatas=None, documents=None, embeddings=None):
+        """Updates items in place, moving those whose shard key changed to their new shard."""
+        wanted = {item_id: idx for idx, item_id in enumerate(ids)}
+        for shard in list(self._all_shards()):
+            found = shard.get(ids=ids, include=["metadatas", "documents", "embeddings"])
+            if not found["ids"]:
+                continue
+            stay, move = [], []
+            for pos, item_id in enumerate(found["ids"]):
+                metadata = metadatas[wanted[item_id]] if metadatas is not None else found["metadatas"][pos]
+                target = self.shard_name((metadata or {}).get(self.shard_key))
+                (stay if self._shard(target) is shard else move).append((pos, item_id))
+            if stay:
+                shard.update(
+                    ids=[item_id for _, item_id in stay],
+                    metadatas=[metadatas[wanted[item_id]] for _, item_id in stay] if metadatas is not None else None,
+                    documents=[documents[wanted[item_id]] for _, item_id in stay] if documents is not None else None,
+                    embeddings=[embeddings[wanted[item_id]] for _, item_id in stay] if embeddings is not None else None,
+                )
+            if move:
+                shard.delete(ids=[item_id for _, item_id in move])
+                self.add(
+                    ids=[item_id for _, item_id in move],
+                    documents=[documents[wanted[item_id]] if documents is not None else found["documents"][pos]
+                               for pos, item_id in move],
+                    metadatas=[metadatas[wanted[item_id]] if metadatas is not None else found["metadatas"][pos]
+                               for pos, item_id in move],
+                    embeddings=[embeddings[wanted[item_id]] if embeddings is not None else found["embeddings"][pos]
+                                for pos, item_id in move],
+                )
+
+    def delete(self, ids=None, where=None):
+        for shard in self._targets(where):
+            if ids is not None:
+                shard.delete(ids=ids)
+            if where is not None:
+                shard.delete(where=where)
+
+    def get(self, ids=None, where=None, limit=None, include=("metadatas", "documents")):
+        result = {"ids": []}
+        for key in include:
+            result[key] = []
+        for shard in self._targets(where):
+            kwargs = {"include": list(include)}
+            if ids is not None:
+                kwargs["ids"] = ids
+            if where:
+                kwargs["where"] = where
+            part = shard.get(**kwargs)
+            for key in result:
+                # ChromaDB returns embeddings as a NumPy array, which has no truth value
+                values = part.get(key)
+                if values is not None:
+                    result[key].extend(list(values))
+        if limit is not None:
+            result = {key: values[:limit] for key, values in result.items()}
+        return result
+
+    def query(self, query_texts=None, n_results=10, where=None, query_embeddings=None,
+              include=("metadatas", "documents", "distances")):
+        include = list(include) if "distances" in include else [*include, "distances"]
+        n_queries = len(query_embeddings if query_embeddings is not None else query_texts)
+        merged = [[] for _ in range(n_queries)]
+        for shard in self._targets(where):
+            shard_count = shard.count()
+            if not shard_count:
+                continue
+            kwargs = {"n_results": min(n_results, shard_count), "include": include}
+            if query_embeddings is not None:
+                kwargs["query_embeddings"] = query_embeddings
+            else:
+                kwargs["query_texts"] = query_texts
+            if where:
+                kwargs["where"] = where
+            part = shard.query(**kwargs)
+            for q in range(n_queries):
+                for pos in range(len(part["ids"][q])):
+                    merged[q].append({key: part[key][q][pos] if part.get(key) is not None else None
+                                      for key in ("ids", "documents", "metadatas", "distances")})
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for hits in merged:
+            hits = sorted(hits, key=lambda hit: hit["distances"])[:n_results]
+            for key in result:
+                result[key].append([hit[key] for hit in hits])
+        return result
+
+
+# -------------------- Factory -------------------- #
+def _chroma_client(path):
+    import chromadb
+    return chromadb.PersistentClient(path=path)
+
+
+def open_collection(name, embedding_function, backend=VECTOR_BACKEND, shard_key=VECTOR_SHARD_KEY):
+    """Opens the named collection on the configured backend, sharded by `shard_key` if set."""
+    if backend not in VECTOR_BACKENDS:
+        raise ValueError(f"Unknown vector backend: {backend}")
+
+    if backend == "chroma":
+        client = _chroma_client(CHROMA_PATH)
+
+        def open_shard(shard_name):
+            return client.get_or_create_collection(name=shard_name, embedding_function=embedding_function)
+
+        if not shard_key:
+            return open_shard(name)
+        prefix = f"{name}__"
+
+        def list_shards():
+            # list_collections returns names in newer ChromaDB releases and collections in older ones
+            names = [getattr(c, "name", c) for c in client.list_collections()]
+            return [n[len(prefix):] for n in names if n.startswith(prefix)]
+
+        return ShardedCollection(shard_key, lambda shard: open_shard(prefix + shard), list_shards)
+
+    root = os.path.join(VECTOR_STORE_PATH, name)
+    if not shard_key:
+        return Int8VectorStore(root, embedding_function)
+
+    def list_shards():
+        if not os.path.isdir(root):
+            return []
+        return [entry.name for entry in os.scandir(root) if entry.is_dir()]
+
+    return ShardedCollection(shard_key, lambda shard: Int8VectorStore(os.path.join(root, shard), embedding_function),
+                             list_shards)
@@ -0,0 +1,33 @@
+import re
+
+import pytest
+
+from tasks import documents, llm_cache
+
+_WORD_RE = re.compile(r"\S+")
+
+
+class WordTokenizer:
+    """
+    Stands in for the embedding model's word-piece tokenizer: one token per
+    whitespace-separated word, with the same call signature and result keys.
+    """
+    def __call__(self, text, add_special_tokens=False, return_offsets_mapping=False):
+        offsets = [match.span() for match in _WORD_RE.finditer(text)]
+        result = {"input_ids": list(range(len(offsets)))}
+        if return_offsets_mapping:
+            result["offset_mapping"] = offsets
+        return result
+
+
+@pytest.fixture
+def word_tokenizer(monkeypatch):
+    tokenizer = WordTokenizer()
+    monkeypatch.setattr(documents, "get_tokenizer", lambda: tokenizer)
+    return tokenizer
+
+
+@pytest.fixture(autouse=True)
+def llm_cache_path(tmp_path, monkeypatch):
+    # Keep cached Gemini responses out of the working directory and apart between tests
+    monkeypatch.setattr(llm_cache, "CACHE_PATH", str(tmp_path / "llm_cache.sqlite3"))
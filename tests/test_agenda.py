@@ -0,0 +1,143 @@
+import importlib
+import json
+import re
+import sys
+import types
+
+import pytest
+
+import tasks
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class ScriptedClient:
+    """
+    Answers the agenda prompts: points mentioning "budget" are grouped into
+    a Budget section and the rest into Hiring. Records every prompt.
+    """
+    model_name = "scripted"
+
+    def __init__(self):
+        self.prompts = []
+
+    def generate_content(self, prompt, request_options=None, **kwargs):
+        self.prompts.append(prompt)
+        if prompt.startswith("Organize") or prompt.startswith("A meeting agenda"):
+            points = re.findall(r"^(\d+)\. (.*)$", prompt.split("iscussion points:")[-1], re.MULTILINE)
+            sections = {}
+            for number, point in points:
+                title = "Budget" if "budget" in point.lower() else "Hiring"
+                sections.setdefault(title, []).append(int(number))
+            return FakeResponse(json.dumps({
+                "summary": "Plan the quarter.",
+                "sections": [{"title": title, "priority": "high", "points": numbers}
+                             for title, numbers in sections.items()],
+            }))
+        if prompt.startswith("Write the agenda entry"):
+            title = re.search(r'section "(.*?)"', prompt).group(1)
+            return FakeResponse(f'```json\n{{"objective": "Agree on {title}.", "notes": ["Bring numbers"]}}\n```')
+        return FakeResponse("Updated summary.")
+
+    def count(self, prefix):
+        return sum(prompt.startswith(prefix) for prompt in self.prompts)
+
+
+@pytest.fixture
+def agenda(monkeypatch):
+    pytest.importorskip("streamlit")
+    # Related documents come from the knowledge base; none are indexed here
+    fake_qna = types.ModuleType("tasks.QnA")
+    fake_qna.answer_context = lambda query, **kwargs: {"text": "", "tokens": 0, "snippets": []}
+    monkeypatch.setitem(sys.modules, "tasks.QnA", fake_qna)
+    monkeypatch.setattr(tasks, "QnA", fake_qna, raising=False)
+    monkeypatch.delitem(sys.modules, "tasks.agenda", raising=False)
+    return importlib.import_module("tasks.agenda")
+
+
+POINTS = ["Q3 budget review", "Marketing budget", "Hire two engineers", "Onboarding plan"]
+
+
+def test_normalize_points(agenda):
+    assert agenda.normalize_points(["  b  point", "A", "", "B point", "a"]) == ["A", "b point"]
+
+
+def test_first_agenda_is_planned_and_every_section_written(agenda):
+    client = ScriptedClient()
+    result, changed = agenda.generate_agenda(client, POINTS)
+    assert result["points"] == agenda.normalize_points(POINTS)
+    assert result["summary"] == "Plan the quarter."
+    assert {section["title"]: section["points"] for section in result["sections"]} == {
+        "Budget": ["Marketing budget", "Q3 budget review"],
+        "Hiring": ["Hire two engineers", "Onboarding plan"],
+    }
+    assert sorted(changed) == ["Budget", "Hiring"]
+    assert all(section["objective"] and section["notes"] == ["Bring numbers"] for section in result["sections"])
+
+
+def test_same_points_reuse_the_previous_agenda(agenda):
+    previous, _ = agenda.generate_agenda(ScriptedClient(), POINTS)
+    client = ScriptedClient()
+    result, changed = agenda.generate_agenda(client, list(reversed(POINTS)), previous)
+    assert result is previous
+    assert changed == []
+    assert client.prompts == []
+
+
+def test_added_point_only_rewrites_its_section(agenda):
+    previous, _ = agenda.generate_agenda(ScriptedClient(), POINTS)
+    client = ScriptedClient()
+    result, changed = agenda.generate_agenda(client, POINTS + ["Travel budget"], previous)
+    assert changed == ["Budget"]
+    assert client.count("Organize") == 0
+    assert client.count("A meeting agenda") == 1
+    assert client.count("Write the agenda entry") == 1
+    sections = {section["title"]: section for section in result["sections"]}
+    assert sections["Budget"]["points"] == ["Marketing budget", "Q3 budget review", "Travel budget"]
+    assert sections["Hiring"]["objective"] == "Agree on Hiring."
+    assert result["summary"] == "Updated summary."
+
+
+def test_removed_points_drop_emptied_sections(agenda):
+    points = POINTS + ["Travel budget", "Payroll budget"]
+    previous, _ = agenda.generate_agenda(ScriptedClient(), points)
+    client = ScriptedClient()
+    result, changed = agenda.generate_agenda(client, points[:2] + points[4:], previous)
+    assert changed == []
+    assert [section["title"] for section in result["sections"]] == ["Budget"]
+    assert client.count("A meeting agenda") == 0
+    assert client.count("Write the agenda entry") == 0
+
+    result, changed = agenda.generate_agenda(client, points[:3] + points[4:], result)
+    assert changed == ["Hiring"]
+
+
+def test_mostly_new_points_replan_the_agenda(agenda):
+    previous, _ = agenda.generate_agenda(ScriptedClient(), POINTS)
+    client = ScriptedClient()
+    agenda.generate_agenda(client, ["Hire a designer", "Office budget", "Hire a manager"], previous)
+    assert client.count("Organize") == 1
+
+
+def test_unlisted_points_go_to_other_topics(agenda):
+    points = ["a", "b", "c"]
+    sections = agenda._sections_from_response(
+        {"sections": [{"title": "First", "priority": "urgent", "points": [1, "2", 1, 9]}]}, points)
+    assert sections == [
+        {"title": "First", "priority": "medium", "points": ["a", "b"]},
+        {"title": agenda.OTHER_SECTION, "priority": "low", "points": ["c"]},
+    ]
+
+
+def test_on_update_reports_each_written_section(agenda):
+    updates = []
+    result, changed = agenda.generate_agenda(
+        ScriptedClient(), POINTS,
+        on_update=lambda partial: updates.append([bool(s.get("objective")) for s in partial["sections"]]),
+    )
+    assert updates[0] == [False, False]
+    assert len(updates) == 1 + len(changed)
+    assert updates[-1] == [True, True]
@@ -0,0 +1,61 @@
+from tasks import context
+
+
+def words(count, start=0):
+    return " ".join(f"w{idx}" for idx in range(start, start + count))
+
+
+def hit(text, chunk=None, source="notes.pdf", score=1.0, **metadata):
+    metadata = {"type": "document", "source": source, **metadata}
+    if chunk is not None:
+        metadata["chunk"] = chunk
+    return {"id": f"{source}-{chunk}", "text": text, "metadata": metadata, "score": score}
+
+
+def test_deduplicate_drops_text_contained_in_a_better_hit():
+    hits = [hit("The budget was approved for Q3."), hit("budget was approved", source="other.pdf")]
+    assert [h["text"] for h in context.deduplicate(hits)] == ["The budget was approved for Q3."]
+
+
+def test_deduplicate_trims_overlap_with_adjacent_chunks():
+    first = hit(words(10), chunk=0)
+    second = hit(words(10, 7), chunk=1)
+    before = hit(words(10, -7), chunk=-1)
+    texts = [h["text"] for h in context.deduplicate([first, second, before])]
+    assert texts == [words(10), words(7, 10), words(7, -7)]
+
+
+def test_deduplicate_keeps_overlap_between_different_sources():
+    hits = [hit(words(10), chunk=0), hit(words(10, 7), chunk=1, source="other.pdf")]
+    assert [h["text"] for h in context.deduplicate(hits)] == [words(10), words(10, 7)]
+
+
+def test_describe_source():
+    assert context.describe_source({"type": "document", "source": "plan.docx", "chunk": 2}) == \
+        "Document: plan.docx (part 3)"
+    assert context.describe_source({"type": "transcript", "meeting_id": "abc123456789"}) == "Meeting: meeting abc12345"
+    assert context.describe_source({"meeting_id": "m1"}, {"m1": "Weekly sync"}) == "Meeting: Weekly sync"
+
+
+def test_build_context_numbers_and_cites_snippets(word_tokenizer):
+    built = context.build_context([hit("alpha beta", chunk=0), hit("gamma", source="b.txt")], token_budget=1000)
+    assert [snippet["label"] for snippet in built["snippets"]] == \
+        ["[1] Document: notes.pdf (part 1)", "[2] Document: b.txt"]
+    assert built["text"] == "[1] Document: notes.pdf (part 1)\nalpha beta\n\n[2] Document: b.txt\ngamma"
+    assert built["tokens"] == sum(context.count_tokens(s["label"]) + 1 + s["tokens"] for s in built["snippets"])
+
+
+def test_build_context_truncates_the_last_snippet_to_the_budget(word_tokenizer):
+    hits = [hit(words(100), source="a.txt"), hit(words(100, 100), source="b.txt")]
+    # Each label is 3 words plus the newline, leaving 160 - 104 - 4 = 52 tokens for the second snippet
+    built = context.build_context(hits, token_budget=160)
+    assert len(built["snippets"]) == 2
+    assert built["snippets"][1]["text"].endswith(" ...")
+    assert built["snippets"][1]["tokens"] == 52
+    assert built["tokens"] <= 160
+
+
+def test_build_context_skips_snippets_that_would_be_too_short(word_tokenizer):
+    hits = [hit(words(100), source="a.txt"), hit(words(100, 100), source="b.txt")]
+    built = context.build_context(hits, token_budget=104 + 4 + context.MIN_SNIPPET_TOKENS - 1)
+    assert [snippet["source"] for snippet in built["snippets"]] == ["Document: a.txt"]
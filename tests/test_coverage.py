@@ -0,0 +1,123 @@
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+
+from tasks import coverage, models
+
+
+class BagOfWordsEmbedder:
+    """
+    Stands in for the sentence embedding model: one dimension per distinct
+    word, so cosine similarity is the normalised word overlap.
+    """
+    def __init__(self, dimensions=256):
+        self.dimensions = dimensions
+        self.vocabulary = {}
+        self.encoded = []
+
+    def encode(self, texts, batch_size=32, normalize_embeddings=False, convert_to_numpy=True):
+        self.encoded.extend(texts)
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[row, self.vocabulary.setdefault(word, len(self.vocabulary))] += 1
+        if normalize_embeddings:
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors
+
+
+@pytest.fixture
+def embedder(monkeypatch):
+    embedder = BagOfWordsEmbedder()
+    monkeypatch.setattr(models, "get_embedder", lambda: embedder)
+    monkeypatch.setattr(coverage, "_embedding_cache", OrderedDict())
+    return embedder
+
+
+SEGMENTS = [
+    {"start": 0, "end": 10, "text": "budget review for marketing"},
+    {"start": 40, "end": 50, "text": "hiring plan engineers"},
+    {"start": 80, "end": 90, "text": "office party snacks"},
+    {"start": 120, "end": 130, "text": "budget numbers marketing"},
+]
+
+
+def test_points_are_scored_against_their_best_windows(embedder):
+    results = coverage.score_coverage(["budget marketing", "hiring engineers", "security audit"], SEGMENTS)
+    budget, hiring, security = results
+
+    assert [result["point"] for result in results] == ["budget marketing", "hiring engineers", "security audit"]
+    assert budget["covered"] and hiring["covered"]
+    assert not security["covered"]
+    assert security["score"] == pytest.approx(0.0)
+
+    # Matches are the top-k windows, best first, and the score is their mean
+    assert [match["start"] for match in budget["matches"][:2]] == [120, 0]
+    similarities = [match["similarity"] for match in budget["matches"]]
+    assert similarities == sorted(similarities, reverse=True)
+    assert len(similarities) == coverage.TOP_K
+    assert budget["score"] == pytest.approx(np.mean(similarities))
+    assert coverage.format_match_times(budget) == "02:00, 00:00"
+    assert coverage.format_match_times(security) == ""
+
+
+def test_point_thresholds_override_the_global_threshold(embedder):
+    budget, hiring = coverage.score_coverage(
+        ["budget marketing", "hiring engineers"], SEGMENTS, point_thresholds={"budget marketing": 0.9},
+    )
+    assert budget["threshold"] == pytest.approx(0.9)
+    assert not budget["covered"]
+    assert hiring["covered"]
+
+
+def test_adaptive_threshold_accepts_a_point_that_stands_out(embedder):
+    # One window shares two of its eight words with the point (similarity 0.5);
+    # the other eight windows share none
+    segments = [{"start": 60 * idx, "end": 60 * idx + 10, "text": f"filler{idx} words{idx} here{idx}"}
+                for idx in range(8)]
+    segments.append({"start": 600, "end": 610, "text": "budget approval was pushed to next quarter again"})
+
+    adaptive, = coverage.score_coverage(["budget approval"], segments)
+    fixed, = coverage.score_coverage(["budget approval"], segments, adaptive=False)
+
+    assert adaptive["matches"][0]["similarity"] == pytest.approx(0.5)
+    assert coverage.COVERAGE_FLOOR <= adaptive["threshold"] < 0.5
+    assert adaptive["covered"]
+    assert fixed["threshold"] == pytest.approx(coverage.COVERAGE_THRESHOLD)
+    assert not fixed["covered"]
+
+
+def test_segments_are_grouped_into_windows(embedder):
+    segments = [
+        {"start": 0, "end": 10, "text": "budget review"},
+        {"start": 12, "end": 20, "text": "for marketing"},
+        {"start": 45, "end": 50, "text": "hiring plan"},
+    ]
+    windows = coverage.transcript_windows(segments)
+    assert [(window["start"], window["end"], window["text"]) for window in windows] == [
+        (0, 20, "budget review for marketing"), (45, 50, "hiring plan"),
+    ]
+
+
+def test_untimed_segments_have_no_match_times(embedder):
+    segments = [{"start": None, "end": None, "text": "budget numbers marketing"}]
+    result, = coverage.score_coverage(["budget marketing"], segments)
+    assert result["covered"]
+    assert coverage.format_match_times(result) == ""
+
+
+def test_no_points_or_no_transcript(embedder):
+    assert coverage.score_coverage([], SEGMENTS) == []
+    results = coverage.score_coverage(["budget marketing"], [{"start": 0, "end": 5, "text": "   "}])
+    assert results == [{"point": "budget marketing", "covered": False, "score": 0.0,
+                        "threshold": coverage.COVERAGE_THRESHOLD, "matches": []}]
+    assert embedder.encoded == []
+
+
+def test_rescoring_only_embeds_new_windows(embedder):
+    coverage.score_coverage(["budget marketing"], SEGMENTS[:2])
+    embedder.encoded.clear()
+
+    coverage.score_coverage(["budget marketing"], SEGMENTS)
+    assert embedder.encoded == ["office party snacks", "budget numbers marketing"]
@@ -0,0 +1,39 @@
+import pytest
+
+from tasks import documents
+
+
+def words(count, start=0):
+    return " ".join(f"w{idx}" for idx in range(start, start + count))
+
+
+def test_short_text_is_one_chunk(word_tokenizer):
+    assert list(documents.chunk_text_blocks(["  one two three  "], chunk_tokens=5, overlap_tokens=1)) == \
+        ["one two three"]
+
+
+def test_chunks_overlap_by_the_given_number_of_tokens(word_tokenizer):
+    chunks = list(documents.chunk_text_blocks([words(12)], chunk_tokens=5, overlap_tokens=2))
+    assert chunks == [words(5), words(5, 3), words(5, 6), words(3, 9)]
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert previous.split()[-2:] == chunk.split()[:2]
+
+
+def test_chunks_continue_across_blocks(word_tokenizer):
+    blocked = list(documents.chunk_text_blocks([words(7), words(7, 7), ""], chunk_tokens=5, overlap_tokens=1))
+    whole = list(documents.chunk_text_blocks([words(14)], chunk_tokens=5, overlap_tokens=1))
+    assert blocked == whole
+
+
+def test_empty_blocks_give_no_chunks(word_tokenizer):
+    assert list(documents.chunk_text_blocks(["", "   "], chunk_tokens=5, overlap_tokens=1)) == []
+
+
+def test_overlap_must_be_smaller_than_chunk(word_tokenizer):
+    with pytest.raises(ValueError):
+        list(documents.chunk_text_blocks(["text"], chunk_tokens=5, overlap_tokens=5))
+
+
+def test_content_hash_is_the_same_for_str_and_bytes():
+    assert documents.content_hash("abc") == documents.content_hash(b"abc")
+    assert documents.content_hash("abc") != documents.content_hash("abd")
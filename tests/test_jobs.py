@@ -0,0 +1,154 @@
+import threading
+import time
+import types
+
+import pytest
+
+from tasks import jobs
+
+
+class Crash(BaseException):
+    """Stops a job the way a killed worker would, without the job being marked failed."""
+
+
+@pytest.fixture
+def clock(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "JOBS_DIR", str(tmp_path / "jobs"))
+    monkeypatch.setattr(jobs, "JOBS_DB_PATH", str(tmp_path / "jobs" / "jobs.sqlite3"))
+    now = [1000.0]
+    monkeypatch.setattr(jobs, "time", types.SimpleNamespace(time=lambda: now[0], monotonic=time.monotonic,
+                                                            sleep=time.sleep))
+    return now
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Replaces every stage with one that records its calls; tests override single stages."""
+    calls = []
+    for stage in jobs.STAGES:
+        monkeypatch.setitem(jobs.STAGE_FUNCTIONS, stage, lambda job, report, stage=stage: calls.append(stage))
+    return calls
+
+
+def enqueue(tmp_path, name="meeting.mp4", **kwargs):
+    path = tmp_path / name
+    path.write_bytes(b"video")
+    return jobs.enqueue(str(path), ["Budget"], **kwargs)
+
+
+def test_enqueue_saves_checkpoints(clock, tmp_path):
+    job_id = enqueue(tmp_path, checkpoints={"segments": [{"start": 0, "end": 1, "text": "hi"}]})
+    job = jobs.get_job(job_id)
+    assert job["status"] == "queued"
+    assert job["discussion_points"] == ["Budget"]
+    assert jobs.load_checkpoint(job_id, "segments") == [{"start": 0, "end": 1, "text": "hi"}]
+    assert jobs.active_inputs() == [str(tmp_path / "meeting.mp4")]
+
+
+def test_jobs_are_claimed_oldest_first_and_only_once(clock, tmp_path):
+    job_ids = []
+    for idx in range(5):
+        job_ids.append(enqueue(tmp_path, f"{idx}.mp4"))
+        clock[0] += 1
+    claimed = []
+    lock = threading.Lock()
+
+    def claim():
+        while True:
+            job = jobs._claim_next_job()
+            if job is None:
+                return
+            with lock:
+                claimed.append(job["id"])
+
+    threads = [threading.Thread(target=claim) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(claimed) == sorted(job_ids)
+    assert all(jobs.get_job(job_id)["status"] == "running" for job_id in job_ids)
+    assert jobs._claim_next_job() is None
+
+
+def test_oldest_job_is_claimed_first(clock, tmp_path):
+    first = enqueue(tmp_path, "first.mp4")
+    clock[0] += 1
+    enqueue(tmp_path, "second.mp4")
+    assert jobs._claim_next_job()["id"] == first
+
+
+def test_job_runs_every_stage_and_cleans_up(clock, tmp_path, calls):
+    job_id = enqueue(tmp_path, cleanup=True)
+    jobs.run_job(jobs._claim_next_job())
+    job = jobs.get_job(job_id)
+    assert calls == list(jobs.STAGES)
+    assert job["status"] == "done"
+    assert job["completed_stages"] == list(jobs.STAGES)
+    assert jobs.overall_progress(job) == 1.0
+    assert not (tmp_path / "meeting.mp4").exists()
+
+
+def test_deferred_job_waits_and_keeps_its_completed_stages(clock, tmp_path, calls, monkeypatch):
+    deferrals = [jobs.Deferred(30, "Waiting for the call to continue")]
+
+    def transcribe(job, report):
+        calls.append("transcribe")
+        if deferrals:
+            raise deferrals.pop()
+
+    monkeypatch.setitem(jobs.STAGE_FUNCTIONS, "transcribe", transcribe)
+    job_id = enqueue(tmp_path)
+    jobs.run_job(jobs._claim_next_job())
+    job = jobs.get_job(job_id)
+    assert job["status"] == "queued"
+    assert job["message"] == "Waiting for the call to continue"
+    assert job["completed_stages"] == ["probe"]
+
+    clock[0] += 29
+    assert jobs._claim_next_job() is None
+    clock[0] += 2
+    jobs.run_job(jobs._claim_next_job())
+    assert jobs.get_job(job_id)["status"] == "done"
+    assert calls == ["probe", "transcribe", "transcribe", "index", "insights"]
+
+
+def test_job_of_a_dead_worker_resumes_after_its_last_completed_stage(clock, tmp_path, calls, monkeypatch):
+    def crash(job, report):
+        raise Crash()
+
+    monkeypatch.setitem(jobs.STAGE_FUNCTIONS, "index", crash)
+    job_id = enqueue(tmp_path)
+    with pytest.raises(Crash):
+        jobs.run_job(jobs._claim_next_job())
+    assert jobs.get_job(job_id)["status"] == "running"
+
+    # Still running as far as anyone can tell, until its heartbeat goes stale
+    clock[0] += jobs.STALE_SECONDS - 1
+    assert jobs._claim_next_job() is None
+    clock[0] += 2
+    monkeypatch.setitem(jobs.STAGE_FUNCTIONS, "index", lambda job, report: calls.append("index"))
+    job = jobs._claim_next_job()
+    assert job["id"] == job_id
+    assert jobs.get_job(job_id)["attempts"] == 2
+    jobs.run_job(job)
+    assert calls == ["probe", "transcribe", "index", "insights"]
+    assert jobs.get_job(job_id)["status"] == "done"
+
+
+def test_failed_job_can_be_retried(clock, tmp_path, calls, monkeypatch):
+    def fail(job, report):
+        raise RuntimeError("Gemini is down")
+
+    monkeypatch.setitem(jobs.STAGE_FUNCTIONS, "insights", fail)
+    job_id = enqueue(tmp_path)
+    jobs.worker_loop(once=True)
+    job = jobs.get_job(job_id)
+    assert job["status"] == "failed"
+    assert job["error"] == "Gemini is down"
+
+    monkeypatch.setitem(jobs.STAGE_FUNCTIONS, "insights", lambda job, report: calls.append("insights"))
+    jobs.retry(job_id)
+    jobs.worker_loop(once=True)
+    assert jobs.get_job(job_id)["status"] == "done"
+    assert calls == ["probe", "transcribe", "index", "insights"]
@@ -0,0 +1,36 @@
+import numpy as np
+
+from tasks import transcription
+from tasks.live_transcription import LiveTranscriber, RingBuffer
+
+
+def test_ring_buffer_reads_by_absolute_position():
+    buffer = RingBuffer(4)
+    buffer.write(np.arange(3, dtype=np.float32))
+    buffer.write(np.arange(3, 6, dtype=np.float32))
+    assert buffer.written == 6
+    assert buffer.oldest == 2
+    assert buffer.read(2, 6).tolist() == [2, 3, 4, 5]
+
+
+def test_ring_buffer_rejects_overwritten_samples():
+    buffer = RingBuffer(4)
+    buffer.write(np.zeros(6, dtype=np.float32))
+    try:
+        buffer.read(1, 3)
+    except IndexError:
+        pass
+    else:
+        raise AssertionError("expected IndexError")
+
+
+def test_overwritten_audio_is_counted_as_dropped():
+    rate = transcription.SAMPLE_RATE
+    transcriber = LiveTranscriber(window_seconds=1, buffer_seconds=2)
+    assert transcriber.complete
+    with transcriber._lock:
+        transcriber._buffer.write(np.zeros(3 * rate, dtype=np.float32))
+    start, samples = transcriber._next_window()
+    assert start == rate
+    assert transcriber.dropped_samples == rate
+    assert not transcriber.complete
@@ -0,0 +1,60 @@
+import threading
+import types
+
+import pytest
+
+from tasks import llm, llm_cache
+
+
+class FakeClient:
+    """Streams the given chunks, optionally raising after them."""
+    model_name = "fake-model"
+
+    def __init__(self, chunks, error=None):
+        self.chunks = chunks
+        self.error = error
+
+    def generate_content(self, prompt, stream=True, request_options=None):
+        for text in self.chunks:
+            yield types.SimpleNamespace(text=text)
+        if self.error is not None:
+            raise self.error
+
+
+def test_completed_generation_is_cached():
+    metrics = llm.StreamMetrics()
+    assert "".join(llm.stream(FakeClient(["Hello", " world"]), "prompt", metrics=metrics)) == "Hello world"
+    assert (metrics.chunks, metrics.cancelled, metrics.error) == (2, False, None)
+
+    cached = llm.StreamMetrics()
+    assert list(llm.stream(FakeClient([]), "prompt", metrics=cached)) == ["Hello world"]
+    assert cached.cached
+    assert cached.describe().endswith("(cached)")
+
+
+def test_failed_generation_is_reported_as_failed_not_cancelled():
+    metrics = llm.StreamMetrics()
+    with pytest.raises(RuntimeError):
+        list(llm.stream(FakeClient(["partial"], RuntimeError("quota exceeded")), "prompt", metrics=metrics))
+
+    assert metrics.error == "quota exceeded"
+    assert not metrics.cancelled
+    assert metrics.describe().endswith("(failed)")
+    assert metrics.as_dict()["error"] == "quota exceeded"
+    assert llm_cache.get(llm_cache.make_key("fake-model", "prompt")) is None
+
+
+def test_closed_or_cancelled_generation_is_cancelled():
+    closed = llm.StreamMetrics()
+    generator = llm.stream(FakeClient(["a", "b"]), "closed", metrics=closed)
+    next(generator)
+    generator.close()
+    assert closed.cancelled and closed.error is None
+
+    cancel_event = threading.Event()
+    cancel_event.set()
+    cancelled = llm.StreamMetrics()
+    assert list(llm.stream(FakeClient(["a"]), "cancelled", metrics=cancelled, cancel_event=cancel_event)) == []
+    assert cancelled.cancelled and cancelled.error is None
+    assert cancelled.describe().endswith("(cancelled)")
+    assert llm_cache.get(llm_cache.make_key("fake-model", "cancelled")) is None
@@ -0,0 +1,82 @@
+import threading
+import types
+
+import pytest
+
+from tasks import llm_cache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache, "time", types.SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def test_keys_ignore_whitespace_but_not_model_or_params():
+    key = llm_cache.make_key("m", "Summarize\n    this")
+    assert key == llm_cache.make_key("m", "Summarize this ")
+    assert key != llm_cache.make_key("other", "Summarize this")
+    assert key != llm_cache.make_key("m", "Summarize this", {"temperature": 0.5})
+
+
+def test_put_get_and_stats(clock):
+    assert llm_cache.get("k") is None
+    llm_cache.put("k", "m", "answer")
+    assert llm_cache.get("k") == "answer"
+    assert llm_cache.stats() == {"hits": 1, "misses": 1, "entries": 1, "bytes": 6}
+
+
+def test_entries_expire_after_the_ttl(clock, monkeypatch):
+    monkeypatch.setattr(llm_cache, "CACHE_TTL_SECONDS", 60)
+    llm_cache.put("old", "m", "a")
+    clock[0] += 30
+    llm_cache.put("new", "m", "b")
+    assert llm_cache.get("old") == "a"
+
+    clock[0] += 31
+    assert llm_cache.get("old") is None
+    assert llm_cache.get("new") == "b"
+    assert llm_cache.stats()["entries"] == 1
+
+    # Expired entries are also dropped by the next write
+    clock[0] += 60
+    llm_cache.put("newest", "m", "c")
+    assert llm_cache.stats()["entries"] == 1
+
+
+def test_least_recently_used_entries_are_evicted_over_the_size_cap(clock, monkeypatch):
+    monkeypatch.setattr(llm_cache, "CACHE_MAX_BYTES", 10)
+    llm_cache.put("a", "m", "aaaa")
+    clock[0] += 1
+    llm_cache.put("b", "m", "bbbb")
+    clock[0] += 1
+    assert llm_cache.get("a") == "aaaa"
+    clock[0] += 1
+    llm_cache.put("c", "m", "cccc")
+
+    assert llm_cache.get("b") is None
+    assert llm_cache.get("a") == "aaaa"
+    assert llm_cache.get("c") == "cccc"
+    assert llm_cache.stats()["bytes"] == 8
+
+
+def test_concurrent_writers_and_readers(monkeypatch):
+    monkeypatch.setattr(llm_cache, "CACHE_MAX_BYTES", 10 ** 9)
+    errors = []
+
+    def work(worker):
+        try:
+            for idx in range(50):
+                llm_cache.put(f"{worker}-{idx}", "m", str(idx))
+                assert llm_cache.get(f"{worker}-{idx}") == str(idx)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert llm_cache.stats()["entries"] == 400
@@ -0,0 +1,79 @@
+import os
+import types
+
+import pytest
+
+from tasks import recording
+
+HOUR = 3600
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100 * HOUR]
+    monkeypatch.setattr(recording, "time", types.SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+@pytest.fixture
+def record_dir(tmp_path):
+    path = tmp_path / "records"
+    path.mkdir()
+    return str(path)
+
+
+def make_session(record_dir, clock, name, updated, status="stopped", size=0):
+    path = os.path.join(record_dir, name)
+    os.makedirs(path)
+    with open(os.path.join(path, "segment_00000.mp4"), "wb") as f:
+        f.write(b"\0" * size)
+    now = clock[0]
+    clock[0] = updated
+    recording.save_manifest(path, {"session_id": name, "status": status, "segment_seconds": 300, "segments": []})
+    clock[0] = now
+    return path
+
+
+def make_file(record_dir, name, modified, size=0):
+    path = os.path.join(record_dir, name)
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    os.utime(path, (modified, modified))
+    return path
+
+
+def test_recordings_older_than_the_cutoff_are_removed(clock, record_dir):
+    old_session = make_session(record_dir, clock, "old", clock[0] - 80 * HOUR)
+    new_session = make_session(record_dir, clock, "new", clock[0] - HOUR)
+    old_file = make_file(record_dir, "old.mp4", clock[0] - 80 * HOUR)
+    new_file = make_file(record_dir, "new.mp4", clock[0] - HOUR)
+
+    assert recording.prune(max_age_hours=72, record_dir=record_dir) == 2
+    assert not os.path.exists(old_session) and not os.path.exists(old_file)
+    assert os.path.exists(new_session) and os.path.exists(new_file)
+
+
+def test_oldest_recordings_are_removed_until_under_the_size_cap(clock, record_dir):
+    oldest = make_file(record_dir, "a.mp4", clock[0] - 3 * HOUR, size=MB)
+    older = make_session(record_dir, clock, "b", clock[0] - 2 * HOUR, size=MB)
+    newest = make_file(record_dir, "c.mp4", clock[0] - HOUR, size=MB)
+
+    assert recording.prune(max_age_hours=72, max_mb=1.5, record_dir=record_dir) == 2
+    assert not os.path.exists(oldest) and not os.path.exists(older)
+    assert os.path.exists(newest)
+
+
+def test_kept_and_active_recordings_survive(clock, record_dir):
+    kept = make_file(record_dir, "kept.mp4", clock[0] - 80 * HOUR, size=MB)
+    active = make_session(record_dir, clock, "active", clock[0] - 60, status="recording", size=MB)
+    # A session still marked as recording but not updated for several segments was abandoned
+    abandoned = make_session(record_dir, clock, "abandoned", clock[0] - HOUR, status="recording", size=MB)
+
+    assert recording.prune(max_age_hours=72, max_mb=0, keep=[kept], record_dir=record_dir) == 1
+    assert os.path.exists(kept) and os.path.exists(active)
+    assert not os.path.exists(abandoned)
+
+
+def test_missing_record_dir_is_a_no_op(tmp_path):
+    assert recording.prune(record_dir=str(tmp_path / "missing")) == 0
@@ -0,0 +1,89 @@
+import pytest
+
+from tasks import retrieval
+
+
+class ListCollection:
+    """The part of the collection API the keyword index reads."""
+    def __init__(self, items):
+        self.items = dict(items)
+        self.reads = 0
+
+    def count(self):
+        return len(self.items)
+
+    def get(self, include):
+        self.reads += 1
+        ids = list(self.items)
+        return {"ids": ids, "documents": [self.items[i][0] for i in ids],
+                "metadatas": [self.items[i][1] for i in ids]}
+
+
+def test_tokenize():
+    assert retrieval.tokenize("Ticket JIRA-142, ok?") == ["ticket", "jira", "142", "ok"]
+
+
+def test_bm25_ranks_rare_exact_terms_first():
+    index = retrieval.BM25Index(
+        ["a", "b", "c"],
+        ["we discussed the budget", "ticket 4711 is blocked on the budget", "the budget the budget the budget"],
+        [{}, {}, {}],
+    )
+    assert [idx for idx, _ in index.search("ticket 4711", 5)] == [1]
+    ranked = index.search("budget", 5)
+    assert len(ranked) == 3
+    assert ranked[0][0] == 2
+
+
+def test_bm25_filters_by_metadata():
+    index = retrieval.BM25Index(
+        ["a", "b"],
+        ["budget review", "budget review"],
+        [{"meeting_id": "m1", "type": "transcript", "created_at": 100},
+         {"type": "document", "created_at": 200}],
+    )
+    assert [idx for idx, _ in index.search("budget", 5, meeting_id="m1")] == [0]
+    assert [idx for idx, _ in index.search("budget", 5, doc_type="document")] == [1]
+    assert [idx for idx, _ in index.search("budget", 5, since=150)] == [1]
+    assert [idx for idx, _ in index.search("budget", 5, until=150)] == [0]
+
+
+def test_build_where():
+    assert retrieval.build_where() is None
+    assert retrieval.build_where(meeting_id="m1") == {"meeting_id": "m1"}
+    assert retrieval.build_where(doc_type="document", since=10.5) == \
+        {"$and": [{"type": "document"}, {"created_at": {"$gte": 10}}]}
+
+
+def test_reciprocal_rank_fusion_rewards_hits_in_both_rankings():
+    dense = [{"id": "a", "score": 0.9}, {"id": "b", "score": 0.8}, {"id": "c", "score": 0.7}]
+    keyword = [{"id": "c", "score": 12.0}, {"id": "d", "score": 3.0}]
+    fused = retrieval.reciprocal_rank_fusion([dense, keyword], k=60)
+    assert [hit["id"] for hit in fused[:2]] == ["c", "a"]
+    assert fused[0]["score"] == pytest.approx(1 / 63 + 1 / 61)
+    # Equal ranks in different lists score the same
+    scores = {hit["id"]: hit["score"] for hit in fused}
+    assert scores["b"] == pytest.approx(scores["d"]) == pytest.approx(1 / 62)
+
+
+def test_keyword_index_is_rebuilt_when_the_version_changes():
+    collection = ListCollection({"a": ("alpha", {})})
+    version = [1]
+    retriever = retrieval.HybridRetriever(collection, version=lambda: version[0])
+    assert [hit["id"] for hit in retriever.keyword_search("alpha", 5)] == ["a"]
+    retriever.keyword_search("alpha", 5)
+    assert collection.reads == 1
+
+    # Same size, different content: only the version shows the change
+    collection.items = {"b": ("beta", {})}
+    version[0] = 2
+    assert [hit["id"] for hit in retriever.keyword_search("beta", 5)] == ["b"]
+    assert collection.reads == 2
+
+
+def test_keyword_index_falls_back_to_the_collection_size():
+    collection = ListCollection({"a": ("alpha", {})})
+    retriever = retrieval.HybridRetriever(collection)
+    retriever.keyword_search("alpha", 5)
+    collection.items["b"] = ("beta", {})
+    assert [hit["id"] for hit in retriever.keyword_search("beta", 5)] == ["b"]
@@ -0,0 +1,64 @@
+import threading
+
+import numpy as np
+import pytest
+
+from tasks import semantic_cache
+
+
+@pytest.fixture(autouse=True)
+def cache_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(semantic_cache, "SEMANTIC_CACHE_PATH", str(tmp_path / "semantic_cache.sqlite3"))
+
+
+def unit(*values):
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_scope_key_ignores_unset_options_and_order():
+    assert semantic_cache.scope_key({"mode": "hybrid", "meeting_id": None, "doc_type": "transcript"}) == \
+        semantic_cache.scope_key({"doc_type": "transcript", "mode": "hybrid"})
+
+
+def test_similar_question_in_the_same_scope_is_answered_from_the_cache():
+    version = semantic_cache.corpus_version()
+    semantic_cache.store("What was decided?", unit(1, 0, 0), "a", "We ship on Friday.", version)
+    assert semantic_cache.lookup(unit(1, 0.1, 0), "a") == "We ship on Friday."
+    assert semantic_cache.lookup(unit(1, 0.1, 0), "b") is None
+    assert semantic_cache.lookup(unit(0, 1, 0), "a") is None
+
+
+def test_invalidate_retires_earlier_answers():
+    semantic_cache.store("q", unit(1, 0), "a", "old answer", semantic_cache.corpus_version())
+    semantic_cache.invalidate()
+    assert semantic_cache.lookup(unit(1, 0), "a") is None
+    semantic_cache.store("q", unit(1, 0), "a", "new answer", semantic_cache.corpus_version())
+    assert semantic_cache.lookup(unit(1, 0), "a") == "new answer"
+
+
+def test_answer_built_before_an_invalidation_is_not_stored():
+    version = semantic_cache.corpus_version()
+    # Documents were ingested while the answer was being generated
+    semantic_cache.invalidate()
+    semantic_cache.store("q", unit(1, 0), "a", "stale answer", version)
+    assert semantic_cache.lookup(unit(1, 0), "a") is None
+
+
+def test_each_scope_keeps_only_its_newest_entries(monkeypatch):
+    monkeypatch.setattr(semantic_cache, "MAX_ENTRIES_PER_SCOPE", 2)
+    version = semantic_cache.corpus_version()
+    for idx, vector in enumerate([unit(1, 0, 0), unit(0, 1, 0), unit(0, 0, 1)]):
+        semantic_cache.store(f"q{idx}", vector, "a", f"answer {idx}", version)
+    assert semantic_cache.lookup(unit(1, 0, 0), "a") is None
+    assert semantic_cache.lookup(unit(0, 0, 1), "a") == "answer 2"
+
+
+def test_concurrent_invalidations_each_bump_the_version():
+    start = semantic_cache.corpus_version()
+    threads = [threading.Thread(target=lambda: [semantic_cache.invalidate() for _ in range(20)]) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert semantic_cache.corpus_version() == start + 160
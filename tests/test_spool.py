@@ -0,0 +1,23 @@
+import io
+import os
+
+from tasks import spool
+
+
+def test_same_content_is_spooled_once(tmp_path, monkeypatch):
+    spool_dir = str(tmp_path / "spool")
+    monkeypatch.setattr(spool, "SPOOL_CHUNK_SIZE", 4)
+    path, sha = spool.spool_file(io.BytesIO(b"meeting video bytes"), suffix=".mp4", spool_dir=spool_dir)
+    with open(path, "rb") as f:
+        assert f.read() == b"meeting video bytes"
+    assert os.path.basename(path) == sha + ".mp4"
+
+    # A repeated upload is hashed but never written, not even as a temporary file
+    def no_temp_files(*args, **kwargs):
+        raise AssertionError("content was written again")
+
+    monkeypatch.setattr(spool.tempfile, "mkstemp", no_temp_files)
+    upload = io.BytesIO(b"meeting video bytes")
+    assert spool.spool_file(upload, suffix=".mp4", spool_dir=spool_dir) == (path, sha)
+    assert upload.tell() == 0
+    assert os.listdir(spool_dir) == [os.path.basename(path)]
@@ -0,0 +1,231 @@
+import os
+
+import numpy as np
+import pytest
+
+from tasks import vector_store
+from tasks.vector_store import Int8VectorStore, ShardedCollection, matches_where
+
+
+def unit_vectors(count, dim=16, seed=0):
+    return vector_store.normalize(np.random.default_rng(seed).normal(size=(count, dim)))
+
+
+# ---- where filters ---- #
+def test_matches_where_field_equality_and_operators():
+    metadata = {"type": "transcript", "meeting_id": "m1", "created_at": 100}
+    assert matches_where(metadata, None)
+    assert matches_where(metadata, {"type": "transcript"})
+    assert not matches_where(metadata, {"type": "document"})
+    assert matches_where(metadata, {"created_at": {"$gte": 100, "$lt": 101}})
+    assert not matches_where(metadata, {"created_at": {"$gt": 100}})
+    assert matches_where(metadata, {"meeting_id": {"$in": ["m1", "m2"]}})
+    assert not matches_where(metadata, {"meeting_id": {"$nin": ["m1"]}})
+    assert matches_where(metadata, {"source": {"$ne": "a.pdf"}})
+
+
+def test_matches_where_missing_fields_fail_comparisons():
+    assert not matches_where({}, {"created_at": {"$gte": 0}})
+    assert not matches_where(None, {"type": "document"})
+
+
+def test_matches_where_and_or():
+    metadata = {"type": "document", "source": "a.pdf"}
+    assert matches_where(metadata, {"$and": [{"type": "document"}, {"source": "a.pdf"}]})
+    assert not matches_where(metadata, {"$and": [{"type": "document"}, {"source": "b.pdf"}]})
+    assert matches_where(metadata, {"$or": [{"type": "transcript"}, {"source": "a.pdf"}]})
+    assert not matches_where(metadata, {"$or": [{"type": "transcript"}, {"source": "b.pdf"}]})
+
+
+def test_matches_where_rejects_unknown_operators():
+    with pytest.raises(ValueError):
+        matches_where({"a": 1}, {"a": {"$regex": "1"}})
+
+
+def test_where_value():
+    assert vector_store.where_value({"meeting_id": "m1"}, "meeting_id") == "m1"
+    assert vector_store.where_value({"meeting_id": {"$eq": "m1"}}, "meeting_id") == "m1"
+    assert vector_store.where_value({"$and": [{"type": "transcript"}, {"meeting_id": "m1"}]}, "meeting_id") == "m1"
+    assert vector_store.where_value({"meeting_id": {"$in": ["m1", "m2"]}}, "meeting_id") is None
+
+
+# ---- quantization ---- #
+def test_quantize_round_trips_closely():
+    vectors = unit_vectors(50)
+    codes, scales = vector_store.quantize(vectors)
+    assert codes.dtype == np.int8
+    restored = codes.astype(np.float32) * scales[:, None]
+    assert np.abs(restored - vectors).max() < 0.01
+
+
+# ---- Int8VectorStore ---- #
+def test_store_add_get_query(tmp_path):
+    store = Int8VectorStore(str(tmp_path / "store"))
+    vectors = unit_vectors(20)
+    ids = [f"id{idx}" for idx in range(20)]
+    store.add(ids=ids, documents=[f"doc {idx}" for idx in range(20)],
+              metadatas=[{"type": "transcript" if idx % 2 else "document", "n": idx} for idx in range(20)],
+              embeddings=vectors)
+    assert store.count() == 20
+
+    got = store.get(ids=["id3", "missing", "id4"])
+    assert got["ids"] == ["id3", "id4"]
+    assert got["documents"] == ["doc 3", "doc 4"]
+    assert got["metadatas"] == [{"type": "transcript", "n": 3}, {"type": "document", "n": 4}]
+
+    result = store.query(query_embeddings=vectors[[7]], n_results=3)
+    assert result["ids"][0][0] == "id7"
+    assert result["distances"][0][0] == pytest.approx(0.0, abs=0.01)
+    assert result["distances"][0] == sorted(result["distances"][0])
+
+    filtered = store.query(query_embeddings=vectors[[7]], n_results=3, where={"type": "document"})
+    assert all(metadata["type"] == "document" for metadata in filtered["metadatas"][0])
+
+
+def test_store_skips_existing_ids_and_checks_dimension(tmp_path):
+    store = Int8VectorStore(str(tmp_path / "store"))
+    store.add(ids=["a"], documents=["first"], embeddings=unit_vectors(1))
+    store.add(ids=["a", "b"], documents=["again", "second"], embeddings=unit_vectors(2, seed=1))
+    assert store.count() == 2
+    assert store.get(ids=["a"])["documents"] == ["first"]
+    with pytest.raises(ValueError):
+        store.add(ids=["c"], embeddings=unit_vectors(1, dim=8))
+
+
+def test_store_delete_and_update(tmp_path):
+    store = Int8VectorStore(str(tmp_path / "store"))
+    vectors = unit_vectors(4)
+    store.add(ids=["a", "b", "c", "d"], documents=list("abcd"),
+              metadatas=[{"source": "x"}, {"source": "x"}, {"source": "y"}, {"source": "y"}], embeddings=vectors)
+    store.delete(where={"source": "x"})
+    store.delete(ids=["d"])
+    assert store.get(include=[])["ids"] == ["c"]
+
+    store.update(ids=["c"], metadatas=[{"source": "z"}])
+    assert store.get(ids=["c"])["metadatas"] == [{"source": "z"}]
+    store.update(ids=["c"], embeddings=vectors[[0]])
+    result = store.query(query_embeddings=vectors[[0]], n_results=1)
+    assert result["ids"][0] == ["c"]
+    assert result["documents"][0] == ["c"]
+    assert result["metadatas"][0] == [{"source": "z"}]
+
+
+def test_store_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "store")
+    writer, reader = Int8VectorStore(path), Int8VectorStore(path)
+    assert reader.count() == 0
+    writer.add(ids=["a"], documents=["a"], embeddings=unit_vectors(1))
+    assert reader.count() == 1
+    writer.delete(ids=["a"])
+    assert reader.count() == 0
+
+
+def test_store_embeds_documents_with_its_embedding_function(tmp_path):
+    vectors = {"alpha": unit_vectors(1, seed=1)[0], "beta": unit_vectors(1, seed=2)[0]}
+    store = Int8VectorStore(str(tmp_path / "store"), embedding_function=lambda texts: [vectors[t] for t in texts])
+    store.add(ids=["a", "b"], documents=["alpha", "beta"])
+    assert store.query(query_texts=["beta"], n_results=1)["ids"] == [["b"]]
+
+
+def test_ivf_search_probes_lists_and_includes_rows_added_after_training(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_store, "IVF_MIN_ROWS", 64)
+    # Four well separated clusters
+    rng = np.random.default_rng(0)
+    centers = unit_vectors(4, seed=1)
+    vectors = vector_store.normalize(np.repeat(centers, 40, axis=0) + 0.05 * rng.normal(size=(160, 16)))
+    ids = [f"id{idx}" for idx in range(160)]
+    exact = Int8VectorStore(str(tmp_path / "exact"), ivf_lists=0)
+    exact.add(ids=ids, embeddings=vectors)
+    store = Int8VectorStore(str(tmp_path / "ivf"), ivf_lists=4, ivf_probes=4)
+    store.add(ids=ids, embeddings=vectors)
+    view = store._load_view()
+    assert view["ivf"] is not None
+
+    # Probing every list is exact; probing one scans only part of the store
+    for idx in (0, 50, 100, 150):
+        assert store.query(query_embeddings=vectors[[idx]], n_results=5)["ids"] == \
+            exact.query(query_embeddings=vectors[[idx]], n_results=5)["ids"]
+    store.ivf_probes = 1
+    assert len(store._ivf_candidates(view, vectors[0])) < 160
+    assert store.query(query_embeddings=vectors[[0]], n_results=1)["ids"] == [["id0"]]
+
+    # Not yet assigned to a list, but still found
+    store.add(ids=["late"], embeddings=-centers[:1])
+    assert store.query(query_embeddings=-centers[:1], n_results=1)["ids"] == [["late"]]
+
+
+# ---- ShardedCollection ---- #
+class NumpyEmbeddingsStore(Int8VectorStore):
+    """Returns embeddings as one NumPy array, as recent ChromaDB releases do."""
+    def get(self, *args, **kwargs):
+        result = super().get(*args, **kwargs)
+        if "embeddings" in result:
+            result["embeddings"] = np.array(result["embeddings"], dtype=np.float32)
+        return result
+
+
+@pytest.fixture(params=[Int8VectorStore, NumpyEmbeddingsStore], ids=["lists", "ndarray"])
+def sharded(tmp_path, request):
+    root = tmp_path / "shards"
+    root.mkdir()
+    return ShardedCollection("meeting_id", lambda name: request.param(str(root / name)),
+                             lambda: os.listdir(root))
+
+
+def test_sharded_add_routes_by_key(sharded, tmp_path):
+    vectors = unit_vectors(3)
+    sharded.add(ids=["a", "b", "c"], documents=list("abc"),
+                metadatas=[{"meeting_id": "m1"}, {"meeting_id": "m2"}, {"type": "document"}], embeddings=vectors)
+    assert sorted(os.listdir(tmp_path / "shards")) == ["default", "m1", "m2"]
+    assert sharded.count() == 3
+    assert sharded.get(where={"meeting_id": "m1"})["ids"] == ["a"]
+    assert sharded.get(where={"meeting_id": "unknown"})["ids"] == []
+    assert not (tmp_path / "shards" / "unknown").exists()
+
+
+def test_sharded_query_merges_shards_by_distance(sharded):
+    vectors = unit_vectors(6)
+    sharded.add(ids=list("abcdef"), metadatas=[{"meeting_id": f"m{idx % 3}"} for idx in range(6)],
+                embeddings=vectors)
+    result = sharded.query(query_embeddings=vectors[[4]], n_results=6)
+    assert result["ids"][0][0] == "e"
+    assert sorted(result["ids"][0]) == list("abcdef")
+    assert result["distances"][0] == sorted(result["distances"][0])
+    assert sharded.query(query_embeddings=vectors[[4]], n_results=6, where={"meeting_id": "m1"})["ids"] == \
+        [["e", "b"]]
+
+
+def test_sharded_update_moves_items_whose_key_changed(sharded):
+    vectors = unit_vectors(2)
+    sharded.add(ids=["a", "b"], documents=["doc a", "doc b"],
+                metadatas=[{"meeting_id": "m1", "n": 1}, {"meeting_id": "m1", "n": 2}], embeddings=vectors)
+    sharded.update(ids=["a", "b"], metadatas=[{"meeting_id": "m1", "n": 10}, {"meeting_id": "m2", "n": 20}])
+
+    assert sharded.get(where={"meeting_id": "m1"})["metadatas"] == [{"meeting_id": "m1", "n": 10}]
+    moved = sharded.get(where={"meeting_id": "m2"})
+    assert moved["ids"] == ["b"]
+    assert moved["documents"] == ["doc b"]
+    # The moved item keeps its embedding
+    assert sharded.query(query_embeddings=vectors[[1]], n_results=1, where={"meeting_id": "m2"})["ids"] == [["b"]]
+    assert sharded.count() == 2
+
+
+def test_sharded_get_embeddings(sharded):
+    vectors = unit_vectors(3)
+    sharded.add(ids=["a", "b", "c"], metadatas=[{"meeting_id": "m1"}, {"meeting_id": "m2"}, {}],
+                embeddings=vectors)
+    found = sharded.get(where={"chunk_hash": {"$in": ["x"]}}, include=["metadatas", "embeddings"])
+    assert found == {"ids": [], "metadatas": [], "embeddings": []}
+    found = sharded.get(ids=["c", "a"], include=["embeddings"])
+    assert sorted(found["ids"]) == ["a", "c"]
+    for item_id, embedding in zip(found["ids"], found["embeddings"]):
+        assert np.allclose(embedding, vectors["abc".index(item_id)], atol=0.01)
+
+
+def test_sharded_delete(sharded):
+    sharded.add(ids=["a", "b", "c"], metadatas=[{"meeting_id": "m1"}, {"meeting_id": "m1"}, {"meeting_id": "m2"}],
+                embeddings=unit_vectors(3))
+    sharded.delete(where={"meeting_id": "m1"})
+    assert sharded.get(include=[])["ids"] == ["c"]
+    sharded.delete(ids=["c"])
+    assert sharded.count() == 0